@@ -0,0 +1,291 @@
+"""Run adb commands in the device under test.
+
+Commands are sent straight to the adb server with its smart socket
+protocol, instead of forking an ``adb`` client for each of them. Every
+service needs its own connection to the server, but that is a local
+socket: the server keeps the only connection to each device and
+multiplexes the services over it. Several shell channels can be open at
+the same time, and their output is streamed as it arrives.
+
+The device is the one selected by ``ANDROID_SERIAL``, if any. The server
+is the one in ``ANDROID_ADB_SERVER_PORT`` (default 5037), like for the
+``adb`` client. `install_physalia_hooks` routes the device model and
+charging helpers of `physalia.utils.android` through the client too, so
+that physalia does not fork ``adb`` for each measurement either.
+`fake_adb_server` implements the server side of the protocol, to try the
+tools without a device.
+"""
+
+import errno
+import os
+import re
+import socket
+import struct
+import subprocess
+import physalia.utils.android as android_utils
+from physalia.exceptions import PhysaliaExecutionFailed
+
+SERVER_HOST = '127.0.0.1'
+DEFAULT_SERVER_PORT = 5037
+SYNC_DATA_MAX = 64 * 1024
+EXIT_STATUS_MARKER = "PHYSALIA_EXIT_STATUS:"
+EXIT_STATUS_PATTERN = re.compile(
+    r"\r?\n" + EXIT_STATUS_MARKER + r"(\d+)\r?\n?$"
+)
+
+
+class AdbError(PhysaliaExecutionFailed):
+    """The adb server could not serve a request."""
+
+
+class AdbConnection(object):
+    """Connection to the adb server.
+
+    Args:
+        host        host of the adb server.
+        port        port of the adb server.
+    """
+
+    def __init__(self, host, port):  # noqa: D107
+        self.socket = socket.create_connection((host, port))
+
+    def request(self, service):
+        """Ask for a service, raising `AdbError` if it is refused."""
+        payload = service.encode('utf-8')
+        self.socket.sendall(
+            "{:04x}".format(len(payload)).encode('ascii') + payload
+        )
+        self.check_status()
+
+    def check_status(self):
+        """Read the status of the last request."""
+        status = self.recv_exactly(4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            raise AdbError(self.read_message())
+        raise AdbError("Unexpected reply from the adb server: {!r}".format(
+            status))
+
+    def read_message(self):
+        """Read a message prefixed with its length in hexadecimal."""
+        length = int(self.recv_exactly(4), 16)
+        return self.recv_exactly(length).decode('utf-8', 'replace')
+
+    def recv_exactly(self, size):
+        """Read exactly `size` bytes."""
+        data = b""
+        while len(data) < size:
+            chunk = self.socket.recv(size - len(data))
+            if not chunk:
+                raise AdbError("The adb server closed the connection.")
+            data += chunk
+        return data
+
+    def close(self):
+        """Close the connection."""
+        self.socket.close()
+
+
+class ShellChannel(object):
+    """Shell command running in the device.
+
+    Iterate over the channel to get the output lines as they arrive.
+    Closing the channel closes the shell in the device.
+
+    Args:
+        connection  `AdbConnection` switched to the shell service.
+    """
+
+    def __init__(self, connection):  # noqa: D107
+        self.connection = connection
+        self.stream = connection.socket.makefile('rb')
+
+    def __iter__(self):
+        """Yield the output lines of the command."""
+        for line in iter(self.stream.readline, b''):
+            yield line.decode('utf-8', 'replace')
+
+    def read(self):
+        """Read the output until the command exits."""
+        return self.stream.read().decode('utf-8', 'replace')
+
+    def close(self):
+        """Close the channel."""
+        self.stream.close()
+        self.connection.close()
+
+    def __enter__(self):  # noqa: D105
+        return self
+
+    def __exit__(self, *args):  # noqa: D105
+        self.close()
+
+
+class AdbClient(object):
+    """Client of the adb server.
+
+    Args:
+        serial      serial of the device (default: ``ANDROID_SERIAL``, or
+                    the only device connected).
+        host        host of the adb server.
+        port        port of the adb server (default:
+                    ``ANDROID_ADB_SERVER_PORT``, or 5037).
+    """
+
+    # models of the devices asked so far, by serial
+    device_models = {}
+
+    def __init__(self, serial=None, host=SERVER_HOST,
+                 port=None):  # noqa: D107
+        self._serial = serial
+        self.host = host
+        self._port = port
+
+    @property
+    def serial(self):
+        """Serial of the device."""
+        return self._serial or os.environ.get('ANDROID_SERIAL')
+
+    @property
+    def port(self):
+        """Port of the adb server."""
+        return self._port or int(
+            os.environ.get('ANDROID_ADB_SERVER_PORT', DEFAULT_SERVER_PORT)
+        )
+
+    def connect(self):
+        """Connect to the adb server, starting it if it is not running."""
+        try:
+            return AdbConnection(self.host, self.port)
+        except socket.error as error:
+            if error.errno != errno.ECONNREFUSED:
+                raise
+        subprocess.check_call(["adb", "start-server"])
+        return AdbConnection(self.host, self.port)
+
+    def open_service(self, service):
+        """Open a connection to a service of the device."""
+        connection = self.connect()
+        try:
+            if self.serial:
+                connection.request("host:transport:{}".format(self.serial))
+            else:
+                connection.request("host:transport-any")
+            connection.request(service)
+        except Exception:
+            connection.close()
+            raise
+        return connection
+
+    def open_shell(self, command):
+        """Run a shell command, returning a `ShellChannel` to its output."""
+        return ShellChannel(self.open_service("shell:{}".format(command)))
+
+    def shell(self, command, check=True):
+        """Run a shell command in the device and return its output.
+
+        Args:
+            command     shell command.
+            check       raise `subprocess.CalledProcessError` when the
+                        command exits with a nonzero status (default True).
+                        Errors of the adb server are raised either way.
+        """
+        # the legacy shell service does not report the exit status
+        with self.open_shell(
+                "({}); printf '\\n{}%d\\n' $?".format(command,
+                                                     EXIT_STATUS_MARKER)
+        ) as channel:
+            output = channel.read()
+        match = EXIT_STATUS_PATTERN.search(output)
+        if match is None:
+            raise AdbError("Shell closed before {} exited.".format(command))
+        output = output[:match.start()]
+        status = int(match.group(1))
+        if check and status != 0:
+            raise subprocess.CalledProcessError(status, command, output)
+        return output
+
+    def push(self, local, remote):
+        """Copy a local file to the device."""
+        connection = self.open_service("sync:")
+        try:
+            stat = os.stat(local)
+            spec = "{},{}".format(remote, stat.st_mode).encode('utf-8')
+            connection.socket.sendall(
+                b"SEND" + struct.pack("<I", len(spec)) + spec
+            )
+            with open(local, 'rb') as local_file:
+                for chunk in iter(lambda: local_file.read(SYNC_DATA_MAX), b''):
+                    connection.socket.sendall(
+                        b"DATA" + struct.pack("<I", len(chunk)) + chunk
+                    )
+            connection.socket.sendall(
+                b"DONE" + struct.pack("<I", int(stat.st_mtime))
+            )
+            status = connection.recv_exactly(4)
+            if status != b"OKAY":
+                length = struct.unpack("<I", connection.recv_exactly(4))[0]
+                raise AdbError("Could not push {}: {}".format(
+                    local, connection.recv_exactly(length).decode('utf-8')))
+            connection.socket.sendall(b"QUIT" + struct.pack("<I", 0))
+        finally:
+            connection.close()
+
+    def uninstall(self, app_pkg):
+        """Uninstall a package from the device."""
+        return self.shell("pm uninstall {}".format(app_pkg))
+
+    def get_device_model(self):
+        """Get the model of the device, asking the device once per serial.
+
+        Returns "N/A" if the device cannot be reached, like
+        `physalia.utils.android.get_device_model`.
+        """
+        serial = self.serial
+        if serial not in self.device_models:
+            try:
+                model = self.shell("getprop ro.product.model").strip()
+            except (AdbError, socket.error, subprocess.CalledProcessError):
+                return "N/A"
+            self.device_models[serial] = model
+        return self.device_models[serial]
+
+    def set_charging_enabled(self, enabled):
+        """Enable or disable charging the device."""
+        self.shell(
+            "dumpsys battery set ac {enabled};"
+            " dumpsys battery set usb {enabled}".format(enabled=int(enabled))
+        )
+
+
+client = AdbClient()
+open_shell = client.open_shell
+shell = client.shell
+push = client.push
+uninstall = client.uninstall
+
+
+def get_device_model(serialno=None):
+    """Get the model of a device (default: the device of `client`)."""
+    if serialno:
+        return AdbClient(serialno).get_device_model()
+    return client.get_device_model()
+
+
+def set_charging_enabled(enabled, serialno=None):
+    """Enable or disable charging a device (default: that of `client`)."""
+    if serialno:
+        AdbClient(serialno).set_charging_enabled(enabled)
+    else:
+        client.set_charging_enabled(enabled)
+
+
+def install_physalia_hooks():
+    """Route adb helpers of `physalia.utils.android` through the client.
+
+    physalia forks ``adb`` for them, e.g. for the `Measurement` of each
+    `AndroidUseCase.run`. Call it in the processes that run campaigns.
+    """
+    android_utils.get_device_model = get_device_model
+    android_utils.set_charging_enabled = set_charging_enabled
@@ -0,0 +1,127 @@
+"""Interaction using Android View Client with batched input injection.
+
+Same routines as `android_view_client_use_case`, but the input events of
+each run are compiled into one script that runs in a single adb shell
+invocation. Comparing both sets of use cases shows the overhead of the
+round trip of each call.
+"""
+
+from physalia_automators.android_view_client_use_case import (
+    AndroidViewClientUseCase, APP_APK, prepare, cleanup
+)
+from physalia_automators.input_batch import InputScript
+from physalia_automators.utils import minimum_execution_time
+from physalia_automators import time_boundaries
+from physalia_automators.constants import loop_count
+from physalia_automators import app_state
+
+
+def push_script(use_case, script):
+    """Copy the script of the use case to the device before running."""
+    script.push()
+    use_case.input_script = script
+
+# -------------------------------------------------------------------------- #
+
+def prepare_swipe(use_case):
+    app_state.prepare_app(use_case)
+    paint = use_case.wait_for_content_description("Paint")
+    x_i, y_i = (paint.getCenter()[0], paint.getY())
+    swipe_distance = 420
+    duration = 800 / 2.0  # as ViewClient.swipe does for 800 steps
+    script = InputScript()
+    for i in range(loop_count.SWIPE):
+        offset_y = i*8
+        with script.unit(time_boundaries.SWIPE_UNIT):
+            # Swipe left
+            script.swipe((x_i, y_i+offset_y+1),
+                         (x_i-swipe_distance, y_i+offset_y+1), duration)
+            # Swipe Right
+            script.swipe((x_i, y_i+offset_y),
+                         (x_i+swipe_distance, y_i+offset_y), duration)
+    push_script(use_case, script)
+
+@minimum_execution_time(time_boundaries.SWIPE)
+def run_swipe(use_case):
+    use_case.input_script.run()
+
+swipe_use_case = AndroidViewClientUseCase(
+    "AndroidViewClient-batched-swipe",
+    APP_APK,
+    "com.tqrg.physalia.testapp",
+    "0.01",
+    run=run_swipe,
+    prepare=prepare_swipe,
+    cleanup=cleanup
+)
+
+# -------------------------------------------------------------------------- #
+
+def prepare_back_button(use_case):
+    prepare(use_case)
+    script = InputScript()
+    for _ in range(loop_count.BACK_BUTTON):
+        with script.unit(time_boundaries.BACK_BUTTON_UNIT):
+            script.key('KEYCODE_BACK')
+    push_script(use_case, script)
+
+@minimum_execution_time(time_boundaries.BACK_BUTTON)
+def run_back_button(use_case):
+    use_case.input_script.run()
+
+back_button_use_case = AndroidViewClientUseCase(
+    "AndroidViewClient-batched-back_button",
+    APP_APK,
+    "com.tqrg.physalia.testapp",
+    "0.01",
+    run=run_back_button,
+    prepare=prepare_back_button,
+    cleanup=cleanup
+)
+
+# -------------------------------------------------------------------------- #
+
+def prepare_input_text(use_case):
+    app_state.prepare_app(use_case)
+    text_field = use_case.wait_for_content_description("Text Field")
+    x, y = text_field.getCenter()
+    message = "Physalia says hi!"
+    script = InputScript()
+    for _ in range(loop_count.INPUT_TEXT):
+        script.text(message)
+        for _ in range(len(message)):
+            # View.backspace touches the view and waits a second
+            script.tap(x, y)
+            script.sleep(1)
+            script.key('KEYCODE_DEL')
+    push_script(use_case, script)
+
+@minimum_execution_time(time_boundaries.INPUT_TEXT)
+def run_input_text(use_case):
+    use_case.input_script.run()
+
+input_text_use_case = AndroidViewClientUseCase(
+    "AndroidViewClient-batched-input_text",
+    APP_APK,
+    "com.tqrg.physalia.testapp",
+    "0.01",
+    run=run_input_text,
+    prepare=prepare_input_text,
+    cleanup=cleanup
+)
+
+# -------------------------------------------------------------------------- #
+
+use_cases = {
+    "find_by_id": None,
+    "find_by_description": None,
+    "find_by_content": None,
+    "tap": None,
+    "long_tap": None,
+    "multi_finger_tap": None,
+    "dragndrop": None,
+    "swipe": swipe_use_case,
+    "pinch_and_spread": None,
+    "back_button": back_button_use_case,
+    "input_text": input_text_use_case,
+}
@@ -0,0 +1,65 @@
+"""Interaction using Android View Client, reusing view dumps.
+
+Same find routines as `android_view_client_use_case`, but the last view
+dump is reused while the focused window stays the same, instead of dumping
+in every iteration. That changes what they measure, so they are named
+``AndroidViewClient-cached-*`` and only run when asked for.
+"""
+
+from physalia_automators.android_view_client_use_case import (
+    AndroidViewClientUseCase, APP_APK, prepare, cleanup,
+    run_find_by_id, run_find_by_description, run_find_by_content
+)
+
+# -------------------------------------------------------------------------- #
+
+find_by_id_use_case = AndroidViewClientUseCase(
+    "AndroidViewClient-cached-find_by_id",
+    APP_APK,
+    "com.tqrg.physalia.testapp",
+    "0.01",
+    run=run_find_by_id,
+    prepare=prepare,
+    cleanup=cleanup,
+    reuse_dumps=True
+)
+
+# -------------------------------------------------------------------------- #
+
+find_by_description_use_case = AndroidViewClientUseCase(
+    "AndroidViewClient-cached-find_by_description",
+    APP_APK,
+    "com.tqrg.physalia.testapp",
+    "0.01",
+    run=run_find_by_description,
+    prepare=prepare,
+    cleanup=cleanup,
+    reuse_dumps=True
+)
+
+# -------------------------------------------------------------------------- #
+
+find_by_content_use_case = AndroidViewClientUseCase(
+    "AndroidViewClient-cached-find_by_content",
+    APP_APK,
+    "com.tqrg.physalia.testapp",
+    "0.01",
+    run=run_find_by_content,
+    prepare=prepare,
+    cleanup=cleanup,
+    reuse_dumps=True
+)
+
+use_cases = {
+    "find_by_id": find_by_id_use_case,
+    "find_by_description": find_by_description_use_case,
+    "find_by_content": find_by_content_use_case,
+    "tap": None,
+    "long_tap": None,
+    "multi_finger_tap": None,
+    "dragndrop": None,
+    "swipe": None,
+    "pinch_and_spread": None,
+    "back_button": None,
+    "input_text": None,
+}
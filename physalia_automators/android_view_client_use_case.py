@@ -1,12 +1,17 @@
 """Interaction using Android View Client."""
 
-import sys
+import time
 from physalia.energy_profiler import AndroidUseCase
-from com.dtmilano.android.viewclient import ViewClient
+from physalia.exceptions import PhysaliaExecutionFailed
 from physalia_automators.utils import minimum_execution_time, get_path
 from physalia_automators import time_boundaries
+from physalia_automators import app_state
+from physalia_automators import view_client_pool
+from physalia_automators import phases
 from physalia_automators.constants import loop_count
 
+WAIT_TIMEOUT = 30
+
 
 class AndroidViewClientUseCase(AndroidUseCase):
     """`AndroidUseCase` to use with `AndroidViewClient`."""
@@ -15,11 +20,14 @@ class AndroidViewClientUseCase(AndroidUseCase):
     # Eight is reasonable in this case.
 
     def __init__(self, name, app_apk, app_pkg, app_version,
-                 run, prepare=None, cleanup=None):  # noqa: D102
+                 run, prepare=None, cleanup=None,
+                 reuse_dumps=False):  # noqa: D102
         super(AndroidViewClientUseCase, self).__init__(
             name, app_apk, app_pkg, app_version,
             run, prepare, cleanup
         )
+        self.reuse_dumps = reuse_dumps
+        self.connection = None
         self.device = None
         self.serialno = None
         self.view_client = None
@@ -35,31 +43,20 @@ class AndroidViewClientUseCase(AndroidUseCase):
         super(AndroidViewClientUseCase, self).get_device_model(serialno)
 
     def start_view_client(self, force=False):
-        """Setup `AndroidViewClient`.
+        """Setup `AndroidViewClient` with a connection of the shared pool.
+
+        The pooled connection is checked before it is used and replaced
+        only if the device no longer answers.
 
         Args:
             force (boolean): force start even if it was previously done (default False).
         """
-        # pylint: disable=attribute-defined-outside-init
-
-        if self.view_client is None or force is True:
-            original_argv = sys.argv
-            sys.argv = original_argv[:1]
-            kwargs1 = {'ignoreversioncheck': False,
-                       'verbose': False,
-                       'ignoresecuredevice': False}
-            device, serialno = ViewClient.connectToDeviceOrExit(**kwargs1)
-            kwargs2 = {'forceviewserveruse': False,
-                       'useuiautomatorhelper': False,
-                       'ignoreuiautomatorkilled': True,
-                       'autodump': False,
-                       'startviewserver': True,
-                       'compresseddump': True}
-            view_client = ViewClient(device, serialno, **kwargs2)
-            sys.argv = original_argv
-            self.device = device
-            self.serialno = serialno
-            self.view_client = view_client
+        with phases.phase("warm_up"):
+            connection = view_client_pool.get(force=force)
+        self.connection = connection
+        self.device = connection.device
+        self.serialno = connection.serialno
+        self.view_client = connection.view_client
         #always refresh
         self.refresh()
 
@@ -71,45 +68,60 @@ class AndroidViewClientUseCase(AndroidUseCase):
         self.start_view_client()
         self._prepare()
 
-    def refresh(self):
-        """Refresh `AndroidViewClient`."""
-        while True:
-            try:
-                self.view_client.dump(window='-1')
-            except RuntimeError:
-                continue
-            break
+    def refresh(self, force=False):
+        """Refresh `AndroidViewClient`.
 
-    def wait_for_id(self, view_id):
-        """Refresh `AndroidViewClient` until view id is found."""
-        view = self.view_client.findViewById(view_id)
+        Use cases created with `reuse_dumps` keep the last dump while the
+        focused window does not change. Others always dump.
+
+        Args:
+            force (boolean): dump even if the window did not change (default False).
+        """
+        self.connection.dump(force=force or not self.reuse_dumps)
+
+    def wait_for_view(self, find, description):
+        """Refresh `AndroidViewClient` until `find` returns a view."""
+        view = find()
+        deadline = time.time() + WAIT_TIMEOUT
         while view is None:
-            self.refresh()
-            view = self.view_client.findViewById(view_id)
+            if time.time() > deadline:
+                raise PhysaliaExecutionFailed(
+                    "{} not found in {}.".format(description, self.name)
+                )
+            self.refresh(force=True)
+            view = find()
         return view
 
+    def find_by_id(self, view_id):
+        """Find a view of the last dump by id, using its index."""
+        return self.connection.index.find_by_id(view_id)
+
+    def find_by_content_description(self, content_description):
+        """Find a view of the last dump by content description."""
+        return self.connection.index.find_by_description(content_description)
+
+    def wait_for_id(self, view_id):
+        """Refresh `AndroidViewClient` until view id is found."""
+        return self.wait_for_view(
+            lambda: self.find_by_id(view_id),
+            "View {}".format(view_id)
+        )
+
     def wait_for_content_description(self, content_description):
         """Refresh `AndroidViewClient` until content description is found."""
-        view = self.view_client.findViewWithContentDescription(
-            content_description
+        return self.wait_for_view(
+            lambda: self.find_by_content_description(content_description),
+            "View '{}'".format(content_description)
         )
-        while view is None:
-            self.refresh()
-            view = self.view_client.findViewWithContentDescription(
-                content_description
-            )
-        return view
-
 
 def prepare(use_case):
-    use_case.install_app()
-    use_case.open_app()
+    app_state.prepare_app(use_case)
     use_case.wait_for_id("com.tqrg.physalia.testapp:id/button_1")
     
 
 def cleanup(use_case):
     """Clean environment after running."""
-    use_case.uninstall_app()
+    app_state.release_app(use_case)
 
 
 APP_APK = get_path("../apks/testapp.apk")
@@ -191,13 +203,12 @@ find_by_content_use_case = AndroidViewClientUseCase(
 # -------------------------------------------------------------------------- #
 
 def prepare_tap(use_case):
-    use_case.install_app()
-    use_case.open_app()
+    app_state.prepare_app(use_case)
     use_case.elements = [
         use_case.wait_for_content_description("Button One"),
-        use_case.view_client.findViewWithContentDescription("Button Two"),
-        use_case.view_client.findViewWithContentDescription("Button Three"),
-        use_case.view_client.findViewWithContentDescription("Button Fab"),
+        use_case.find_by_content_description("Button Two"),
+        use_case.find_by_content_description("Button Three"),
+        use_case.find_by_content_description("Button Fab"),
     ]
     
 @minimum_execution_time(time_boundaries.TAP)
@@ -221,13 +232,12 @@ tap_use_case = AndroidViewClientUseCase(
 # -------------------------------------------------------------------------- #
 
 def prepare_long_tap(use_case):
-    use_case.install_app()
-    use_case.open_app()
+    app_state.prepare_app(use_case)
     use_case.elements = [
         use_case.wait_for_content_description("Button One"),
-        use_case.view_client.findViewWithContentDescription("Button Two"),
-        use_case.view_client.findViewWithContentDescription("Button Three"),
-        use_case.view_client.findViewWithContentDescription("Button Fab"),
+        use_case.find_by_content_description("Button Two"),
+        use_case.find_by_content_description("Button Three"),
+        use_case.find_by_content_description("Button Fab"),
     ]
     
 @minimum_execution_time(time_boundaries.LONG_TAP)
@@ -251,13 +261,12 @@ long_tap_use_case = AndroidViewClientUseCase(
 # -------------------------------------------------------------------------- #
 
 def prepare_dragndrop(use_case):    
-    use_case.install_app()
-    use_case.open_app()
+    app_state.prepare_app(use_case)
     button1 = use_case.wait_for_content_description("Button One")
-    button2 = use_case.view_client.findViewWithContentDescription("Button Two")
-    button3 = use_case.view_client.findViewWithContentDescription("Button Three")
-    button_fab = use_case.view_client.findViewWithContentDescription("Button Fab")
-    text_area = use_case.view_client.findViewWithContentDescription("Text Area")
+    button2 = use_case.find_by_content_description("Button Two")
+    button3 = use_case.find_by_content_description("Button Three")
+    button_fab = use_case.find_by_content_description("Button Fab")
+    text_area = use_case.find_by_content_description("Text Area")
 
     use_case.moves = [
         (button1, button2),
@@ -292,8 +301,7 @@ dragndrop_use_case = AndroidViewClientUseCase(
 # -------------------------------------------------------------------------- #
 
 def prepare_swipe(use_case):
-    use_case.install_app()
-    use_case.open_app()
+    app_state.prepare_app(use_case)
     paint = use_case.wait_for_content_description("Paint")
     use_case.x_i, use_case.y_i = (paint.getCenter()[0], paint.getY())
 
@@ -359,8 +367,7 @@ back_button_use_case = AndroidViewClientUseCase(
 # -------------------------------------------------------------------------- #
 
 def prepare_input_text(use_case):
-    use_case.install_app()
-    use_case.open_app()
+    app_state.prepare_app(use_case)
     use_case.text_field = use_case.wait_for_content_description("Text Field")
     
 @minimum_execution_time(time_boundaries.INPUT_TEXT)
@@ -0,0 +1,168 @@
+"""Reset the app under test between repetitions instead of reinstalling it.
+
+Apps are installed once per framework block, through the install cache.
+Between repetitions they are force-stopped, their data is cleared and the
+launch activity is started again. A full reinstall is only done when the
+reset does not bring the app back to the state it had after installation.
+"""
+
+import re
+import subprocess
+import time
+import click
+from physalia_automators import adb
+from physalia_automators import install_cache
+
+LAUNCH_TIMEOUT = 10
+
+
+class AppState(object):
+    """State of an app right after it was installed and launched.
+
+    Attributes:
+        app_apk             apk that was installed.
+        launch_activity     activity shown after launching the app, or
+                            None if the app was not launched.
+    """
+
+    def __init__(self, app_apk, launch_activity=None):  # noqa: D107
+        self.app_apk = app_apk
+        self.launch_activity = launch_activity
+
+
+class AppResetEngine(object):
+    """Keep track of the apps installed in the current framework block."""
+
+    apps = {}
+    test_apps = {}
+
+    @classmethod
+    def prepare_app(cls, use_case, launch=True):
+        """Bring the app of the use case to its starting state.
+
+        Args:
+            use_case    `AndroidUseCase` whose app is prepared.
+            launch      open the app after installing or resetting it.
+        """
+        state = cls.apps.get(use_case.app_pkg)
+        if state is None or state.app_apk != use_case.app_apk:
+            cls.install(use_case, launch)
+            return
+        cls.reset(use_case, launch)
+        if not cls.is_starting_state(use_case, state, launch):
+            click.secho(
+                "Reset of {} failed. Reinstalling...".format(use_case.app_pkg),
+                fg='yellow'
+            )
+            cls.install(use_case, launch, reinstall=True)
+
+    @classmethod
+    def prepare_test_app(cls, use_case):
+        """Install the test apk of the use case once per block."""
+        if cls.test_apps.get(use_case.test_pkg) != use_case.test_apk:
+            use_case.install_test()
+            cls.test_apps[use_case.test_pkg] = use_case.test_apk
+
+    @classmethod
+    def install(cls, use_case, launch=True, reinstall=False):
+        """Install the app and save its starting state.
+
+        Args:
+            use_case    `AndroidUseCase` whose app is installed.
+            launch      open the app after installing it.
+            reinstall   uninstall the app first, even if the same build is
+                        already installed.
+        """
+        if reinstall:
+            cls.uninstall(use_case.app_pkg)
+        click.secho("Installing {}".format(use_case.app_apk), fg='blue')
+        install_cache.install_apk(use_case.app_apk, use_case.app_pkg)
+        # a build kept from a previous block may have data left
+        adb.shell("am force-stop {}".format(use_case.app_pkg))
+        adb.shell("pm clear {}".format(use_case.app_pkg))
+        launch_activity = None
+        if launch:
+            use_case.open_app()
+            launch_activity = cls.wait_for_app(use_case.app_pkg)
+        cls.apps[use_case.app_pkg] = AppState(use_case.app_apk, launch_activity)
+
+    @classmethod
+    def reset(cls, use_case, launch=True):
+        """Stop the app, clear its data and launch it again."""
+        click.secho("Resetting app {}".format(use_case.app_pkg), fg='blue')
+        adb.shell("am force-stop {}".format(use_case.app_pkg))
+        adb.shell("pm clear {}".format(use_case.app_pkg))
+        state = cls.apps[use_case.app_pkg]
+        if launch and state.launch_activity:
+            adb.shell("am start -W -n {}".format(state.launch_activity))
+        elif launch:
+            use_case.open_app()
+
+    @classmethod
+    def is_starting_state(cls, use_case, state, launch=True):
+        """Check whether the app is back to its state after installation."""
+        if install_cache.installed_path(use_case.app_pkg) is None:
+            return False
+        if launch:
+            activity = cls.wait_for_app(use_case.app_pkg)
+            return activity is not None and activity == state.launch_activity
+        return not cls.is_running(use_case.app_pkg)
+
+    @staticmethod
+    def is_running(app_pkg):
+        """Check whether a process of the app is alive."""
+        processes = adb.shell("ps").splitlines()
+        return any(
+            line.split() and line.split()[-1] == app_pkg for line in processes
+        )
+
+    @staticmethod
+    def get_resumed_activity():
+        """Get the component of the activity in the foreground."""
+        output = adb.shell(
+            "dumpsys activity activities | grep mResumedActivity", check=False
+        )
+        match = re.search(r"(\S+/\S+)", output)
+        return match and match.group(1)
+
+    @classmethod
+    def wait_for_app(cls, app_pkg, timeout=LAUNCH_TIMEOUT):
+        """Wait until an activity of the app is in the foreground."""
+        start = time.time()
+        while time.time() - start < timeout:
+            activity = cls.get_resumed_activity()
+            if activity and activity.startswith(app_pkg + "/"):
+                return activity
+            time.sleep(0.2)
+        return None
+
+    @staticmethod
+    def release_app(use_case):
+        """Stop the app after a repetition."""
+        adb.shell("am force-stop {}".format(use_case.app_pkg))
+
+    @staticmethod
+    def uninstall(app_pkg):
+        """Uninstall a package, ignoring whether it was installed."""
+        try:
+            adb.uninstall(app_pkg)
+        except subprocess.CalledProcessError:
+            pass
+
+    @classmethod
+    def finish_block(cls):
+        """Stop the apps of the framework block and forget their state.
+
+        Apps stay installed so that the install cache can skip them in the
+        next blocks.
+        """
+        for app_pkg in cls.apps:
+            adb.shell("am force-stop {}".format(app_pkg))
+        cls.apps.clear()
+        cls.test_apps.clear()
+
+
+prepare_app = AppResetEngine.prepare_app
+prepare_test_app = AppResetEngine.prepare_test_app
+release_app = AppResetEngine.release_app
+finish_block = AppResetEngine.finish_block
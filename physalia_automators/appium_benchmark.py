@@ -0,0 +1,81 @@
+"""Compare Appium performance profiles.
+
+Runs every Appium interaction under each performance profile and shows
+the mean energy consumption and duration of each combination.
+
+Example:
+        ``$ python physalia_automators/appium_benchmark.py 30 profiles.csv``
+"""
+
+# pylint: disable=no-value-for-parameter
+# pylint: disable=missing-docstring
+
+import csv
+import time
+import click
+import numpy as np
+from physalia.power_meters import MonsoonPowerMeter
+from physalia_automators import appium_usecase
+from physalia_automators import appium_profiles
+from physalia_automators.cli import evaluate_appium, exit_gracefully
+
+COLUMN_USE_CASE = 1
+COLUMN_DURATION = 5
+COLUMN_ENERGY = 6
+
+
+@click.command()
+@click.argument('count', default=30, type=click.IntRange(min=1))
+@click.argument('output', default="appium_profiles.csv",
+                type=click.Path(dir_okay=False))
+@click.option('-p', '--profile', 'profiles', multiple=True,
+              type=click.Choice(appium_profiles.profile_names()),
+              help="Profile to benchmark (default: all of them).")
+def tool(count, output, profiles):
+    """Run every Appium interaction under each performance profile."""
+    if not appium_usecase.AppiumUseCase.appium_is_installed():
+        click.secho("Appium is not installed.", fg="red")
+        return
+    profiles = [
+        appium_profiles.get_profile(name)
+        for name in profiles or appium_profiles.profile_names()
+    ]
+    power_meter = MonsoonPowerMeter(voltage=3.8, serial=12886)
+    for profile in profiles:
+        click.secho("\n\nBenchmarking Appium profile {}...".format(profile),
+                    fg='blue', bold=True)
+        appium_usecase.AppiumUseCase.performance_profile = profile
+        evaluate_appium(appium_usecase.use_cases, power_meter, count, output)
+    report(output, profiles)
+
+
+def report(filename, profiles):
+    """Show the mean energy and duration of each interaction per profile."""
+    samples = {}
+    with open(filename) as results_file:
+        for row in csv.reader(results_file):
+            samples.setdefault(row[COLUMN_USE_CASE], []).append(
+                (float(row[COLUMN_ENERGY]), float(row[COLUMN_DURATION]))
+            )
+    click.secho("\n{:<24}{:<16}{:>12}{:>12}".format(
+        "Interaction", "Profile", "Energy (J)", "Time (s)"), fg='blue')
+    for interaction, use_case in sorted(appium_usecase.use_cases.items()):
+        if use_case is None:
+            continue
+        for profile in profiles:
+            rows = samples.get(profile.use_case_name(use_case.base_name))
+            if not rows:
+                continue
+            energy, duration = np.mean(rows, axis=0)
+            click.secho("{:<24}{:<16}{:>12.3f}{:>12.1f}".format(
+                interaction, profile.name, energy, duration))
+
+
+if __name__ == '__main__':
+    start_time = time.time()
+    try:
+        tool()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        exit_gracefully(start_time)
@@ -0,0 +1,83 @@
+"""Performance profiles for the Appium sessions.
+
+A profile tunes the performance knobs of the UiAutomator engines: how long
+to wait for the app to be idle, whether unimportant views are left out of
+the layout hierarchy and whether window animations run. Profiles never
+change the engine (``automationName``), so that they are compared with the
+default profile on the same engine. Measurements of non-default profiles
+carry the name of the profile in the use case name, e.g.
+``Appium[fast]-tap``.
+
+A profile whose settings are rejected by the session fails its runs
+instead of measuring the default behaviour under its name.
+"""
+
+
+class PerformanceProfile(object):
+    """Named set of session capabilities and settings.
+
+    Args:
+        name            name of the profile.
+        capabilities    capabilities added to the desired capabilities.
+        settings        session settings applied after the session starts.
+    """
+
+    def __init__(self, name, capabilities=None, settings=None):  # noqa: D107
+        self.name = name
+        self.capabilities = capabilities or {}
+        self.settings = settings or {}
+
+    def use_case_name(self, name):
+        """Get the name of a use case measured with this profile."""
+        if self is DEFAULT:
+            return name
+        framework, _, interaction = name.partition("-")
+        return "{}[{}]-{}".format(framework, self.name, interaction)
+
+    def __str__(self):
+        """Name of the profile."""
+        return self.name
+
+
+DEFAULT = PerformanceProfile("default")
+
+FAST = PerformanceProfile(
+    "fast",
+    capabilities={
+        'ignoreUnimportantViews': True,
+        'disableWindowAnimation': True,
+    },
+    settings={
+        'waitForIdleTimeout': 0,
+        'actionAcknowledgmentTimeout': 0,
+        'ignoreUnimportantViews': True,
+    }
+)
+
+MINIMAL_IDLE = PerformanceProfile(
+    "minimal-idle",
+    settings={
+        'waitForIdleTimeout': 0,
+        'actionAcknowledgmentTimeout': 0,
+    }
+)
+
+PROFILES = [DEFAULT, FAST, MINIMAL_IDLE]
+
+
+def get_profile(name):
+    """Get a profile by name.
+
+    Raises:
+        KeyError: there is no profile with that name.
+
+    """
+    for profile in PROFILES:
+        if profile.name == name:
+            return profile
+    raise KeyError(name)
+
+
+def profile_names():
+    """Get the names of the available profiles."""
+    return [profile.name for profile in PROFILES]
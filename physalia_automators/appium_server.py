@@ -0,0 +1,134 @@
+"""Start, supervise and stop an Appium server.
+
+The server listens in a free port, so each worker process (one per
+device) runs its own server. Startup is over as soon as the ``/status``
+endpoint answers, which is polled with exponential backoff. If the server
+crashes, it is started again the next time a use case needs it.
+"""
+
+import json
+import socket
+import subprocess
+import time
+import click
+from retrying import Retrying
+from physalia.exceptions import PhysaliaExecutionFailed
+from physalia_automators.utils import get_free_port
+
+try:
+    from urllib2 import urlopen, URLError
+except ImportError:
+    from urllib.request import urlopen
+    from urllib.error import URLError
+
+STARTUP_TIMEOUT = 120
+STOP_TIMEOUT = 10
+
+
+class ServerNotReady(Exception):
+    """The server does not answer its status endpoint yet."""
+
+
+class AppiumServer(object):
+    """Appium server process.
+
+    Args:
+        command     command that runs the server; ``--port`` and
+                    ``--bootstrap-port`` are appended.
+        port        port of the server (default: a free port).
+        host        host where the server listens.
+    """
+
+    def __init__(self, command=('appium', '--log-level', 'error'),
+                 port=None, host='127.0.0.1'):  # noqa: D107
+        self.command = list(command)
+        self.port = port
+        self.bootstrap_port = None
+        self.host = host
+        self.process = None
+
+    @property
+    def url(self):
+        """Url of the WebDriver endpoint of the server."""
+        return "http://{}:{}/wd/hub".format(self.host, self.port)
+
+    def is_alive(self):
+        """Check whether the server process is running."""
+        return self.process is not None and self.process.poll() is None
+
+    def is_ready(self):
+        """Check whether the server answers its status endpoint."""
+        try:
+            response = urlopen(self.url + "/status", timeout=2)
+            try:
+                status = json.loads(response.read().decode('utf-8'))
+            finally:
+                response.close()
+        except (URLError, socket.error, ValueError):
+            return False
+        return status.get('status', 0) == 0
+
+    def start(self, timeout=STARTUP_TIMEOUT):
+        """Start the server and wait until it is ready.
+
+        Args:
+            timeout     seconds to wait for the server to be ready.
+        """
+        if self.port is None:
+            self.port = get_free_port()
+        if self.bootstrap_port is None:
+            # the port forwarded to the device must not clash either
+            self.bootstrap_port = get_free_port()
+        click.secho("Starting Appium in port {}...".format(self.port),
+                    fg='blue')
+        self.process = subprocess.Popen(self.command + [
+            '--port', str(self.port),
+            '--bootstrap-port', str(self.bootstrap_port)
+        ])
+        try:
+            self.wait_until_ready(timeout)
+        except ServerNotReady:
+            self.stop()
+            raise PhysaliaExecutionFailed(
+                "Appium did not start in {}s.".format(timeout)
+            )
+
+    def wait_until_ready(self, timeout=STARTUP_TIMEOUT):
+        """Poll the status endpoint, with backoff, until it is ready."""
+        Retrying(
+            wait_exponential_multiplier=100, wait_exponential_max=2000,
+            stop_max_delay=timeout*1000,
+            retry_on_exception=lambda error: isinstance(error, ServerNotReady)
+        ).call(self.check_ready)
+
+    def check_ready(self):
+        """Raise `ServerNotReady` unless the server is ready."""
+        if not self.is_alive():
+            raise PhysaliaExecutionFailed("Appium has exited.")
+        if not self.is_ready():
+            raise ServerNotReady()
+
+    def ensure_running(self):
+        """Start the server again if it has crashed."""
+        if self.process is not None and not self.is_alive():
+            click.secho("Appium has crashed. Restarting...", fg='yellow')
+            self.start()
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """Stop the server, killing it if it does not exit in time.
+
+        Args:
+            timeout     seconds to wait for the server to exit.
+        """
+        if not self.is_alive():
+            self.process = None
+            return
+        click.secho("Stopping Appium...", fg='blue')
+        self.process.terminate()
+        deadline = time.time() + timeout
+        while self.process.poll() is None and time.time() < deadline:
+            time.sleep(0.1)
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
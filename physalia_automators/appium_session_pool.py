@@ -0,0 +1,101 @@
+"""Keep Appium sessions warm across use cases.
+
+Creating a session bootstraps the automation server in the device and
+installs the app, which takes several seconds. The pool keeps one session
+per set of capabilities (and thus per device) for the whole Appium block.
+Use cases reset the app between repetitions instead of quitting the
+session, and a session is only rebuilt when it no longer answers.
+"""
+
+import socket
+import click
+from appium import webdriver
+from selenium.common.exceptions import WebDriverException
+from physalia.exceptions import PhysaliaExecutionFailed
+
+SERVER_URL = 'http://localhost:4723/wd/hub'
+
+
+class AppiumSessionPool(object):
+    """Sessions of the current process, keyed by their capabilities."""
+
+    sessions = {}
+
+    @staticmethod
+    def key(desired_caps, settings=None):
+        """Get a hashable key for a set of capabilities and settings."""
+        return (tuple(sorted(desired_caps.items())),
+                tuple(sorted((settings or {}).items())))
+
+    @classmethod
+    def get(cls, desired_caps, server_url=SERVER_URL, settings=None):
+        """Get a live session with the given capabilities.
+
+        Args:
+            desired_caps    capabilities of the session.
+            server_url      url of the Appium server.
+            settings        session settings to apply when it starts.
+        """
+        key = cls.key(desired_caps, settings)
+        driver = cls.sessions.get(key)
+        if driver is not None and not cls.is_alive(driver):
+            click.secho("Appium session has died. Starting a new one...",
+                        fg='yellow')
+            cls.discard(key)
+            driver = None
+        if driver is None:
+            driver = webdriver.Remote(server_url,
+                                      desired_capabilities=desired_caps)
+            if settings:
+                try:
+                    cls.update_settings(driver, settings)
+                except PhysaliaExecutionFailed:
+                    driver.quit()
+                    raise
+            cls.sessions[key] = driver
+        return driver
+
+    @staticmethod
+    def update_settings(driver, settings):
+        """Apply settings to a session.
+
+        Raises:
+            PhysaliaExecutionFailed: the session rejected the settings.
+
+        """
+        try:
+            driver.update_settings(settings)
+        except WebDriverException as error:
+            raise PhysaliaExecutionFailed(
+                "Appium settings {} were not applied: {}".format(
+                    settings, error)
+            )
+
+    @staticmethod
+    def is_alive(driver):
+        """Check whether the session still answers."""
+        try:
+            driver.current_activity
+            return True
+        except (WebDriverException, socket.error):
+            return False
+
+    @classmethod
+    def discard(cls, key):
+        """Quit and forget a session, ignoring whether it had died."""
+        driver = cls.sessions.pop(key, None)
+        if driver is not None:
+            try:
+                driver.quit()
+            except (WebDriverException, socket.error):
+                pass
+
+    @classmethod
+    def close_all(cls):
+        """Quit every session of the pool."""
+        for key in list(cls.sessions):
+            cls.discard(key)
+
+
+get = AppiumSessionPool.get
+close_all = AppiumSessionPool.close_all
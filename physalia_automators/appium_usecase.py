@@ -1,23 +1,145 @@
 """Interaction using Appium"""
 
 from whichcraft import which
-import subprocess
-from appium import webdriver
 from appium.webdriver.common.touch_action import TouchAction
+from appium.webdriver.common.mobileby import MobileBy
+from selenium.common.exceptions import (
+    WebDriverException, StaleElementReferenceException, NoSuchElementException
+)
+from selenium.webdriver.remote.command import Command
 import click
 from physalia.energy_profiler import AndroidUseCase
 from .utils import minimum_execution_time
 from . import time_boundaries
+from . import install_cache
+from . import app_state
+from . import appium_session_pool
+from . import appium_profiles
+from . import phases
+from . import run_notes
+from .appium_server import AppiumServer
 from .constants import loop_count
 
 import os
+import threading
 PATH = lambda p: os.path.abspath(
     os.path.join(os.path.dirname(__file__), p)
 )
 
+# errors of the sessions that do not implement a command
+UNSUPPORTED_COMMAND_ERRORS = (
+    "unknown command",
+    "unknown method",
+    "not implemented",
+    "not yet been implemented",
+)
+
+
+class ElementCache(object):
+    """Element handles of the Appium sessions, keyed by locator.
+
+    A cached handle is checked with a single light request before it is
+    handed out, and only stale handles are looked up again. Handles that
+    go stale while they are used are looked up again too, see
+    `CachedElement`.
+
+    Attributes:
+        hits        lookups answered with a cached handle.
+        misses      lookups that had to find the element.
+        stale       misses caused by a handle that went stale.
+    """
+
+    def __init__(self):  # noqa: D107
+        self.elements = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def find(self, driver, by, value, stale=False):
+        """Get the element of the session located by `by` and `value`.
+
+        Args:
+            driver      session of the element.
+            by          locator strategy.
+            value       locator.
+            stale       whether the cached handle is known to be stale.
+        """
+        key = (driver.session_id, by, value)
+        element = self.elements.get(key)
+        if element is not None and not stale:
+            try:
+                element.is_enabled()
+                self.hits += 1
+                return element
+            except (StaleElementReferenceException, NoSuchElementException):
+                stale = True
+        if stale:
+            self.stale += 1
+        self.misses += 1
+        element = driver.find_element(by, value)
+        self.elements[key] = element
+        return element
+
+    def find_by_accessibility_id(self, driver, accessibility_id):
+        """Get an element by accessibility id (content description)."""
+        return CachedElement(
+            self, driver, MobileBy.ACCESSIBILITY_ID, accessibility_id
+        )
+
+    def counters(self):
+        """Get the current ``(hits, misses, stale)`` counters."""
+        return (self.hits, self.misses, self.stale)
+
+
+class CachedElement(object):
+    """Element of an `ElementCache`, looked up again if it goes stale.
+
+    Works like the `WebElement` it wraps. An attribute or a call that
+    fails because the element is stale is retried once with a new handle.
+
+    Args:
+        cache       `ElementCache` of the element.
+        driver      session of the element.
+        by          locator strategy.
+        value       locator.
+    """
+
+    def __init__(self, cache, driver, by, value):  # noqa: D107
+        self.cache = cache
+        self.driver = driver
+        self.by = by
+        self.value = value
+        self.element = cache.find(driver, by, value)
+
+    def _retry_stale(self, function):
+        try:
+            return function(self.element)
+        except StaleElementReferenceException:
+            self.element = self.cache.find(self.driver, self.by, self.value,
+                                           stale=True)
+            return function(self.element)
+
+    def __getattr__(self, name):
+        """Get an attribute of the element, wrapping its methods."""
+        attribute = self._retry_stale(lambda element: getattr(element, name))
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            return self._retry_stale(
+                lambda element: getattr(element, name)(*args, **kwargs)
+            )
+        return call
+
+
 class AppiumUseCase(AndroidUseCase):
     """`AndroidUseCase` to use with `Appium`."""
 
+    server = None
+    server_lock = threading.Lock()
+    element_cache = ElementCache()
+    performance_profile = appium_profiles.DEFAULT
+
     # pylint: disable=too-many-arguments
     # Eight is reasonable in this case.
 
@@ -29,32 +151,79 @@ class AppiumUseCase(AndroidUseCase):
         )
         self.activity = activity
         self.driver=None
-    
-    def prepare(self):
-        """Prepare environment for running.
+        self.lookups = self.element_cache.counters()
 
-        Setup Appium driver in order to run experiments.
-        """
+    @property
+    def name(self):
+        """Name of the use case, tagged with the performance profile."""
+        return self.performance_profile.use_case_name(self.base_name)
+
+    @name.setter
+    def name(self, name):
+        self.base_name = name
+    
+    def desired_capabilities(self):
+        """Get the capabilities of the Appium session of the use case."""
         desired_caps = {}
         desired_caps['platformName'] = 'Android'
         desired_caps['platformVersion'] = '6.0.1'
         desired_caps['deviceName'] = '00e388b9e4931384'
+        if os.environ.get('ANDROID_SERIAL'):
+            desired_caps['udid'] = os.environ['ANDROID_SERIAL']
         desired_caps['app'] = self.app_apk
-        
-        self.driver = webdriver.Remote('http://localhost:4723/wd/hub', desired_capabilities=desired_caps)
+        desired_caps.update(self.performance_profile.capabilities)
+        return desired_caps
+
+    def prepare(self):
+        """Prepare environment for running.
+
+        Setup Appium driver in order to run experiments. The session is
+        shared with the other use cases and the app is reset instead.
+        """
+        with phases.phase("warm_up"):
+            self.server.ensure_running()
+            self.driver = appium_session_pool.get(
+                self.desired_capabilities(), self.server.url,
+                self.performance_profile.settings
+            )
+        app_state.prepare_app(self)
+        self.lookups = self.element_cache.counters()
         self._prepare()
+        click.secho("Element lookups: {} cached, {} resolved ({} stale)."
+                    .format(*self.lookup_counters()), dim=True)
         click.secho("Starting use case {}.".format(self.name), fg='green')
 
+    def lookup_counters(self):
+        """Get the ``(hits, misses, stale)`` element lookups of the run."""
+        return tuple(
+            now - before for now, before
+            in zip(self.element_cache.counters(), self.lookups)
+        )
+
+    def find_element(self, accessibility_id):
+        """Find an element by accessibility id through the element cache."""
+        return self.element_cache.find_by_accessibility_id(
+            self.driver, accessibility_id
+        )
+
     def cleanup(self):
-        """Clean environment after running."""
+        """Clean environment after running.
+
+        Element lookups of the run, stale handles included, are noted
+        with it.
+        """
+        hits, misses, stale = self.lookup_counters()
+        run_notes.note("element_cache_hits", hits)
+        run_notes.note("element_cache_misses", misses)
+        run_notes.note("element_cache_stale", stale)
         self._cleanup()
         # self.uninstall_app()
-        self.driver.quit()
+        app_state.release_app(self)
 
     def install_app(self):
         """Install App"""
         click.secho("Installing {}".format(self.app_apk), fg='blue')
-        self.driver.install_app(self.app_apk)
+        install_cache.install_apk(self.app_apk, self.app_pkg)
 
     def uninstall_app(self):
         """Uninstall app of the Android device."""
@@ -67,15 +236,150 @@ class AppiumUseCase(AndroidUseCase):
     
     @classmethod
     def start_appium_server(cls):
-        click.secho("Starting Appium...", fg='blue')
-        cls.process = subprocess.Popen(['appium', '--log-level', 'error'])
+        """Start an Appium server for this process, unless it is running.
+
+        Safe to call from a background warm-up and from the Appium block
+        at the same time: only one server is started.
+        """
+        with cls.server_lock:
+            if cls.server is not None and cls.server.is_alive():
+                return
+            cls.server = AppiumServer()
+            cls.server.start()
 
     @classmethod
     def stop_appium_server(cls):
-        click.secho("Stopping Appium...", fg='blue')
-        cls.process.terminate()
+        """Stop the Appium server of this process."""
+        with cls.server_lock:
+            cls.server.stop()
+
+
+def is_unsupported_command(error):
+    """Check whether an error says that the session lacks a command."""
+    message = str(error).lower()
+    return any(reason in message for reason in UNSUPPORTED_COMMAND_ERRORS)
+
+
+class GestureCompiler(object):
+    """Compile a sequence of gestures into a single W3C Actions request.
+
+    Element geometry is resolved when the gestures are added, so the
+    measured run only sends the compiled payload. Fingers are touch
+    pointers whose actions are aligned tick by tick, as W3C requires.
+
+    If a session answers that it does not know W3C Actions, its gestures
+    are replayed one by one with the Appium touch commands instead. Any
+    other error fails the run. The path taken is noted with the run as
+    ``gestures``: ``w3c`` or ``touch``.
+
+    Args:
+        fingers     number of touch pointers used by the gestures.
+    """
+
+    move_duration = 250
+    # whether each session supports W3C Actions, by session id
+    w3c_sessions = {}
+
+    def __init__(self, fingers=1):  # noqa: D107
+        self.fingers = fingers
+        self.ticks = []
+        self.gestures = []
+
+    @staticmethod
+    def top_left(element):
+        """Get the location of an element, as the touch commands use it."""
+        location = element.location
+        return (location['x'], location['y'])
+
+    @staticmethod
+    def center(element):
+        """Get the center of an element."""
+        location, size = element.location, element.size
+        return (location['x'] + size['width']//2,
+                location['y'] + size['height']//2)
+
+    def _tick(self, *actions):
+        actions = list(actions) + [None]*(self.fingers - len(actions))
+        self.ticks.append([
+            action or {'type': 'pause', 'duration': 0} for action in actions
+        ])
+
+    @staticmethod
+    def _move(point, duration=0):
+        return {'type': 'pointerMove', 'duration': duration,
+                'origin': 'viewport', 'x': int(point[0]), 'y': int(point[1])}
+
+    def tap(self, *points):
+        """Tap with one finger per point at the same time."""
+        self._tick(*[self._move(point) for point in points])
+        self._tick(*[{'type': 'pointerDown', 'button': 0} for _ in points])
+        self._tick(*[{'type': 'pointerUp', 'button': 0} for _ in points])
+        self.gestures.append(('tap', points))
+        return self
+
+    def swipe(self, start, end):
+        """Swipe with one finger from `start` to `end`."""
+        self._tick(self._move(start))
+        self._tick({'type': 'pointerDown', 'button': 0})
+        self._tick(self._move(end, self.move_duration))
+        self._tick({'type': 'pointerUp', 'button': 0})
+        self.gestures.append(('swipe', (start, end)))
+        return self
+
+    def drag(self, start, end, hold=1000):
+        """Long press at `start`, then move to `end` and release."""
+        self._tick(self._move(start))
+        self._tick({'type': 'pointerDown', 'button': 0})
+        self._tick({'type': 'pause', 'duration': hold})
+        self._tick(self._move(end, self.move_duration))
+        self._tick({'type': 'pointerUp', 'button': 0})
+        self.gestures.append(('drag', (start, end, hold)))
+        return self
+
+    def payload(self):
+        """Get the body of the W3C Actions request."""
+        return {'actions': [
+            {
+                'type': 'pointer',
+                'id': 'finger{}'.format(finger + 1),
+                'parameters': {'pointerType': 'touch'},
+                'actions': [tick[finger] for tick in self.ticks],
+            }
+            for finger in range(self.fingers)
+        ]}
+
+    def perform(self, driver):
+        """Send the compiled gestures to the session."""
+        if self.w3c_sessions.get(driver.session_id, True):
+            try:
+                driver.execute(Command.W3C_ACTIONS, self.payload())
+                self.w3c_sessions[driver.session_id] = True
+                run_notes.note("gestures", "w3c")
+                return
+            except WebDriverException as error:
+                if not is_unsupported_command(error):
+                    raise
+                click.secho("W3C Actions are not supported ({}). Sending "
+                            "gestures one by one.".format(error), fg='yellow')
+                self.w3c_sessions[driver.session_id] = False
+        self.replay(driver)
+        run_notes.note("gestures", "touch")
+
+    def replay(self, driver):
+        """Send the gestures one by one with the Appium touch commands."""
+        for gesture, args in self.gestures:
+            if gesture == 'tap':
+                driver.tap(list(args))
+            elif gesture == 'swipe':
+                (start_x, start_y), (end_x, end_y) = args
+                driver.swipe(start_x, start_y, end_x, end_y)
+            else:
+                (start_x, start_y), (end_x, end_y), hold = args
+                TouchAction(driver).long_press(
+                    x=start_x, y=start_y, duration=hold
+                ).move_to(x=end_x, y=end_y).release().perform()
+
 
-        
 # -------------------------------------------------------------------------- #
 
 @minimum_execution_time(seconds=time_boundaries.FIND_BY_ID)
@@ -95,6 +399,7 @@ def run_find_by_id(use_case):
         
     except Exception as e:
         click.secho("Error: {}.".format(e), fg='red')
+        raise
 
 find_by_id_use_case = AppiumUseCase(
     "Appium-find_by_id",
@@ -124,6 +429,7 @@ def run_find_by_description(use_case):
             use_case.driver.find_element_by_accessibility_id('Text Area')
     except Exception as e:
         click.secho("Error: {}.".format(e), fg='red')
+        raise
 
 find_by_description_use_case = AppiumUseCase(
     "Appium-find_by_description",
@@ -153,6 +459,7 @@ def run_find_by_content(use_case):
 
     except Exception as e:
         click.secho("Error: {}.".format(e), fg='red')
+        raise
 
 find_by_content_use_case = AppiumUseCase(
     "Appium-find_by_content",
@@ -167,10 +474,10 @@ find_by_content_use_case = AppiumUseCase(
 
 # -------------------------------------------------------------------------- #
 def prepare_tap(use_case):
-    use_case.button1 = use_case.driver.find_element_by_accessibility_id('Button One')
-    use_case.button2 = use_case.driver.find_element_by_accessibility_id('Button Two')
-    use_case.button3 = use_case.driver.find_element_by_accessibility_id('Button Three')
-    use_case.button_fab = use_case.driver.find_element_by_accessibility_id('Button Fab')
+    use_case.button1 = use_case.find_element('Button One')
+    use_case.button2 = use_case.find_element('Button Two')
+    use_case.button3 = use_case.find_element('Button Three')
+    use_case.button_fab = use_case.find_element('Button Fab')
 
 def run_tap(use_case):
     """Run script to test tap."""
@@ -186,6 +493,7 @@ def run_tap(use_case):
             simple_routine()
     except Exception as e:
         click.secho("Error: {}.".format(e), fg='red')
+        raise
 
 tap_use_case = AppiumUseCase(
     "Appium-tap",
@@ -203,10 +511,10 @@ tap_use_case = AppiumUseCase(
 
 def prepare_long_tap(use_case):
     use_case.elements = [
-        use_case.driver.find_element_by_accessibility_id('Button One'),
-        use_case.driver.find_element_by_accessibility_id('Button Two'),
-        use_case.driver.find_element_by_accessibility_id('Button Three'),
-        use_case.driver.find_element_by_accessibility_id('Button Fab'),
+        use_case.find_element('Button One'),
+        use_case.find_element('Button Two'),
+        use_case.find_element('Button Three'),
+        use_case.find_element('Button Fab'),
     ]
     use_case.action = TouchAction(use_case.driver)
 
@@ -223,6 +531,7 @@ def run_long_tap(use_case):
             simple_routine()
     except Exception as e:
         click.secho("Error: {}.".format(e), fg='red')
+        raise
 
 long_tap_use_case = AppiumUseCase(
     "Appium-long_tap",
@@ -239,31 +548,31 @@ long_tap_use_case = AppiumUseCase(
 # -------------------------------------------------------------------------- #
 
 def prepare_multi_finger_tap(use_case):
-    use_case.elements = [
-        use_case.driver.find_element_by_accessibility_id('Button One'),
-        use_case.driver.find_element_by_accessibility_id('Button Two'),
-        use_case.driver.find_element_by_accessibility_id('Button Three'),
-        use_case.driver.find_element_by_accessibility_id('Button Fab'),
-        use_case.driver.find_element_by_accessibility_id('Text Area'),
+    elements = [
+        use_case.find_element('Button One'),
+        use_case.find_element('Button Two'),
+        use_case.find_element('Button Three'),
+        use_case.find_element('Button Fab'),
+        use_case.find_element('Text Area'),
     ]
+    locations = [GestureCompiler.top_left(el) for el in elements]
+    use_case.gestures = GestureCompiler(fingers=2)
+    for idx, location in enumerate(locations):
+        use_case.gestures.tap(location, locations[idx-1])
 
 def run_multi_finger_tap(use_case):
     """Run script to test multi finger tap."""
 
     @minimum_execution_time(seconds=time_boundaries.MULTI_FINGER_TAP)
     def simple_routine():
-        for idx, el in enumerate(use_case.elements):
-            prev_el = use_case.elements[idx-1]
-            use_case.driver.tap([
-                (el.location['x'],el.location['y']),
-                (prev_el.location['x'],prev_el.location['y'])
-            ])
+        use_case.gestures.perform(use_case.driver)
 
     try:
         for i in range(loop_count.MULTI_FINGER_TAP):
             simple_routine()
     except Exception as e:
         click.secho("Error: {}.".format(e), fg='red')
+        raise
 
 multi_finger_tap_use_case = AppiumUseCase(
     "Appium-multi_finger_tap",
@@ -280,17 +589,21 @@ multi_finger_tap_use_case = AppiumUseCase(
 # -------------------------------------------------------------------------- #
 
 def prepare_dragndrop(use_case):
-    button1 = use_case.driver.find_element_by_accessibility_id('Button One')
-    button2 = use_case.driver.find_element_by_accessibility_id('Button Two')
-    button3 = use_case.driver.find_element_by_accessibility_id('Button Three')
-    button_fab = use_case.driver.find_element_by_accessibility_id('Button Fab')
-    text_area = use_case.driver.find_element_by_accessibility_id('Text Area')
-    use_case.moves = [
+    button1 = use_case.find_element('Button One')
+    button2 = use_case.find_element('Button Two')
+    button3 = use_case.find_element('Button Three')
+    button_fab = use_case.find_element('Button Fab')
+    text_area = use_case.find_element('Text Area')
+    moves = [
         (button1, button2),
         (button2, button3),
         (button_fab, button3),
         (button_fab, text_area),
     ]
+    use_case.gestures = GestureCompiler()
+    for first, second in moves:
+        use_case.gestures.drag(GestureCompiler.center(first),
+                               GestureCompiler.center(second))
 
 @minimum_execution_time(seconds=time_boundaries.DRAGNDROP)
 def run_dragndrop(use_case):
@@ -298,14 +611,14 @@ def run_dragndrop(use_case):
 
     @minimum_execution_time(seconds=time_boundaries.DRAGNDROP_UNIT)
     def simple_routine():
-        for first, second in use_case.moves:
-            use_case.driver.drag_and_drop(first, second)
+        use_case.gestures.perform(use_case.driver)
 
     try:
         for i in range(10):
             simple_routine()
     except Exception as e:
         click.secho("Error: {}.".format(e), fg='red')
+        raise
 
 dragndrop_use_case = AppiumUseCase(
     "Appium-dragndrop",
@@ -322,26 +635,31 @@ dragndrop_use_case = AppiumUseCase(
 # -------------------------------------------------------------------------- #
 
 def prepare_swipe(use_case):
-    paint = use_case.driver.find_element_by_accessibility_id('Paint')
-    use_case.x_i, use_case.y_i = (paint.location['x'], paint.location['y'])
+    paint = use_case.find_element('Paint')
+    x_i, y_i = GestureCompiler.top_left(paint)
+    use_case.gestures = []
+    for i in range(loop_count.SWIPE):
+        offset_y = i*8
+        gestures = GestureCompiler()
+        # Swipe left
+        gestures.swipe((x_i, y_i+offset_y+1), (x_i+70, y_i+offset_y+1))
+        # Swipe Right
+        gestures.swipe((x_i, y_i+offset_y), (x_i+1000, y_i+offset_y))
+        use_case.gestures.append(gestures)
 
 def run_swipe(use_case):
     """Run script to test swipe."""
 
     @minimum_execution_time(seconds=time_boundaries.SWIPE)
-    def simple_routine(offset_y):
-        # Swipe left
-        x_f, y_f = (use_case.x_i+70, use_case.y_i+offset_y+1)
-        use_case.driver.swipe(use_case.x_i, use_case.y_i+offset_y+1, x_f, y_f)
-        # Swipe Right
-        x_f, y_f = (use_case.x_i+1000, use_case.y_i+offset_y)
-        use_case.driver.swipe(use_case.x_i, use_case.y_i+offset_y, x_f, y_f)
+    def simple_routine(gestures):
+        gestures.perform(use_case.driver)
 
     try:
-        for i in range(loop_count.SWIPE):
-            simple_routine(i*8)
+        for gestures in use_case.gestures:
+            simple_routine(gestures)
     except Exception as e:
         click.secho("Error: {}.".format(e), fg='red')
+        raise
 
 swipe_use_case = AppiumUseCase(
     "Appium-swipe",
@@ -358,7 +676,7 @@ swipe_use_case = AppiumUseCase(
 # -------------------------------------------------------------------------- #
 
 def prepare_pinch_and_spread(use_case):
-    use_case.paint = use_case.driver.find_element_by_accessibility_id('Paint')
+    use_case.paint = use_case.find_element('Paint')
 
 def run_pinch_and_spread(use_case):
     """Run script to test multi finger tap."""
@@ -384,6 +702,7 @@ def run_pinch_and_spread(use_case):
         simple_routine()
     except Exception as e:
         click.secho("Error: {}.".format(e), fg='red')
+        raise
 
 pinch_and_spread_use_case = AppiumUseCase(
     "Appium-pinch_and_spread",
@@ -400,7 +719,7 @@ pinch_and_spread_use_case = AppiumUseCase(
 # -------------------------------------------------------------------------- #
 
 def prepare_back_button(use_case):
-    use_case.paint = use_case.driver.find_element_by_accessibility_id('Paint')
+    use_case.paint = use_case.find_element('Paint')
 
 @minimum_execution_time(seconds=time_boundaries.BACK_BUTTON)
 def run_back_button(use_case):
@@ -415,6 +734,7 @@ def run_back_button(use_case):
             simple_routine()
     except Exception as e:
         click.secho("Error: {}.".format(e), fg='red')
+        raise
 
 back_button_use_case = AppiumUseCase(
     "Appium-back_button",
@@ -431,7 +751,7 @@ back_button_use_case = AppiumUseCase(
 # -------------------------------------------------------------------------- #
 
 def prepare_input_text(use_case):
-    use_case.text_field = use_case.driver.find_element_by_accessibility_id('Text Field')
+    use_case.text_field = use_case.find_element('Text Field')
 
 @minimum_execution_time(seconds=time_boundaries.INPUT_TEXT)
 def run_input_text(use_case):
@@ -466,3 +786,12 @@ use_cases = {
     "back_button": back_button_use_case,
     "input_text": input_text_use_case, #fixme
 }
+
+
+def warm_up():
+    """Start the Appium server ahead of the Appium block.
+
+    The server only runs on the host until a session is created.
+    """
+    if AppiumUseCase.appium_is_installed():
+        AppiumUseCase.start_appium_server()
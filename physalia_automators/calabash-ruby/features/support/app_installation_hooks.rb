@@ -15,7 +15,8 @@ Before do |scenario|
       log 'First scenario in feature - reinstalling apps'
     end
 
-    ensure_app_installed
+    # physalia installs the prebuilt apps once per block
+    ensure_app_installed unless ENV['PHYSALIA_SKIP_INSTALL'] == '1'
     clear_app_data
     FeatureMemory.feature = feature
     FeatureMemory.invocation = 1
@@ -1,7 +1,14 @@
 require 'calabash-android/management/adb'
 require 'calabash-android/operations'
 
+# In batched runs (PHYSALIA_BATCH=1) every repetition starts like a run of its
+# own: the app data is cleared and the app is relaunched with the test server
+# before the START marker, and the test server is shut down after the END
+# marker, whether the repetition passed or failed.
+
 Before do |scenario|
+  clear_app_data if ENV['PHYSALIA_BATCH'] == '1' && $physalia_relaunch
+  $physalia_relaunch = true
   start_test_server_in_background
 end
 
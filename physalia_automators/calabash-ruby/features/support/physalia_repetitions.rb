@@ -0,0 +1,33 @@
+# Repetition markers for batched runs (PHYSALIA_BATCH=1).
+#
+# Support files are loaded in alphabetical order: the Before hook below runs
+# after the app has been relaunched and the After hook runs before the test
+# server is shut down, so the markers only wrap the steps of each scenario.
+# Markers go straight to stdout to bypass the formatters. Each END marker
+# says whether its own repetition passed.
+
+def physalia_marker(*fields)
+  $stdout.puts(fields.join(' '))
+  $stdout.flush
+end
+
+Before do |scenario|
+  if ENV['PHYSALIA_BATCH'] == '1'
+    $physalia_repetition = ($physalia_repetition || -1) + 1
+    $physalia_repetition_start = Time.now.to_f
+    physalia_marker('PHYSALIA_REPETITION_START', $physalia_repetition,
+                    $physalia_repetition_start)
+  end
+end
+
+After do |scenario|
+  if ENV['PHYSALIA_BATCH'] == '1'
+    failed = scenario.failed?
+    # pad each repetition like a single run is padded on the host
+    minimum = ENV['PHYSALIA_MINIMUM_EXECUTION_TIME'].to_f
+    remaining = $physalia_repetition_start + minimum - Time.now.to_f
+    sleep(remaining) if remaining > 0 && !failed
+    physalia_marker('PHYSALIA_REPETITION_END', $physalia_repetition,
+                    Time.now.to_f, failed ? 'failed' : 'passed')
+  end
+end
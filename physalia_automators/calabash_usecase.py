@@ -3,17 +3,261 @@
 Requires ruby >=2, calabash-android, and cucumber
 Installation details:
 https://github.com/calabash/calabash-android
+
+In batched mode, a single cucumber process runs a feature that repeats the
+scenario of the use case. The support hooks clear the app data and relaunch
+the app before each repetition, and print a marker at the boundaries of its
+steps, which are used to slice the power trace of the block.
+
+The re-signed app and its test server are built once per app build,
+keystore and Calabash version, and cucumber is run directly with the
+prebuilt artifacts. The app is re-signed as a copy in the cache directory,
+so the apk of the use case is never modified. This skips the checks that ``calabash-android run``
+does on every call, and the reinstall of both apps on every feature.
 """
 
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
 import subprocess
+import time
 import click
 from whichcraft import which
 from physalia.energy_profiler import AndroidUseCase
-from .utils import minimum_execution_time
+from physalia.exceptions import PhysaliaExecutionFailed
+from .utils import minimum_execution_time, get_free_port
+from .power_trace import BatchedUseCaseMixin
+from .power_trace import REPETITION_START, REPETITION_END
 from . import time_boundaries
+from . import app_state
+from . import install_cache
+from . import phases
+
+CALABASH_DIR = "./physalia_automators/calabash-ruby/"
+BATCH_FEATURE = "physalia_batch_{pid}.feature"
+DEFAULT_KEYSTORE = os.path.join(
+    os.path.expanduser("~"), ".android", "debug.keystore"
+)
+ARTIFACTS_FILE = os.path.join(
+    os.path.expanduser("~"), ".physalia_automators", "calabash_artifacts.json"
+)
+ARTIFACTS_DIR = os.path.join(
+    os.path.expanduser("~"), ".physalia_automators", "calabash"
+)
+
+
+def feature_path(feature):
+    """Get the path of a feature file."""
+    return os.path.join(CALABASH_DIR, "features", feature)
+
+
+def md5sum(path):
+    """Get the MD5 of a file, as Calabash names test servers with it."""
+    md5 = hashlib.md5()
+    with open(path, 'rb') as md5_file:
+        for chunk in iter(lambda: md5_file.read(1 << 20), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def aapt_path():
+    """Get the path of the newest aapt in the Android SDK."""
+    candidates = sorted(glob.glob(os.path.join(
+        os.environ.get('ANDROID_HOME', ''), "build-tools", "*", "aapt"
+    )))
+    return candidates[-1] if candidates else which("aapt")
 
 
-class CalabashUseCase(AndroidUseCase):
+class CalabashArtifacts(object):
+    """Re-signed app and test server built for an app build.
+
+    Builds are cached in `ARTIFACTS_FILE`, keyed by the SHA-256 of the
+    app, the SHA-256 of the keystore and the version of Calabash. Re-signed
+    apps are kept in `ARTIFACTS_DIR`.
+
+    Args:
+        app_path        path of the re-signed copy of the app.
+        test_server     file name of the test server in ``test_servers``.
+        main_activity   launchable activity of the app.
+    """
+
+    versions = {}
+
+    def __init__(self, app_path, test_server,
+                 main_activity):  # noqa: D107
+        self.app_path = app_path
+        self.test_server = test_server
+        self.main_activity = main_activity
+
+    @property
+    def test_server_path(self):
+        """Path of the test server."""
+        return os.path.join(CALABASH_DIR, "test_servers", self.test_server)
+
+    @classmethod
+    def calabash_version(cls):
+        """Get the version of calabash-android."""
+        if 'calabash-android' not in cls.versions:
+            cls.versions['calabash-android'] = subprocess.check_output(
+                ["calabash-android", "version"], universal_newlines=True
+            ).strip()
+        return cls.versions['calabash-android']
+
+    @staticmethod
+    def keystore():
+        """Get the keystore that Calabash uses to sign the apps."""
+        try:
+            settings_path = os.path.join(CALABASH_DIR, ".calabash_settings")
+            with open(settings_path) as settings_file:
+                settings = json.load(settings_file)
+            return os.path.join(CALABASH_DIR, settings["keystore_location"])
+        except (IOError, ValueError, KeyError):
+            return DEFAULT_KEYSTORE
+
+    @classmethod
+    def key(cls, app_apk):
+        """Get the cache key of an app build."""
+        keystore = cls.keystore()
+        return "{}:{}:{}".format(
+            install_cache.local_digest(app_apk),
+            install_cache.local_digest(keystore)
+            if os.path.isfile(keystore) else None,
+            cls.calabash_version()
+        )
+
+    @staticmethod
+    def main_activity(app_apk):
+        """Get the launchable activity of an app."""
+        output = subprocess.check_output(
+            [aapt_path(), "dump", "badging", app_apk], universal_newlines=True
+        )
+        match = re.search(r"launchable-activity: name='([^']+)'", output)
+        if match is None:
+            raise PhysaliaExecutionFailed(
+                "{} has no launchable activity.".format(app_apk)
+            )
+        return match.group(1)
+
+    @classmethod
+    def get(cls, app_apk):
+        """Get the artifacts of an app, building them the first time."""
+        cache = cls.load()
+        key = cls.key(app_apk)
+        entry = cache.get(key)
+        if entry is not None and 'app_path' in entry:
+            artifacts = cls(**entry)
+            if os.path.isfile(artifacts.test_server_path) and \
+                    os.path.isfile(artifacts.app_path):
+                return artifacts
+        artifacts = cls.build(app_apk)
+        cache[key] = vars(artifacts)
+        cls.save(cache)
+        return artifacts
+
+    @classmethod
+    def build(cls, app_apk):
+        """Re-sign a copy of the app and build its test server."""
+        click.secho("Building Calabash test server for {}".format(app_apk),
+                    fg='blue')
+        if not os.path.isdir(ARTIFACTS_DIR):
+            os.makedirs(ARTIFACTS_DIR)
+        app_path = os.path.join(
+            ARTIFACTS_DIR, "{}.apk".format(install_cache.local_digest(app_apk))
+        )
+        shutil.copyfile(app_apk, app_path)
+        for command in ("resign", "build"):
+            subprocess.check_call(
+                ["calabash-android", command,
+                 os.path.relpath(app_path, CALABASH_DIR)],
+                cwd=CALABASH_DIR
+            )
+        return cls(
+            app_path,
+            "{}_{}.apk".format(md5sum(app_path), cls.calabash_version()),
+            cls.main_activity(app_path)
+        )
+
+    @staticmethod
+    def load(filename=ARTIFACTS_FILE):
+        """Get the cached artifacts, by cache key."""
+        try:
+            with open(filename) as artifacts_file:
+                return json.load(artifacts_file)
+        except (IOError, ValueError):
+            return {}
+
+    @staticmethod
+    def save(cache, filename=ARTIFACTS_FILE):
+        """Save the cached artifacts."""
+        directory = os.path.dirname(filename)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(filename, 'w') as artifacts_file:
+            json.dump(cache, artifacts_file, indent=2, sort_keys=True)
+
+
+def read_marker(line, boundaries):
+    """Read a repetition marker printed by the support hooks.
+
+    Markers are ``START index time`` and ``END index time status``.
+    Malformed markers, e.g. truncated or interleaved with other output,
+    are skipped, and their repetition counts as failed.
+
+    Args:
+        line        line of the output of cucumber.
+        boundaries  dict with ``[start, end]`` of each repetition, by index.
+    Returns: whether the line is a marker.
+
+    """
+    fields = line.split()
+    if not fields or fields[0] not in (REPETITION_START, REPETITION_END):
+        return False
+    try:
+        if fields[0] == REPETITION_START and len(fields) >= 3:
+            boundaries[fields[1]] = [float(fields[2]), None]
+            return True
+        if fields[0] == REPETITION_END and len(fields) >= 4:
+            if fields[3] == 'passed' and fields[1] in boundaries:
+                boundaries[fields[1]][1] = float(fields[2])
+            return True
+    except ValueError:
+        pass
+    click.secho("Skipping malformed marker: {}".format(line.rstrip()),
+                fg='yellow')
+    return True
+
+
+def extract_scenario(feature_lines, scenario):
+    """Get the title and the body of a scenario of a feature file.
+
+    Args:
+        feature_lines   lines of the feature file.
+        scenario        name of the scenario.
+    Returns: tuple with the ``Feature:`` line and the lines of the steps.
+
+    """
+    title = None
+    body = None
+    for line in feature_lines:
+        stripped = line.strip()
+        if stripped.startswith("Feature:"):
+            title = line
+        elif stripped.startswith("Scenario"):
+            if body is not None:
+                break
+            if stripped.split(":", 1)[-1].strip() == scenario:
+                body = []
+        elif body is not None:
+            body.append(line)
+    if title is None or body is None:
+        raise ValueError("Scenario {} not found.".format(scenario))
+    return title, body
+
+
+class CalabashUseCase(BatchedUseCaseMixin, AndroidUseCase):
     """`AndroidUseCase` to use with `Calabash`."""
 
     # pylint: disable=too-many-arguments
@@ -26,38 +270,182 @@ class CalabashUseCase(AndroidUseCase):
         self.feature = feature
         self.scenario = scenario
         self.minimum_execution_time = minimum_execution_time
+        self.source_apk = self.app_apk
+        self.artifacts = None
+        self.test_server_port = None
+
+    @property
+    def test_apk(self):
+        """Test server of the app."""
+        return self.artifacts.test_server_path
+
+    @property
+    def test_pkg(self):
+        """Package name of the test server."""
+        return "{}.test".format(self.app_pkg)
+
+    def install_test(self):
+        """Install the test server."""
+        install_cache.install_apk(self.test_apk, self.test_pkg)
 
     def prepare(self):
         """Prepare environment for running."""
-        self.install_app()
+        with phases.phase("warm_up"):
+            self.artifacts = CalabashArtifacts.get(self.source_apk)
+        # the re-signed copy is the one installed and run
+        self.app_apk = self.artifacts.app_path
+        if self.test_server_port is None:
+            self.test_server_port = get_free_port()
+        app_state.prepare_app(self, launch=False)
+        app_state.prepare_test_app(self)
         self._prepare()
         click.secho("Starting use case {}.".format(self.name), fg='green')
 
     def cleanup(self):
         """Clean environment after running."""
         self._cleanup()
-        self.uninstall_app()
+        app_state.release_app(self)
     
     def _run(self):
         @minimum_execution_time(seconds=self.minimum_execution_time)
         def launch_calabash():
             try:
                 print(subprocess.check_output(
-                    "calabash-android run ../../{apk} "
-                    "features/{feature}"
-                    " --name \"{scenario}\"".format(
-                        apk=self.app_apk,
-                        feature=self.feature,
-                        scenario=self.scenario
+                    self.cucumber_command(
+                        self.feature,
+                        "--name \"{}\"".format(self.scenario)
                     ),
-                    cwd="./physalia_automators/calabash-ruby/",
+                    cwd=CALABASH_DIR,
                     shell=True
                 ))
             except subprocess.CalledProcessError as e:
                 click.secho(str(e), fg='red')
                 print(e.output)
         launch_calabash()
-    
+
+    def cucumber_command(self, feature, options=""):
+        """Get the command that runs a feature with the prebuilt artifacts.
+
+        Args:
+            feature     file name of the feature.
+            options     options given to cucumber.
+        """
+        return (
+            "cucumber features/{feature} {options}"
+            " MAIN_ACTIVITY={main_activity}"
+            " APP_PATH={apk}"
+            " TEST_APP_PATH=test_servers/{test_server}"
+            " TEST_SERVER_PORT={port}"
+            " PHYSALIA_SKIP_INSTALL=1".format(
+                feature=feature,
+                options=options,
+                main_activity=self.artifacts.main_activity,
+                apk=os.path.abspath(self.artifacts.app_path),
+                test_server=self.artifacts.test_server,
+                port=self.test_server_port
+            )
+        )
+
+    @property
+    def scenario_name(self):
+        """Name of the scenario, without shell escapes."""
+        return self.scenario.replace("\\", "")
+
+    def write_batch_feature(self, repetitions):
+        """Write a feature that repeats the scenario of the use case.
+
+        Returns:
+            str: path of the feature, relative to the features directory.
+
+        """
+        with open(feature_path(self.feature)) as feature_file:
+            title, body = extract_scenario(feature_file.readlines(),
+                                           self.scenario_name)
+        feature = BATCH_FEATURE.format(pid=os.getpid())
+        with open(feature_path(feature), 'w') as batch_file:
+            batch_file.write(title)
+            for index in range(repetitions):
+                batch_file.write("\n  Scenario: {} #{}\n".format(
+                    self.scenario_name, index))
+                batch_file.writelines(body)
+        return feature
+
+    def run_batch(self, power_meter, repetitions):
+        """Measure a block of repetitions within one cucumber process.
+
+        The power meter is stopped and the environment cleaned up even if
+        the block fails.
+
+        Returns:
+            list: a `Measurement` for each repetition that succeeded.
+
+        """
+        feature = self.write_batch_feature(repetitions)
+        env = dict(
+            os.environ,
+            PHYSALIA_BATCH="1",
+            PHYSALIA_REPETITIONS=str(repetitions),
+            PHYSALIA_MINIMUM_EXECUTION_TIME=str(self.minimum_execution_time)
+        )
+        boundaries = {}
+        measuring = False
+        try:
+            self.prepare()
+            window_start = time.time()
+            power_meter.start()
+            measuring = True
+            self.stream_repetitions(feature, env, boundaries)
+            measuring = False
+            energy_consumption, duration, error_flag = power_meter.stop()
+        finally:
+            if measuring:
+                power_meter.stop()
+            os.remove(feature_path(feature))
+            self.cleanup()
+        if error_flag:
+            return []
+        succeeded = []
+        for index in sorted(boundaries, key=int):
+            start, end = boundaries[index]
+            if end is None:
+                click.secho("Repetition {} of {} has failed.".format(
+                    index, self.name), fg='red')
+                continue
+            succeeded.append((start, end))
+        return self.repetition_measurements(
+            power_meter, window_start, energy_consumption, duration,
+            succeeded
+        )
+
+    def stream_repetitions(self, feature, env, boundaries):
+        """Run a batch feature, reading the markers of its repetitions.
+
+        Args:
+            feature     file name of the batch feature.
+            env         environment of cucumber.
+            boundaries  dict where ``[start, end]`` of each repetition is
+                        stored, by index. ``end`` is None if it failed.
+        """
+        process = subprocess.Popen(
+            self.cucumber_command(feature, "--fail-fast"),
+            cwd=CALABASH_DIR,
+            shell=True,
+            env=env,
+            stdout=subprocess.PIPE,
+            universal_newlines=True
+        )
+        finished = False
+        try:
+            for line in iter(process.stdout.readline, ''):
+                if not read_marker(line, boundaries):
+                    print(line.rstrip())
+            finished = True
+        finally:
+            if not finished:
+                process.kill()
+            process.stdout.close()
+            process.wait()
+
     @staticmethod
     def calabash_is_installed():
         """Check if calabash is installed."""
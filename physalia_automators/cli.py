@@ -7,26 +7,50 @@ Example:
 # pylint: disable=no-value-for-parameter
 # pylint: disable=missing-docstring
 
+import sys
 import time
-import csv
+from contextlib import contextmanager
+from functools import partial
 import click
-from retrying import retry
 from physalia.power_meters import MonsoonPowerMeter, EmulatedPowerMeter
-from physalia_automators import android_view_client_use_case
-from physalia_automators import monkeyrunner_usecase
-from physalia_automators import robotium_usecase
-from physalia_automators import espresso_usecase
-from physalia_automators import ui_automator_usecase
-from physalia_automators import calabash_usecase
-from physalia_automators import python_ui_automator_usecase
-from physalia_automators import appium_usecase
-
-COLUMN_USE_CASE = 1
+from physalia_automators import adb
+from physalia_automators import app_state
+from physalia_automators import appium_profiles
+from physalia_automators import registry
+from physalia_automators.orchestrator import orchestrator
+from physalia_automators.resume_ledger import ResumeLedger
+from physalia_automators.scheduler import CampaignScheduler, DeviceBinding
+
+# seconds for importing the cli, and then for loading the selected frameworks
+STARTUP_BUDGET = 2.0
+START_TIME = time.time()
 
 @click.command()
 @click.argument('count', default=30, type=click.IntRange(min=1))
 @click.argument('output', default="results.csv", type=click.Path(dir_okay=False))
-def tool(count, output):
+@click.option('-d', '--device', 'devices', multiple=True,
+              help="Run in parallel on SERIAL=POWER_METER_SERIAL. "
+                   "Use 'emulated' as power meter serial to emulate it.")
+@click.option('-b', '--batch', 'batch_size', default=1, type=click.IntRange(min=1),
+              help="Repetitions per session for Espresso, UiAutomator, "
+                   "Robotium and Calabash (default 1: one per repetition).")
+@click.option('--batched-variants', is_flag=True,
+              help="Also measure AndroidViewClient routines with batched input "
+                   "injection and PythonUiAutomator finds with batched queries.")
+@click.option('--cached-variants', is_flag=True,
+              help="Also measure AndroidViewClient finds that reuse the view "
+                   "dump while the window does not change.")
+@click.option('--appium-profile', default=appium_profiles.DEFAULT.name,
+              type=click.Choice(appium_profiles.profile_names()),
+              help="Performance profile of the Appium sessions.")
+@click.option('-f', '--framework', 'framework_names', multiple=True,
+              type=click.Choice(registry.names()),
+              help="Framework to measure (default: all of them).")
+@click.option('-i', '--interaction', 'interactions', multiple=True,
+              type=click.Choice(registry.INTERACTIONS),
+              help="Interaction to measure (default: all of them).")
+def tool(count, output, devices, batch_size, batched_variants, cached_variants,
+         appium_profile, framework_names, interactions):
     """Run tool."""
     
     click.secho("=====================================", fg="blue")
@@ -35,59 +59,121 @@ def tool(count, output):
     click.secho("By Luis Cruz and Rui Abreu.   ", fg="blue")
     click.secho("http://tqrg.github.io/physalia", fg="blue")
     # click.launch('http://tqrg.github.io/physalia/')
+    adb.install_physalia_hooks()
+
+    frameworks = [
+        registry.load(name)
+        for name in registry.select(framework_names, batched_variants,
+                                    cached_variants)
+    ]
+    for framework in frameworks:
+        if registry.name_of(framework) == "Appium":
+            framework.AppiumUseCase.performance_profile = \
+                appium_profiles.get_profile(appium_profile)
+    check_startup_time()
+
+    if devices:
+        scheduler = CampaignScheduler(
+            [DeviceBinding.parse(device) for device in devices],
+            count, output
+        )
+        succeeded = scheduler.run(
+            frameworks,
+            partial(evaluate_framework, batch_size=batch_size),
+            interactions
+        )
+        if not succeeded:
+            sys.exit(1)
+        return
 
     power_meter = MonsoonPowerMeter(voltage=3.8, serial=12886)
 
-
-    # -------- AndroidViewClient -------- #
-    evaluate_platform(android_view_client_use_case.use_cases, power_meter, count, output)
-
-    # -------- Monkeyrunner -------- #
-    evaluate_platform(monkeyrunner_usecase.use_cases, power_meter, count, output)
-
-    # -------- Robotium -------- #
-    evaluate_platform(robotium_usecase.use_cases, power_meter, count, output)
-
-    # -------- Espresso -------- #
-    evaluate_platform(espresso_usecase.use_cases, power_meter, count, output)
-
-    # -------- Ui Automator -------- #
-    evaluate_platform(ui_automator_usecase.use_cases, power_meter, count, output)
-
-    # -------- Calabash -------- #
-    if(calabash_usecase.CalabashUseCase.calabash_is_installed()):
-        evaluate_platform(calabash_usecase.use_cases, power_meter, count, output)
+    for framework, next_framework in zip(frameworks, frameworks[1:] + [None]):
+        orchestrator.prepare_framework(framework)
+        if next_framework is not None:
+            orchestrator.warm_up_framework(next_framework)
+        evaluate_framework(framework,
+                           registry.select_use_cases(framework, interactions),
+                           power_meter, count, output, batch_size)
+
+
+def check_startup_time():
+    """Report how long the cli took to start, warning if over budget."""
+    startup_time = time.time() - START_TIME
+    if startup_time > STARTUP_BUDGET:
+        click.secho(
+            "Startup took {:.2f}s, over the budget of {:.2f}s.".format(
+                startup_time, STARTUP_BUDGET),
+            fg='yellow'
+        )
     else:
-        click.secho("Skipping Calabash experiments.", fg="red")
-        click.secho("Be sure to install it and run the experiments again.", fg="red")
-        click.secho('Launching https://github.com/calabash/calabash-android', fg="red")
-        click.launch('https://github.com/calabash/calabash-android')
+        click.secho("Started in {:.2f}s.".format(startup_time), fg='blue')
 
-    # ----- Python Ui Automator ----- #
-    evaluate_platform(python_ui_automator_usecase.use_cases, power_meter, count, output)
 
+def evaluate_framework(framework, use_cases, power_meter, count, output,
+                       batch_size=1):
+    """Evaluate use cases of a framework module, handling its requirements."""
+    name = registry.name_of(framework)
+    # -------- Calabash -------- #
+    if name == "Calabash":
+        if not framework.CalabashUseCase.calabash_is_installed():
+            click.secho("Skipping Calabash experiments.", fg="red")
+            click.secho("Be sure to install it and run the experiments again.", fg="red")
+            click.secho('Launching https://github.com/calabash/calabash-android', fg="red")
+            click.launch('https://github.com/calabash/calabash-android')
+            return
 
     # ---------- Appium ---------- #
-    @retry(wait_fixed=2000, stop_max_attempt_number=40)
-    def run_appium_measurements():
-        if appium_usecase.AppiumUseCase.appium_is_installed():
-            appium_usecase.AppiumUseCase.start_appium_server()
-            time.sleep(30)
-            try:
-                evaluate_platform(appium_usecase.use_cases, power_meter, count, output)
-            finally:
-                appium_usecase.AppiumUseCase.stop_appium_server()
-        else:
+    if name == "Appium":
+        if not framework.AppiumUseCase.appium_is_installed():
             click.secho("Skipping Appium experiments.", fg="red")
             click.secho("Be sure to install it and run the experiments again.", fg="red")
             click.secho('Launching http://appium.io', fg="red")
             click.launch('http://appium.io')
+            return
+        evaluate_appium(use_cases, power_meter, count, output)
+        return
+
+    with framework_block():
+        try:
+            evaluate_platform(use_cases, power_meter, count, output,
+                              batch_size)
+        finally:
+            orchestrator.drain()
+            if name == "Monkeyrunner":
+                framework.MonkeyrunnerUseCase.stop_daemons()
+            if name in ("AndroidViewClient", "AndroidViewClient-batched",
+                        "AndroidViewClient-cached"):
+                from physalia_automators import view_client_pool
+                view_client_pool.close_all()
+            if name in ("PythonUiAutomator", "PythonUiAutomator-batched"):
+                from physalia_automators import uiautomator_pool
+                uiautomator_pool.close_all()
+
+
+@contextmanager
+def framework_block():
+    """Install apps once for a framework and stop them at the end."""
+    try:
+        yield
+    finally:
+        app_state.finish_block()
 
-    run_appium_measurements()
 
-    
+def evaluate_appium(use_cases, power_meter, count, output):
+    from physalia_automators import appium_usecase
+    from physalia_automators import appium_session_pool
+    appium_usecase.AppiumUseCase.start_appium_server()
+    try:
+        with framework_block():
+            evaluate_platform(use_cases, power_meter, count, output)
+    finally:
+        orchestrator.drain()
+        appium_session_pool.close_all()
+        appium_usecase.AppiumUseCase.stop_appium_server()
+
 
-def evaluate_platform(use_cases, power_meter, count, output):
+def evaluate_platform(use_cases, power_meter, count, output, batch_size=1):
     for use_case_name,use_case in use_cases.items():
         if use_case:
             executions_done = get_number_of_rows_for_key(use_case.name, output)
@@ -96,10 +182,12 @@ def evaluate_platform(use_cases, power_meter, count, output):
             if executions_left > 0:
                 click.secho("\n\nRunning {}...".format(use_case.name),
                             fg='blue', bold=True)
-                use_case.profile(power_meter=power_meter,
-                                 count=executions_left,
-                                 retry_limit=3,
-                                 save_to_csv=output)
+                orchestrator.profile(use_case,
+                                     power_meter=power_meter,
+                                     count=executions_left,
+                                     retry_limit=3,
+                                     save_to_csv=output,
+                                     batch_size=batch_size)
             else:
                 click.secho(
                     "\nSkipping {}: already done...".format(use_case.name),
@@ -114,9 +202,9 @@ def evaluate_platform(use_cases, power_meter, count, output):
 
 def get_number_of_rows_for_key(key, filename):
     """Get number of elements for a given usecase name."""
-    with open(filename, 'r') as csvfile:
-        csv_reader = csv.reader(csvfile)
-        return len([None for row in csv_reader if row[COLUMN_USE_CASE] == key])
+    # results may still be on their way to the file
+    orchestrator.drain()
+    return ResumeLedger.for_file(filename).count(key)
         
 def exit_gracefully(start_time):
     exit_time = time.time()
@@ -0,0 +1,165 @@
+"""Pick how `AndroidViewClient` dumps the view hierarchy of a device.
+
+Views can be dumped with ``uiautomator dump``, through the UiAutomator
+helper app or through the view server. The fastest of them depends on the
+device. A short calibration dumps the current window a few times with
+each backend and selects the fastest one that never failed. The helper
+app and the view server started by the other backends are stopped, so
+they do not keep running in the device during the measurements. The
+choice is saved per device model, so later runs skip the calibration.
+"""
+
+import json
+import os
+import time
+import click
+from com.dtmilano.android.viewclient import ViewClient
+
+CALIBRATION_DUMPS = 3
+STOP_VIEW_SERVER_COMMAND = "service call window 2"
+SELECTION_FILE = os.path.join(
+    os.path.expanduser("~"), ".physalia_automators", "dump_backends.json"
+)
+
+
+class DumpBackend(object):
+    """Way of dumping views, as a set of `ViewClient` options.
+
+    Args:
+        name        name used to save the selection.
+        options     keyword arguments given to `ViewClient`.
+    """
+
+    def __init__(self, name, **options):  # noqa: D107
+        self.name = name
+        self.options = dict(
+            forceviewserveruse=False,
+            useuiautomatorhelper=False,
+            ignoreuiautomatorkilled=True,
+            autodump=False,
+            startviewserver=True,
+            compresseddump=True
+        )
+        self.options.update(options)
+
+    def create_view_client(self, device, serialno):
+        """Create a `ViewClient` that dumps with this backend."""
+        return ViewClient(device, serialno, **self.options)
+
+    def measure(self, device, serialno, dumps=CALIBRATION_DUMPS):
+        """Time the dumps of this backend in a device.
+
+        Returns:
+            tuple: median time of a dump, or None if the backend fails,
+            and the `ViewClient` that was used, if it could be created.
+
+        """
+        # pylint: disable=broad-except
+        # Any error means the backend is not usable in this device.
+        durations = []
+        view_client = None
+        try:
+            view_client = self.create_view_client(device, serialno)
+            for _ in range(dumps):
+                start = time.time()
+                views = view_client.dump(window='-1')
+                durations.append(time.time() - start)
+                if not views:
+                    return None, view_client
+        except Exception as error:
+            click.secho("Dump backend {} failed: {}".format(self.name, error),
+                        fg='yellow')
+            return None, view_client
+        return sorted(durations)[len(durations)//2], view_client
+
+    def release(self, device, view_client):
+        """Stop what this backend started in the device."""
+        # pylint: disable=broad-except
+        # The backend may have failed before starting anything.
+        try:
+            helper = getattr(view_client, 'uiAutomatorHelper', None)
+            if self.options['useuiautomatorhelper'] and helper is not None:
+                helper.quit()
+            if self.options['forceviewserveruse']:
+                device.shell(STOP_VIEW_SERVER_COMMAND)
+        except Exception as error:
+            click.secho("Could not stop dump backend {}: {}".format(
+                self.name, error), fg='yellow')
+
+    def __str__(self):
+        """Name of the backend."""
+        return self.name
+
+
+UIAUTOMATOR = DumpBackend("uiautomator")
+UIAUTOMATOR_HELPER = DumpBackend("uiautomator-helper", useuiautomatorhelper=True)
+VIEW_SERVER = DumpBackend("view-server", forceviewserveruse=True)
+
+BACKENDS = [UIAUTOMATOR, UIAUTOMATOR_HELPER, VIEW_SERVER]
+DEFAULT_BACKEND = UIAUTOMATOR
+
+
+def get_backend(name):
+    """Get a backend by name, or None if there is no such backend."""
+    for backend in BACKENDS:
+        if backend.name == name:
+            return backend
+    return None
+
+
+def calibrate(device, serialno):
+    """Measure every backend in the device and get the fastest one."""
+    click.secho("Calibrating view dump backends in {}...".format(serialno),
+                fg='blue')
+    best, best_duration = None, None
+    view_clients = {}
+    for backend in BACKENDS:
+        duration, view_clients[backend.name] = backend.measure(device,
+                                                              serialno)
+        if duration is None:
+            continue
+        click.secho("  {}: {:.3f}s per dump".format(backend, duration),
+                    fg='blue')
+        if best_duration is None or duration < best_duration:
+            best, best_duration = backend, duration
+    for backend in BACKENDS:
+        if backend is not best:
+            backend.release(device, view_clients[backend.name])
+    return best
+
+
+def load_selection(filename=SELECTION_FILE):
+    """Get the saved backend names, by device model."""
+    try:
+        with open(filename) as selection_file:
+            return json.load(selection_file)
+    except (IOError, ValueError):
+        return {}
+
+
+def save_selection(device_model, backend, filename=SELECTION_FILE):
+    """Save the backend selected for a device model."""
+    selection = load_selection(filename)
+    selection[device_model] = backend.name
+    directory = os.path.dirname(filename)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    with open(filename, 'w') as selection_file:
+        json.dump(selection, selection_file, indent=2, sort_keys=True)
+
+
+def select_backend(device, serialno):
+    """Get the backend for the device, calibrating it the first time."""
+    device_model = device.getProperty('ro.product.model') or serialno
+    backend = get_backend(load_selection().get(device_model))
+    if backend is not None:
+        return backend
+    backend = calibrate(device, serialno)
+    if backend is None:
+        click.secho("No dump backend worked in {}. Using {}.".format(
+            device_model, DEFAULT_BACKEND), fg='red')
+        return DEFAULT_BACKEND
+    click.secho("Using {} to dump views in {}.".format(backend, device_model),
+                fg='green')
+    save_selection(device_model, backend)
+    return backend
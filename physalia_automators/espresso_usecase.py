@@ -4,43 +4,18 @@
 
 import os
 from . import time_boundaries
-import subprocess
 import click
-from physalia.energy_profiler import AndroidUseCase
+from physalia_automators.instrumentation import InstrumentationUseCase
 from physalia_automators.utils import minimum_execution_time, get_path
+from physalia_automators import app_state
 
-class EspressoUseCase(AndroidUseCase):
+class EspressoUseCase(InstrumentationUseCase):
     """`AndroidUseCase` to use with `UiAutomator`."""
 
-    # pylint: disable=too-many-arguments
-    # Eight is reasonable in this case.
-
-    def __init__(self, name, app_apk, app_pkg, app_version,
-                 test_class, test_method,
-                 test_apk, test_pkg, minimum_execution_time):  # noqa: D102
-        super(EspressoUseCase, self).__init__(
-            name, app_apk, app_pkg, app_version,
-        )
-        self.test_class = test_class
-        self.test_method = test_method
-        self.test_pkg = test_pkg
-        self.test_apk = test_apk
-        self.minimum_execution_time = minimum_execution_time
-
-    def install_test(self):
-        click.secho("Installing {}".format(self.test_apk), fg='blue')
-        subprocess.check_output(["adb", "install", self.test_apk])
-
-    def uninstall_test(self):
-        """Uninstall test app of the Android device."""
-        click.secho("Uninstalling {}".format(self.test_pkg), fg='blue')
-        subprocess.check_output(["adb", "uninstall", self.test_pkg])
-
     def prepare(self):
         """Prepare environment for running."""
-        self.install_app()
-        self.install_test()
-        self.open_app()
+        app_state.prepare_app(self)
+        app_state.prepare_test_app(self)
         import time
         time.sleep(2)
         self._prepare()
@@ -49,24 +24,12 @@ class EspressoUseCase(AndroidUseCase):
     def cleanup(self):
         """Clean environment after running."""
         self._cleanup()
-        self.uninstall_app()
-        self.uninstall_test()
+        app_state.release_app(self)
     
     def _run(self):
         @minimum_execution_time(seconds=self.minimum_execution_time)
         def launch_espresso():
-            out = subprocess.check_output(
-                "adb shell am instrument -w -r -e debug false "
-                "-e class {test_class}#{test_method} {test_pkg}/"
-                "android.support.test.runner.AndroidJUnitRunner".format(
-                    test_class=self.test_class,
-                    test_method=self.test_method,
-                    test_pkg=self.test_pkg
-                ),
-                shell=True
-            )
-            if "OK (1 test)" not in out:
-                print(out)
+            self.run_instrumentation()
         launch_espresso()
         
 
@@ -0,0 +1,215 @@
+"""Fake adb server to try physalia automators without a device.
+
+Serves the part of the adb server protocol used by `adb`: selecting a
+device, shell commands and pushing files. Shell commands run in the host
+with ``/bin/sh``, with the directory given in ``--bin`` first in ``PATH``
+so that fake device commands (``am``, ``pm``, ``input``...) can be put
+there. Pushed files are written below ``--root``.
+
+Example:
+        ``$ python physalia_automators/fake_adb_server.py --port 5038``
+        ``$ ANDROID_ADB_SERVER_PORT=5038 python physalia_automators/cli.py``
+"""
+
+# pylint: disable=no-value-for-parameter
+
+import os
+import struct
+import subprocess
+import threading
+import click
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+
+class FakeAdbHandler(socketserver.BaseRequestHandler):
+    """Serve the requests of a connection, like the adb server does."""
+
+    def recv_exactly(self, size):
+        """Read exactly `size` bytes, or None if the client has left."""
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def okay(self):
+        """Accept the last request."""
+        self.request.sendall(b"OKAY")
+
+    def fail(self, message):
+        """Refuse the last request."""
+        message = message.encode('utf-8')
+        self.request.sendall(
+            b"FAIL" + "{:04x}".format(len(message)).encode('ascii') + message
+        )
+
+    def handle(self):
+        """Serve requests until one of them takes over the connection."""
+        while True:
+            length = self.recv_exactly(4)
+            if length is None:
+                return
+            service = self.recv_exactly(int(length, 16)).decode('utf-8')
+            self.server.log(service)
+            if service in ("host:transport-any", "host:transport-usb"):
+                self.okay()
+            elif service.startswith("host:transport:"):
+                if service.split(":", 2)[2] in self.server.serials:
+                    self.okay()
+                else:
+                    self.fail("device '{}' not found".format(
+                        service.split(":", 2)[2]))
+                    return
+            elif service == "host:devices":
+                devices = "".join(
+                    "{}\tdevice\n".format(serial)
+                    for serial in self.server.serials
+                ).encode('utf-8')
+                self.okay()
+                self.request.sendall(
+                    "{:04x}".format(len(devices)).encode('ascii') + devices
+                )
+                return
+            elif service.startswith("shell:"):
+                self.okay()
+                self.shell(service[len("shell:"):])
+                return
+            elif service == "sync:":
+                self.okay()
+                self.sync()
+                return
+            else:
+                self.fail("unknown service {}".format(service))
+                return
+
+    def shell(self, command):
+        """Run a command in the host, streaming its output."""
+        env = dict(os.environ)
+        env['PATH'] = os.pathsep.join([self.server.bin_dir, env['PATH']])
+        process = subprocess.Popen(
+            ["/bin/sh", "-c", command],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env=env
+        )
+        try:
+            for chunk in iter(lambda: os.read(process.stdout.fileno(), 4096),
+                              b''):
+                self.request.sendall(chunk)
+        except (IOError, OSError):
+            # the client closed the channel, like a hang up in the device
+            process.terminate()
+        finally:
+            process.stdout.close()
+            process.wait()
+
+    def sync(self):
+        """Receive pushed files until the client quits."""
+        while True:
+            header = self.recv_exactly(8)
+            if header is None:
+                return
+            command, length = header[:4], struct.unpack("<I", header[4:])[0]
+            if command == b"QUIT":
+                return
+            if command != b"SEND":
+                self.request.sendall(b"FAIL" + struct.pack("<I", 0))
+                return
+            spec = self.recv_exactly(length).decode('utf-8')
+            remote = spec.rsplit(",", 1)[0]
+            path = os.path.join(self.server.root, remote.lstrip("/"))
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as pushed_file:
+                while True:
+                    header = self.recv_exactly(8)
+                    if header is None:
+                        return
+                    command = header[:4]
+                    length = struct.unpack("<I", header[4:])[0]
+                    if command == b"DONE":
+                        break
+                    pushed_file.write(self.recv_exactly(length))
+            self.request.sendall(b"OKAY" + struct.pack("<I", 0))
+
+
+class FakeAdbServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """Fake adb server, serving each connection in its own thread.
+
+    Args:
+        port        port to listen to (0 for a free port).
+        serials     serials of the fake devices.
+        bin_dir     directory with the fake device commands.
+        root        directory where pushed files are written.
+        log_file    file where requested services are logged.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, port=0, serials=("emulator-5554",), bin_dir=".",
+                 root=".", log_file=None):  # noqa: D107
+        socketserver.TCPServer.__init__(
+            self, ('127.0.0.1', port), FakeAdbHandler
+        )
+        self.serials = list(serials)
+        self.bin_dir = os.path.abspath(bin_dir)
+        self.root = os.path.abspath(root)
+        self.log_file = log_file
+        self.log_lock = threading.Lock()
+
+    @property
+    def port(self):
+        """Port where the server listens."""
+        return self.server_address[1]
+
+    def log(self, service):
+        """Log a requested service."""
+        if self.log_file is None:
+            return
+        with self.log_lock:
+            with open(self.log_file, 'a') as log_file:
+                log_file.write(service + "\n")
+
+    def start(self):
+        """Serve in a background thread."""
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+
+@click.command()
+@click.option('--port', default=5037, type=int, help="Port to listen to.")
+@click.option('-s', '--serial', 'serials', multiple=True,
+              help="Serial of a fake device (default: emulator-5554).")
+@click.option('--bin', 'bin_dir', default=".",
+              type=click.Path(file_okay=False),
+              help="Directory with fake device commands.")
+@click.option('--root', default=".", type=click.Path(file_okay=False),
+              help="Directory where pushed files are written.")
+@click.option('--log', 'log_file', type=click.Path(dir_okay=False),
+              help="File where requested services are logged.")
+def tool(port, serials, bin_dir, root, log_file):
+    """Run a fake adb server."""
+    server = FakeAdbServer(port, serials or ("emulator-5554",), bin_dir,
+                           root, log_file)
+    click.secho("Fake adb server listening in port {}.".format(server.port),
+                fg='blue')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    tool()
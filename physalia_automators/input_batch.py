@@ -0,0 +1,79 @@
+"""Inject a sequence of input events in a single shell invocation.
+
+Routines that send one adb command per event pay a round trip for each of
+them. An `InputScript` compiles the events into a shell script that is
+pushed to the device once and run with a single ``adb shell``. Each
+event is still run by the ``input`` tool of the device, and units keep
+the minimum execution time the routines give them on the host.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+from physalia_automators import adb
+
+REMOTE_SCRIPT = "/data/local/tmp/physalia_input.sh"
+
+
+class InputScript(object):
+    """Sequence of input events to run in the device."""
+
+    def __init__(self):  # noqa: D107
+        self.lines = []
+
+    def key(self, keycode):
+        """Press and release a key, e.g. ``KEYCODE_BACK``."""
+        self.lines.append("input keyevent {}".format(keycode))
+
+    def tap(self, x, y):
+        """Tap the screen at the given coordinates."""
+        self.lines.append("input tap {:d} {:d}".format(int(x), int(y)))
+
+    def swipe(self, start, end, duration):
+        """Swipe from `start` to `end` in `duration` milliseconds."""
+        self.lines.append("input touchscreen swipe {:d} {:d} {:d} {:d} {:d}".format(
+            int(start[0]), int(start[1]), int(end[0]), int(end[1]),
+            int(duration)
+        ))
+
+    def text(self, text):
+        """Type text in the focused view."""
+        encoded = text.replace("%s", "\\%s").replace(" ", "%s")
+        self.lines.append("input text '{}'".format(encoded.replace("'", "'\\''")))
+
+    def sleep(self, seconds):
+        """Wait before the next event."""
+        self.lines.append("sleep {}".format(seconds))
+
+    @contextmanager
+    def unit(self, seconds):
+        """Make the events added in the block take at least `seconds`.
+
+        Like `minimum_execution_time`, a non-positive value leaves the
+        events untimed.
+        """
+        if seconds <= 0:
+            yield
+            return
+        self.lines.append("sleep {} &".format(seconds))
+        yield
+        self.lines.append("wait")
+
+    def compile(self):
+        """Get the source of the script."""
+        return "\n".join(self.lines) + "\n"
+
+    def push(self, remote=REMOTE_SCRIPT):
+        """Copy the script to the device."""
+        handle, path = tempfile.mkstemp(suffix=".sh")
+        try:
+            with os.fdopen(handle, "w") as script_file:
+                script_file.write(self.compile())
+            adb.push(path, remote)
+        finally:
+            os.remove(path)
+
+    @staticmethod
+    def run(remote=REMOTE_SCRIPT):
+        """Run a pushed script in a single shell invocation."""
+        return adb.shell("sh {}".format(remote))
@@ -0,0 +1,143 @@
+"""Install apks only when the same build is not in the device yet.
+
+Apks are identified by their SHA-256. The digest of the apk installed for a
+package is computed in the device, so unchanged builds are never pushed
+again. Devices without ``sha256sum`` fall back to ``sha1sum`` or
+``md5sum``, and the local apk is hashed with the same algorithm. Builds that
+have to be installed are staged once in ``/data/local/tmp`` and installed
+from there with ``pm install``. Builds staged by earlier campaigns are
+removed when a new one is pushed.
+"""
+
+import hashlib
+import os
+import re
+import click
+from physalia.exceptions import PhysaliaExecutionFailed
+from physalia_automators import adb
+
+STAGING_DIR = "/data/local/tmp"
+INCOMPATIBLE_INSTALL_ERRORS = (
+    "INSTALL_FAILED_UPDATE_INCOMPATIBLE",
+    "INSTALL_FAILED_VERSION_DOWNGRADE",
+)
+
+STAGED_APK_PATTERN = re.compile(r"physalia-[0-9a-f]+\.apk$")
+# length of the hexadecimal digest of each algorithm, by preference
+DIGEST_LENGTHS = (
+    ("sha256", 64),
+    ("sha1", 40),
+    ("md5", 32),
+)
+
+_local_digests = {}
+_staged_apks = set()
+
+
+def local_digest(apk, algorithm="sha256"):
+    """Get the digest of a local apk (SHA-256 by default)."""
+    stat = os.stat(apk)
+    key = (os.path.abspath(apk), stat.st_size, stat.st_mtime, algorithm)
+    if key not in _local_digests:
+        digest = hashlib.new(algorithm)
+        with open(apk, 'rb') as apk_file:
+            for chunk in iter(lambda: apk_file.read(1 << 20), b''):
+                digest.update(chunk)
+        _local_digests[key] = digest.hexdigest()
+    return _local_digests[key]
+
+
+def remote_digest(path):
+    """Get the digest of a file in the device.
+
+    Uses the first of ``sha256sum``, ``sha1sum`` and ``md5sum`` that the
+    device has.
+
+    Returns:
+        tuple: ``(algorithm, digest)``, or None if unavailable.
+
+    """
+    output = adb.shell(
+        "{{ {} ; }} 2>/dev/null".format(" || ".join(
+            "{}sum {}".format(algorithm, path)
+            for algorithm, _ in DIGEST_LENGTHS
+        )),
+        check=False
+    ).split()
+    if output:
+        for algorithm, length in DIGEST_LENGTHS:
+            if re.match(r"^[0-9a-f]{%d}$" % length, output[0]):
+                return algorithm, output[0]
+    return None
+
+
+def is_same_build(apk, path):
+    """Check whether a file in the device is the same build as an apk."""
+    digest = remote_digest(path)
+    return digest is not None and digest[1] == local_digest(apk, digest[0])
+
+
+def installed_path(app_pkg):
+    """Get the path of the apk installed for a package."""
+    output = adb.shell("pm path {}".format(app_pkg), check=False)
+    for line in output.splitlines():
+        if line.startswith("package:"):
+            return line[len("package:"):].strip()
+    return None
+
+
+def is_installed(apk, app_pkg):
+    """Check whether the device already has this build of the package."""
+    path = installed_path(app_pkg)
+    return path is not None and is_same_build(apk, path)
+
+
+def stage(apk):
+    """Copy the apk to the staging directory unless it is there already."""
+    staged_apk = "{}/physalia-{}.apk".format(STAGING_DIR, local_digest(apk))
+    _staged_apks.add(staged_apk)
+    if not is_same_build(apk, staged_apk):
+        prune_staged_apks()
+        click.secho("Pushing {}".format(apk), fg='blue')
+        adb.push(apk, staged_apk)
+    return staged_apk
+
+
+def prune_staged_apks():
+    """Remove the apks staged in the device by earlier campaigns."""
+    output = adb.shell("ls {}".format(STAGING_DIR), check=False)
+    stale_apks = [
+        "{}/{}".format(STAGING_DIR, name) for name in output.split()
+        if STAGED_APK_PATTERN.match(name)
+        and "{}/{}".format(STAGING_DIR, name) not in _staged_apks
+    ]
+    if stale_apks:
+        adb.shell("rm -f {}".format(" ".join(stale_apks)), check=False)
+
+
+def install_apk(apk, app_pkg, force=False):
+    """Install an apk, skipping the transfer if the build is installed.
+
+    Args:
+        apk         path of the apk.
+        app_pkg     package name of the apk.
+        force       install even if the same build is in the device.
+
+    Returns:
+        bool: whether the apk was installed.
+
+    """
+    if not force and is_installed(apk, app_pkg):
+        click.secho("{} is already installed".format(apk), fg='blue')
+        return False
+    staged_apk = stage(apk)
+    # pm exits with an error when it fails, but its output tells why
+    output = adb.shell("pm install -r {}".format(staged_apk), check=False)
+    if any(error in output for error in INCOMPATIBLE_INSTALL_ERRORS):
+        adb.uninstall(app_pkg)
+        output = adb.shell("pm install {}".format(staged_apk), check=False)
+    if "Success" not in output:
+        raise PhysaliaExecutionFailed(
+            "Could not install {}: {}".format(apk, output.strip())
+        )
+    return True
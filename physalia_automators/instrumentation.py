@@ -0,0 +1,420 @@
+"""Base use case for instrumentation tests launched with `am instrument`.
+
+Besides running one instrumentation per repetition, instrumentation use
+cases can run in batched mode, measuring a block of repetitions in a single
+window. Test apks that can repeat their test method (see
+`InstrumentationUseCase.repeat_argument`) run the whole block in one
+instrumentation and report each repetition with a status holding the
+device clock, ``SystemClock.elapsedRealtimeNanos()``:
+
+    INSTRUMENTATION_STATUS: physalia_marker=start
+    INSTRUMENTATION_STATUS: physalia_repetition=0
+    INSTRUMENTATION_STATUS: physalia_elapsed_realtime_nanos=81726354000000
+    INSTRUMENTATION_STATUS_CODE: 2
+
+and the same with ``physalia_marker=end`` once the repetition has passed.
+Other test apks run an instrumentation per repetition in a single adb shell
+session, which prints a marker with the device clock at each boundary.
+Either way, the power trace of the block is sliced per repetition.
+
+The output of ``am instrument -r`` is parsed line by line while the
+instrumentation runs, and the run is stopped as soon as a test fails.
+"""
+
+import socket
+import time
+import click
+from physalia.energy_profiler import AndroidUseCase
+from physalia.exceptions import PhysaliaExecutionFailed
+from physalia_automators import adb
+from physalia_automators import install_cache
+from physalia_automators import phases
+from physalia_automators.power_trace import BatchedUseCaseMixin
+from physalia_automators.power_trace import DeviceClock
+from physalia_automators.power_trace import REPETITION_START, REPETITION_END
+
+STATUS_PREFIX = "INSTRUMENTATION_STATUS: "
+STATUS_CODE_PREFIX = "INSTRUMENTATION_STATUS_CODE: "
+RESULT_PREFIX = "INSTRUMENTATION_RESULT: "
+CODE_PREFIX = "INSTRUMENTATION_CODE: "
+ABORT_PREFIXES = ("INSTRUMENTATION_FAILED: ", "INSTRUMENTATION_ABORTED: ")
+
+STATUS_START = 1
+STATUS_OK = 0
+STATUS_ERROR = -1
+STATUS_FAILURE = -2
+STATUS_IGNORED = -3
+STATUS_ASSUMPTION_FAILURE = -4
+RESULT_OK = -1
+STATUS_MARKER = 2
+
+MARKER_KEY = "physalia_marker"
+MARKER_REPETITION_KEY = "physalia_repetition"
+MARKER_TIME_KEY = "physalia_elapsed_realtime_nanos"
+
+
+class TestResult(object):
+    """Result of a test method reported by the instrumentation.
+
+    Attributes:
+        test_class      class of the test.
+        test            name of the test method.
+        status_code     last status code reported for the test.
+        start_time      when the test started, in the host clock.
+        end_time        when the test finished, in the host clock.
+        stack           stack trace of the failure, if any.
+    """
+
+    def __init__(self, test_class, test, start_time):  # noqa: D107
+        self.test_class = test_class
+        self.test = test
+        self.status_code = STATUS_START
+        self.start_time = start_time
+        self.end_time = None
+        self.stack = None
+
+    @property
+    def duration(self):
+        """Time it took to run the test."""
+        if self.end_time is None:
+            return None
+        return self.end_time - self.start_time
+
+    @property
+    def failed(self):
+        """Whether the test ended with an error or a failure."""
+        return self.status_code in (STATUS_ERROR, STATUS_FAILURE)
+
+    def __str__(self):
+        """Describe the result."""
+        return "{}#{} (status {})".format(
+            self.test_class, self.test, self.status_code
+        )
+
+
+class InstrumentationParser(object):
+    """Incremental parser of the output of ``am instrument -r``.
+
+    Feed it the output one line at a time. Values that span several lines,
+    such as stack traces, are joined with the line where they started.
+    Repetition markers are collected in `markers`, as ``(marker,
+    repetition, device time in seconds)``.
+    """
+
+    def __init__(self):  # noqa: D107
+        self.results = []
+        self.markers = []
+        self.status = {}
+        self.result = {}
+        self.result_code = None
+        self.abort_message = None
+        self._current = None
+        self._values = None
+        self._key = None
+
+    def feed(self, line):
+        """Parse a line of output.
+
+        Returns:
+            TestResult: the test that has just finished, if any.
+
+        """
+        line = line.rstrip("\r\n")
+        if line.startswith(STATUS_PREFIX):
+            self._set_value(self.status, line[len(STATUS_PREFIX):])
+        elif line.startswith(STATUS_CODE_PREFIX):
+            code = int(line[len(STATUS_CODE_PREFIX):])
+            status, self.status, self._key = self.status, {}, None
+            return self._on_status(code, status)
+        elif line.startswith(RESULT_PREFIX):
+            self._set_value(self.result, line[len(RESULT_PREFIX):])
+        elif line.startswith(CODE_PREFIX):
+            self.result_code = int(line[len(CODE_PREFIX):])
+            self._key = None
+        elif line.startswith(ABORT_PREFIXES):
+            self.abort_message = line
+            self._key = None
+        elif self._key is not None:
+            self._values[self._key] += "\n" + line
+        return None
+
+    def _set_value(self, values, key_value):
+        key, _, value = key_value.partition("=")
+        values[key] = value
+        self._values = values
+        self._key = key
+
+    def _on_status(self, code, status):
+        if MARKER_KEY in status:
+            self.markers.append((
+                status[MARKER_KEY],
+                int(status.get(MARKER_REPETITION_KEY, len(self.markers))),
+                int(status[MARKER_TIME_KEY]) / 1e9
+            ))
+            return None
+        if code == STATUS_START:
+            self._current = TestResult(
+                status.get('class'), status.get('test'), time.time()
+            )
+            return None
+        result = self._current or TestResult(
+            status.get('class'), status.get('test'), time.time()
+        )
+        self._current = None
+        result.status_code = code
+        result.end_time = time.time()
+        result.stack = status.get('stack')
+        self.results.append(result)
+        return result
+
+    @property
+    def finished(self):
+        """Whether the instrumentation reported its final result."""
+        return self.result_code is not None
+
+    @property
+    def failed(self):
+        """Whether a test failed or the instrumentation did not succeed."""
+        return (
+            self.abort_message is not None or
+            any(result.failed for result in self.results) or
+            (self.finished and self.result_code != RESULT_OK)
+        )
+
+    def describe_failure(self):
+        """Describe why the instrumentation failed."""
+        for result in self.results:
+            if result.failed:
+                stack = (result.stack or "").strip().split("\n")[0]
+                return "{} failed: {}".format(result, stack)
+        if self.abort_message:
+            return self.abort_message
+        if not self.finished:
+            return "Instrumentation did not finish."
+        return "Instrumentation finished with code {}.".format(self.result_code)
+
+
+class InstrumentationUseCase(BatchedUseCaseMixin, AndroidUseCase):
+    """`AndroidUseCase` that runs a test method of an instrumentation apk."""
+
+    # pylint: disable=too-many-arguments
+    # Eight is reasonable in this case.
+
+    runner = "android.support.test.runner.AndroidJUnitRunner"
+    # instrumentation argument that makes the test apk repeat the test
+    # method and report each repetition with markers, if it supports it
+    repeat_argument = None
+
+    def __init__(self, name, app_apk, app_pkg, app_version,
+                 test_class, test_method,
+                 test_apk, test_pkg, minimum_execution_time):  # noqa: D102
+        super(InstrumentationUseCase, self).__init__(
+            name, app_apk, app_pkg, app_version,
+        )
+        self.test_class = test_class
+        self.test_method = test_method
+        self.test_pkg = test_pkg
+        self.test_apk = test_apk
+        self.minimum_execution_time = minimum_execution_time
+
+    def install_test(self):
+        """Install test app in the Android device."""
+        click.secho("Installing {}".format(self.test_apk), fg='blue')
+        install_cache.install_apk(self.test_apk, self.test_pkg)
+
+    def uninstall_test(self):
+        """Uninstall test app of the Android device."""
+        click.secho("Uninstalling {}".format(self.test_pkg), fg='blue')
+        adb.uninstall(self.test_pkg)
+
+    def instrument_command(self, arguments=""):
+        """Get the shell command that runs the test method once."""
+        return (
+            "am instrument -w -r -e debug false {arguments}"
+            "-e class {test_class}#{test_method} {test_pkg}/{runner}".format(
+                arguments=arguments,
+                test_class=self.test_class,
+                test_method=self.test_method,
+                test_pkg=self.test_pkg,
+                runner=self.runner
+            )
+        )
+
+    def stream_instrumentation(self, command):
+        """Run a shell command in the device, yielding its output lines.
+
+        Starting the command, until its first line of output, is timed as
+        the warm-up phase. If the generator is closed before the command
+        ends, the instrumentation is stopped in the device.
+        """
+        with phases.phase("warm_up"):
+            channel = adb.open_shell(command)
+        lines = iter(channel)
+        finished = False
+        try:
+            # the runner has started once it prints its first line
+            with phases.phase("warm_up"):
+                first_line = next(lines, None)
+            if first_line is not None:
+                yield first_line
+            for line in lines:
+                yield line
+            finished = True
+        finally:
+            channel.close()
+            if not finished:
+                self.abort_instrumentation()
+
+    def abort_instrumentation(self):
+        """Stop the instrumentation running in the device."""
+        click.secho("Stopping instrumentation of {}.".format(self.name),
+                    fg='yellow')
+        try:
+            adb.shell("am force-stop {}".format(self.test_pkg), check=False)
+            adb.shell("am force-stop {}".format(self.app_pkg), check=False)
+        except (adb.AdbError, socket.error) as error:
+            # do not hide the error that interrupted the instrumentation
+            click.secho("Could not stop {}: {}".format(self.name, error),
+                        fg='red')
+
+    def run_instrumentation(self):
+        """Run the test method once, stopping as soon as it fails.
+
+        Returns:
+            list: `TestResult` of each test that was run.
+
+        """
+        parser = InstrumentationParser()
+        lines = self.stream_instrumentation(self.instrument_command())
+        try:
+            for line in lines:
+                parser.feed(line)
+                if parser.failed:
+                    break
+        finally:
+            lines.close()
+        if parser.failed or not parser.finished:
+            raise PhysaliaExecutionFailed(parser.describe_failure())
+        return parser.results
+
+    def batch_command(self, repetitions):
+        """Get the shell command that runs the test method repeatedly."""
+        if self.repeat_argument:
+            return self.instrument_command("-e {} {} ".format(
+                self.repeat_argument, repetitions
+            ))
+        # the markers read the device clock with shell builtins only
+        marker = "read uptime idle < /proc/uptime; echo {} $i $uptime"
+        return (
+            "for i in {indexes}; do "
+            "{start}; {command}; {end}; "
+            "done".format(
+                indexes=" ".join(str(index) for index in range(repetitions)),
+                start=marker.format(REPETITION_START),
+                command=self.instrument_command(),
+                end=marker.format(REPETITION_END)
+            )
+        )
+
+    def run_batch(self, power_meter, repetitions):
+        """Measure a block of repetitions within one instrumentation session.
+
+        The power meter is stopped and the environment cleaned up even if
+        the block fails.
+
+        Returns:
+            list: a `Measurement` for each repetition that succeeded.
+
+        """
+        clock = DeviceClock()
+        measuring = False
+        try:
+            self.prepare()
+            clock.sync()
+            window_start = time.time()
+            power_meter.start()
+            measuring = True
+            if self.repeat_argument:
+                boundaries = self.stream_repetitions(repetitions)
+            else:
+                boundaries = self.stream_repetition_loop(repetitions)
+            measuring = False
+            energy_consumption, duration, error_flag = power_meter.stop()
+        finally:
+            if measuring:
+                power_meter.stop()
+            self.cleanup()
+        if error_flag:
+            return []
+        succeeded = []
+        for start, end, failure in boundaries:
+            if end is None or failure:
+                click.secho("A repetition of {} has failed: {}".format(
+                    self.name, failure or "it did not finish."), fg='red')
+                continue
+            succeeded.append((clock.to_host(start), clock.to_host(end)))
+        return self.repetition_measurements(
+            power_meter, window_start, energy_consumption, duration,
+            succeeded
+        )
+
+    def stream_repetitions(self, repetitions):
+        """Run repetitions in one instrumentation, reading their markers.
+
+        Returns:
+            list: ``[start, end, failure]`` of each repetition, in device
+            time. ``end`` is None if the repetition did not finish.
+
+        """
+        parser = InstrumentationParser()
+        lines = self.stream_instrumentation(self.batch_command(repetitions))
+        try:
+            for line in lines:
+                parser.feed(line)
+                if parser.failed:
+                    # do not waste the rest of the block
+                    break
+        finally:
+            lines.close()
+        boundaries = {}
+        for marker, repetition, device_time in parser.markers:
+            if marker == "start":
+                boundaries[repetition] = [device_time, None, None]
+            elif marker == "end" and repetition in boundaries:
+                boundaries[repetition][1] = device_time
+        for boundary in boundaries.values():
+            if boundary[1] is None and parser.failed:
+                boundary[2] = parser.describe_failure()
+        return [boundaries[repetition] for repetition in sorted(boundaries)]
+
+    def stream_repetition_loop(self, repetitions):
+        """Run an instrumentation per repetition, reading their markers.
+
+        Returns:
+            list: ``[start, end, failure]`` of each repetition, in device
+            time. ``end`` is None if the repetition did not finish.
+
+        """
+        boundaries = []
+        parser = None
+        lines = self.stream_instrumentation(self.batch_command(repetitions))
+        try:
+            for line in lines:
+                fields = line.split()
+                if fields and fields[0] == REPETITION_START:
+                    parser = InstrumentationParser()
+                    boundaries.append([float(fields[2]), None, parser])
+                elif fields and fields[0] == REPETITION_END and boundaries:
+                    boundaries[-1][1] = float(fields[2])
+                elif parser is not None:
+                    parser.feed(line)
+                    if parser.failed:
+                        # do not waste the rest of the block
+                        break
+        finally:
+            lines.close()
+        for boundary in boundaries:
+            parser = boundary[2]
+            failed = parser.failed or not parser.finished
+            boundary[2] = parser.describe_failure() if failed else None
+        return boundaries
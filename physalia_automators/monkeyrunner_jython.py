@@ -1,10 +1,20 @@
 """Interaction using monkey runner.
 
 Only works with Nexus 5X.
+
+Usage:
+    monkeyrunner monkeyrunner_jython.py <routine>
+    monkeyrunner monkeyrunner_jython.py serve <port>
+
+In server mode, the device connection is kept open and routines are
+requested through a local socket, one routine name per line. Each request
+is answered with a line with ``OK`` or ``ERROR <message>``.
 """
 
 from com.android.monkeyrunner import MonkeyRunner, MonkeyDevice
 from constants import loop_count
+import os
+import socket
 import sys
 
 PACKAGE = "com.tqrg.physalia.testapp"
@@ -19,6 +29,22 @@ TEXT_FIELD = (560, 950)
 PAINT_TOP = (560, 1012)
 TEXT_AREA = (560, 1610)
 
+_device = None
+
+def connect():
+    """Connect to the device selected with ANDROID_SERIAL, if any.
+
+    The connection is reused by the following routines.
+    """
+    global _device
+    if _device is None:
+        serial = os.environ.get("ANDROID_SERIAL")
+        if serial:
+            _device = MonkeyRunner.waitForConnection(5, serial)
+        else:
+            _device = MonkeyRunner.waitForConnection()
+    return _device
+
 # -------------------------------------------------------------------------- #
 
 def run_find_by_id():
@@ -31,7 +57,7 @@ def run_find_by_id():
         "com.tqrg.physalia.testapp:id/paint",
         "com.tqrg.physalia.testapp:id/text_area",
     ]
-    device = MonkeyRunner.waitForConnection()
+    device = connect()
     for _ in range(loop_count.FIND_BY_ID):
         for element in elements:
             device.getViewById(element).getLocation()
@@ -45,7 +71,7 @@ def run_tap():
         BUTTON_3,
         BUTTON_FAB,
     ]
-    device = MonkeyRunner.waitForConnection()
+    device = connect()
     for _ in range(loop_count.TAP):
         for element in elements:
             device.touch(
@@ -64,7 +90,7 @@ def run_long_tap():
         BUTTON_3,
         BUTTON_FAB,
     ]
-    device = MonkeyRunner.waitForConnection()
+    device = connect()
     for _ in range(loop_count.LONG_TAP):
         for element in elements:
             device.touch(
@@ -88,7 +114,7 @@ def run_dragndrop():
         (BUTTON_FAB, BUTTON_3),
         (BUTTON_FAB, TEXT_AREA),
     ]
-    device = MonkeyRunner.waitForConnection()
+    device = connect()
     for _ in range(loop_count.DRAGNDROP):
         for first, second in moves:
             device.drag(
@@ -102,7 +128,7 @@ def run_dragndrop():
 
 def run_swipe():
     x_i, y_i = PAINT_TOP
-    device = MonkeyRunner.waitForConnection()
+    device = connect()
 
     def simple_routine(offset_y):
         # Swipe left
@@ -120,7 +146,7 @@ def run_swipe():
 # -------------------------------------------------------------------------- #
 
 def run_back_button():
-    device = MonkeyRunner.waitForConnection()
+    device = connect()
     for _ in range(loop_count.BACK_BUTTON):
         device.press("KEYCODE_BACK", MonkeyDevice.DOWN_AND_UP)
 
@@ -129,7 +155,7 @@ def run_back_button():
 # -------------------------------------------------------------------------- #
 
 def run_input_text():
-    device = MonkeyRunner.waitForConnection()
+    device = connect()
     len_message = 17
     for _ in range(loop_count.INPUT_TEXT):
         device.type("Physalia")
@@ -142,7 +168,42 @@ def run_input_text():
 
 # run_input_text()
 
-if len(sys.argv) == 2:
+# -------------------------------------------------------------------------- #
+
+def serve(port):
+    """Run the routines requested through a local socket."""
+    connect()
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(("127.0.0.1", port))
+    server.listen(1)
+    while True:
+        connection, _ = server.accept()
+        stream = connection.makefile('rw')
+        for line in iter(stream.readline, ''):
+            method_name = line.strip()
+            if method_name == "quit":
+                stream.write("OK\n")
+                stream.flush()
+                connection.close()
+                server.close()
+                return
+            routine = globals().get(method_name)
+            if not method_name.startswith("run_") or routine is None:
+                stream.write("ERROR unknown routine %s\n" % method_name)
+            else:
+                try:
+                    routine()
+                    stream.write("OK\n")
+                except Exception:
+                    error = str(sys.exc_info()[1]).replace("\n", " ")
+                    stream.write("ERROR %s\n" % error)
+            stream.flush()
+        connection.close()
+
+if len(sys.argv) == 3 and sys.argv[1] == "serve":
+    serve(int(sys.argv[2]))
+elif len(sys.argv) == 2:
     method_name = sys.argv[1]
     exec(method_name+"()")
 
@@ -156,7 +217,7 @@ if len(sys.argv) == 2:
 #         BUTTON_FAB,
 #         TEXT_AREA,
 #     ]
-#     device = MonkeyRunner.waitForConnection()
+#     device = connect()
 #     for _ in range(10):
 #         for idx, el in enumerate(elements):
 #             prev_el = elements[idx-1]
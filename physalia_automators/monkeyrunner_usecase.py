@@ -1,9 +1,14 @@
 """Interaction using Monkeyrunner"""
 
 from physalia.energy_profiler import AndroidUseCase
-from utils import minimum_execution_time, get_path
+from physalia.exceptions import PhysaliaExecutionFailed
+from retrying import retry
+from utils import minimum_execution_time, get_path, get_free_port
 import time_boundaries
+from physalia_automators import app_state
+from physalia_automators import phases
 import os
+import socket
 import subprocess
 import click
 
@@ -17,12 +22,117 @@ if not os.path.exists(monkeyrunner_path):
 if not os.path.exists(monkeyrunner_path):
     click.secho("Error: Could not find monkeyrunner", fg='red')
 
+DAEMON_STARTUP_TIMEOUT = 120
+# seconds to wait for the reply to a routine: well above the longest
+# ones (swipe takes up to 80s), or the minimum execution time plus a margin
+REQUEST_TIMEOUT = 300
+REQUEST_TIMEOUT_MARGIN = 60
+
+
+class MonkeyrunnerDaemon(object):
+    """Long-lived monkeyrunner process that runs routines on request.
+
+    The JVM, Jython and the device connection are set up once, so
+    requesting a routine costs a round trip in a local socket. A daemon
+    that hangs, exits or drops the connection is killed, and started again
+    when the next run prepares.
+
+    Args:
+        jython_module   monkeyrunner script with the routines.
+    """
+
+    def __init__(self, jython_module):  # noqa: D107
+        self.jython_module = jython_module
+        self.process = None
+        self.connection = None
+        self.stream = None
+
+    def is_alive(self):
+        """Check whether the monkeyrunner process is running."""
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """Start monkeyrunner in server mode and connect to it."""
+        if self.is_alive():
+            return
+        click.secho("Starting Monkeyrunner daemon...", fg='blue')
+        port = get_free_port()
+        self.process = subprocess.Popen(
+            [monkeyrunner_path, self.jython_module, "serve", str(port)]
+        )
+        self.connection = self._connect(port)
+        self.stream = self.connection.makefile('rw')
+
+    @retry(wait_fixed=500, stop_max_delay=DAEMON_STARTUP_TIMEOUT*1000,
+           retry_on_exception=lambda error: isinstance(error, socket.error))
+    def _connect(self, port):
+        if not self.is_alive():
+            raise PhysaliaExecutionFailed("Monkeyrunner daemon has exited.")
+        return socket.create_connection(('127.0.0.1', port))
+
+    def request(self, command, timeout=REQUEST_TIMEOUT):
+        """Send a command and wait for its reply.
+
+        Args:
+            command     name of the routine, or "quit".
+            timeout     seconds to wait for the reply.
+        """
+        try:
+            self.connection.settimeout(timeout)
+            self.stream.write(command + "\n")
+            self.stream.flush()
+            reply = self.stream.readline()
+        except (socket.timeout, socket.error, IOError) as error:
+            self.kill()
+            raise PhysaliaExecutionFailed(
+                "Monkeyrunner daemon failed to run {}: {}".format(
+                    command, error)
+            )
+        if not reply:
+            self.kill()
+            raise PhysaliaExecutionFailed(
+                "Monkeyrunner daemon closed the connection while running "
+                "{}.".format(command)
+            )
+        reply = reply.strip()
+        if reply != "OK":
+            raise PhysaliaExecutionFailed(
+                "Monkeyrunner failed to run {}: {}".format(command, reply)
+            )
+
+    def kill(self):
+        """Kill the monkeyrunner process, so that `start` starts a new one."""
+        click.secho("Killing Monkeyrunner daemon...", fg='yellow')
+        try:
+            self.connection.close()
+        except socket.error:
+            pass
+        if self.is_alive():
+            self.process.kill()
+            self.process.wait()
+
+    def stop(self):
+        """Ask monkeyrunner to exit."""
+        if not self.is_alive():
+            return
+        click.secho("Stopping Monkeyrunner daemon...", fg='blue')
+        try:
+            self.request("quit")
+            self.connection.close()
+        except PhysaliaExecutionFailed:
+            return
+        self.process.wait()
+
+
 class MonkeyrunnerUseCase(AndroidUseCase):
     """`AndroidUseCase` to use with `Monkeyrunner`."""
 
     # pylint: disable=too-many-arguments
     # Eight is reasonable in this case.
 
+    use_daemon = True
+    daemons = {}
+
     def __init__(self, name, app_apk, app_pkg, app_version,
                  jython_module, test_case,
                  minimum_execution_time):  # noqa: D102
@@ -35,19 +145,45 @@ class MonkeyrunnerUseCase(AndroidUseCase):
 
     def prepare(self):
         """Prepare environment for running."""
-        self.install_app()
-        self.open_app()
+        app_state.prepare_app(self)
+        if self.use_daemon:
+            with phases.phase("warm_up"):
+                self.get_daemon().start()
         self._prepare()
         click.secho("Starting use case {}.".format(self.name), fg='green')
 
     def cleanup(self):
         """Clean environment after running."""
         self._cleanup()
-        self.uninstall_app()
+        app_state.release_app(self)
     
+    def get_daemon(self):
+        """Get the daemon that runs the routines of `jython_module`."""
+        if self.jython_module not in self.daemons:
+            self.daemons[self.jython_module] = MonkeyrunnerDaemon(
+                self.jython_module
+            )
+        return self.daemons[self.jython_module]
+
+    def request_timeout(self):
+        """Get the seconds to wait for the routine of this use case."""
+        return max(REQUEST_TIMEOUT,
+                   self.minimum_execution_time + REQUEST_TIMEOUT_MARGIN)
+
+    @classmethod
+    def stop_daemons(cls):
+        """Stop every Monkeyrunner daemon."""
+        for daemon in cls.daemons.values():
+            daemon.stop()
+        cls.daemons.clear()
+
     def _run(self):
         @minimum_execution_time(seconds=self.minimum_execution_time)
         def launch_monkeyrunner():
+            if self.use_daemon:
+                self.get_daemon().request(self.test_case,
+                                          self.request_timeout())
+                return
             subprocess.check_output(
                 [
                     monkeyrunner_path,
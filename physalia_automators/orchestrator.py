@@ -0,0 +1,237 @@
+"""Overlap host-side work with the device phases of a campaign.
+
+Quiet window contract: while the power meter is measuring, this process
+does nothing but the use case under measurement. No adb commands, no
+file writes and no host work that could delay or perturb the device.
+
+Host work that does not have to happen right away is submitted to the
+`Orchestrator` instead: saving results, flushing logs and warming up the
+session of the next framework. A background thread runs it only outside
+quiet windows. Apks are pushed to the device between framework blocks,
+once the background work of the previous block is done, so that a push is
+never in progress when a quiet window has to start. Entering a window waits for the task in
+progress to finish, and tasks submitted during a window wait until it is
+over.
+
+Quiet windows are opened and closed by `QuietPowerMeter`, which wraps the
+power meter given to the use cases, so they match the measured window
+exactly.
+"""
+
+import sys
+import threading
+import click
+from physalia.models import Measurement
+from physalia_automators import install_cache
+from physalia_automators import phases
+from physalia_automators import run_notes
+from physalia_automators.resume_ledger import ResumeLedger
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+class Orchestrator(object):
+    """Run host-side work in the background, outside quiet windows."""
+
+    def __init__(self):  # noqa: D107
+        self.tasks = queue.Queue()
+        self.condition = threading.Condition()
+        self.quiet = False
+        self.busy = False
+        self.thread = None
+
+    def submit(self, function, *args, **kwargs):
+        """Run a function in the background, outside quiet windows."""
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._work,
+                                           name="physalia-orchestrator")
+            self.thread.daemon = True
+            self.thread.start()
+        self.tasks.put((function, args, kwargs))
+
+    def _work(self):
+        while True:
+            function, args, kwargs = self.tasks.get()
+            with self.condition:
+                while self.quiet:
+                    self.condition.wait()
+                self.busy = True
+            try:
+                function(*args, **kwargs)
+            except Exception as error:  # pylint: disable=broad-except
+                click.secho("Background task {} has failed: {}".format(
+                    getattr(function, '__name__', function), error), fg='red')
+            finally:
+                with self.condition:
+                    self.busy = False
+                    self.condition.notify_all()
+                self.tasks.task_done()
+
+    def enter_quiet_window(self):
+        """Wait for the task in progress and hold the others."""
+        with self.condition:
+            self.quiet = True
+            while self.busy:
+                self.condition.wait()
+
+    def leave_quiet_window(self):
+        """Let background tasks run again."""
+        with self.condition:
+            self.quiet = False
+            self.condition.notify_all()
+
+    def drain(self):
+        """Wait until every submitted task has run."""
+        self.leave_quiet_window()
+        self.tasks.join()
+
+    def profile(self, use_case, power_meter, count, retry_limit=1,
+                save_to_csv=None, batch_size=1, verbose=True):
+        """Measure a use case, like `AndroidUseCase.profile`.
+
+        Measurements, the phases of each run and its notes are saved in
+        the background, between repetitions.
+
+        Args:
+            use_case        `AndroidUseCase` to measure.
+            power_meter     Power meter to use in measurements.
+            count           Number of measurements.
+            retry_limit     Number of times to retry on error.
+            save_to_csv     File name to store measurements.
+            batch_size      Repetitions per block, for use cases that
+                            support batched profiling.
+            verbose         Log activity (default=True).
+        Returns: Set of measurements
+
+        """
+        quiet_power_meter = QuietPowerMeter(power_meter, self)
+        batched = batch_size > 1 and hasattr(use_case, 'profile_batched')
+        results = []
+        runs = 0
+        try:
+            while len(results) < count and runs < count:
+                runs += 1
+                phases.start_run()
+                run_notes.start_run()
+                if batched:
+                    block = use_case.profile_batched(
+                        power_meter=quiet_power_meter,
+                        count=min(batch_size, count - len(results)),
+                        batch_size=batch_size,
+                        retry_limit=retry_limit,
+                        verbose=False
+                    )
+                else:
+                    result = use_case.run(power_meter=quiet_power_meter,
+                                          retry_limit=retry_limit)
+                    block = [result] if result else []
+                phases.switch("cleanup")
+                run_phases = phases.finish_run()
+                notes = run_notes.finish_run()
+                if save_to_csv:
+                    self.submit(phases.save, save_to_csv, use_case.name,
+                                block, run_phases)
+                    self.submit(run_notes.save, save_to_csv, use_case.name,
+                                block, notes)
+                if not block:
+                    if batched:
+                        # profile_batched has already retried the block
+                        break
+                    click.secho("Error in execution {} of {}. Skipping."
+                                .format(runs - 1, use_case.name), fg='red')
+                    continue
+                for measurement in block:
+                    if save_to_csv:
+                        self.submit(
+                            ResumeLedger.for_file(save_to_csv).record,
+                            measurement
+                        )
+                results.extend(block)
+                self.submit(flush_logs)
+        finally:
+            # a failed run may leave without stopping the power meter
+            self.leave_quiet_window()
+        if verbose and results:
+            click.secho("Energy consumption results for {}: "
+                        "{:.3f} Joules (s = {:.3f}).\n"
+                        "It took {:.1f} seconds (s = {:.1f})."
+                        .format(use_case.app_pkg,
+                                *Measurement.describe(results)),
+                        fg='green')
+        return results
+
+    def prepare_framework(self, framework):
+        """Stage the apks of a framework before its block starts.
+
+        Waits for the background work of the previous block first, so that
+        no task of the previous framework overlaps with this one.
+        """
+        self.drain()
+        stage_apks(framework.use_cases.values())
+
+    def warm_up_framework(self, framework):
+        """Warm up the session of a framework in the background."""
+        warm_up = getattr(framework, 'warm_up', None)
+        if callable(warm_up):
+            self.submit(warm_up)
+
+
+class QuietPowerMeter(object):
+    """Power meter that keeps an orchestrator quiet while it measures.
+
+    Args:
+        power_meter     power meter that does the measurements.
+        orchestrator    `Orchestrator` to keep quiet.
+    """
+
+    def __init__(self, power_meter, orchestrator):  # noqa: D107
+        self.power_meter = power_meter
+        self.orchestrator = orchestrator
+
+    def start(self):
+        """Enter a quiet window and start measuring."""
+        self.orchestrator.enter_quiet_window()
+        phases.switch("prepare")
+        self.power_meter.start()
+
+    def stop(self):
+        """Stop measuring and leave the quiet window."""
+        try:
+            return self.power_meter.stop()
+        finally:
+            phases.switch("interaction")
+            self.orchestrator.leave_quiet_window()
+
+    def __getattr__(self, name):
+        """Delegate everything else to the power meter."""
+        return getattr(self.power_meter, name)
+
+    def __str__(self):
+        """Describe the power meter."""
+        return str(self.power_meter)
+
+
+def flush_logs():
+    """Flush the output of the campaign."""
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+
+def stage_apks(use_cases):
+    """Push the apks of some use cases to the device ahead of time."""
+    apks = set()
+    for use_case in use_cases:
+        if use_case is None:
+            continue
+        apks.add(use_case.app_apk)
+        test_apk = getattr(use_case, 'test_apk', None)
+        if test_apk:
+            apks.add(test_apk)
+    for apk in sorted(apks):
+        install_cache.stage(apk)
+
+
+orchestrator = Orchestrator()
@@ -0,0 +1,100 @@
+"""Show where the time of a campaign goes.
+
+Reads the phases saved next to the results (``<output>.phases.csv``) and
+shows, for each framework, the hours spent in each phase of the runs and
+their share of the campaign, followed by the mean time per repetition of
+each phase for every use case.
+
+Example:
+        ``$ python physalia_automators/phase_report.py results.csv``
+"""
+
+# pylint: disable=no-value-for-parameter
+# pylint: disable=missing-docstring
+
+import csv
+from collections import OrderedDict
+import click
+from physalia_automators.phases import PHASES, PHASES_SUFFIX
+
+COLUMN_USE_CASE = 1
+COLUMN_REPETITIONS = 2
+COLUMN_PHASE = 3
+COLUMN_WALL_TIME = 4
+COLUMN_CPU_TIME = 5
+
+
+@click.command()
+@click.argument('outputs', nargs=-1, type=click.Path(dir_okay=False))
+def tool(outputs):
+    """Show the phase breakdown of the given results files."""
+    rows = []
+    for output in outputs or ("results.csv",):
+        rows.extend(load_phases(output + PHASES_SUFFIX))
+    if not rows:
+        click.secho("No phases were recorded.", fg='red')
+        return
+    report_frameworks(rows)
+    report_use_cases(rows)
+
+
+def load_phases(filename):
+    """Get the rows of a phases file, or none if it does not exist."""
+    try:
+        with open(filename) as phases_file:
+            return list(csv.reader(phases_file))
+    except IOError:
+        click.secho("{} not found.".format(filename), fg='yellow')
+        return []
+
+
+def framework_of(use_case):
+    """Get the framework of a use case, e.g. ``Appium[fast]``."""
+    return use_case.rpartition("-")[0] or use_case
+
+
+def report_frameworks(rows):
+    """Show the hours spent in each phase, per framework."""
+    wall = OrderedDict()
+    cpu = {}
+    for row in rows:
+        key = (framework_of(row[COLUMN_USE_CASE]), row[COLUMN_PHASE])
+        wall[key] = wall.get(key, 0) + float(row[COLUMN_WALL_TIME])
+        cpu[key] = cpu.get(key, 0) + float(row[COLUMN_CPU_TIME])
+    total = sum(wall.values()) or 1
+    frameworks = OrderedDict((framework, None) for framework, _ in wall)
+    click.secho("\n{:<32}{:<14}{:>12}{:>10}{:>12}".format(
+        "Framework", "Phase", "Wall (h)", "Share", "CPU (h)"), fg='blue')
+    for framework in frameworks:
+        for phase in PHASES:
+            hours = wall.get((framework, phase), 0) / 3600
+            click.secho("{:<32}{:<14}{:>12.2f}{:>9.1f}%{:>12.2f}".format(
+                framework, phase, hours, 100 * hours * 3600 / total,
+                cpu.get((framework, phase), 0) / 3600))
+    click.secho("{:<46}{:>12.2f}".format("Total", total / 3600), bold=True)
+
+
+def report_use_cases(rows):
+    """Show the mean seconds per repetition of each phase, per use case."""
+    wall = OrderedDict()
+    repetitions = {}
+    for row in rows:
+        use_case = row[COLUMN_USE_CASE]
+        phase_times = wall.setdefault(use_case, dict.fromkeys(PHASES, 0))
+        phase_times[row[COLUMN_PHASE]] += float(row[COLUMN_WALL_TIME])
+        if row[COLUMN_PHASE] == PHASES[0]:
+            repetitions[use_case] = (repetitions.get(use_case, 0) +
+                                     int(row[COLUMN_REPETITIONS]))
+    click.secho("\n{:<44}".format("Use case (s per repetition)") +
+                "".join("{:>13}".format(phase) for phase in PHASES),
+                fg='blue')
+    for use_case, phase_times in sorted(wall.items()):
+        count = repetitions.get(use_case) or 1
+        click.secho("{:<44}".format(use_case) + "".join(
+            "{:>13.2f}".format(phase_times[phase] / count)
+            for phase in PHASES
+        ))
+
+
+if __name__ == '__main__':
+    tool()
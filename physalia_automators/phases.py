@@ -0,0 +1,141 @@
+"""Break the runs of the use cases down into phases.
+
+Phases of a run:
+    prepare         from the start of the run until the power meter
+                    starts: installing, resetting and opening the app,
+                    waiting for views. Failed attempts count here too.
+    warm_up         connecting to the device and starting sessions,
+                    servers or the instrumentation runner, usually while
+                    preparing. Not counted in the phase around it.
+    interaction     measured window, without the padding and warm-up.
+    padding         sleep added to reach the minimum execution time.
+    cleanup         from the moment the power meter stops until the run
+                    returns.
+
+Each phase gets its wall time and the CPU time of this process: all of
+its threads, the orchestrator thread included, plus the child processes
+that have exited and been waited for. Children still running when a
+phase ends, e.g. an Appium server, are not counted. Phases are saved
+next to the results, in ``<output>.phases.csv``, with a row per phase of
+each run: timestamp, use case, repetitions, phase, wall time (s), CPU
+time (s).
+Batched runs save their phases once per block of repetitions.
+"""
+
+import csv
+import os
+import time
+from contextlib import contextmanager
+
+PHASES = ["prepare", "warm_up", "interaction", "padding", "cleanup"]
+PHASES_SUFFIX = ".phases.csv"
+
+
+def cpu_time():
+    """Get the CPU time used so far by this process.
+
+    User and system time of every thread of the process, plus those of
+    the child processes that have exited and been waited for.
+    """
+    times = os.times()
+    return times[0] + times[1] + times[2] + times[3]
+
+
+class PhaseRecorder(object):
+    """Phase times of the run in progress in the current process.
+
+    The run moves from one phase to the next with `switch`. Nested phases
+    (warm-up and padding) are timed with `phase` and are not counted in
+    the phase around them.
+    """
+
+    wall = {}
+    cpu = {}
+    mark = None
+    nested = (0, 0)
+
+    @staticmethod
+    def now():
+        """Get the current wall and CPU times."""
+        return time.time(), cpu_time()
+
+    @classmethod
+    def start_run(cls):
+        """Start timing a run from now."""
+        cls.wall = dict.fromkeys(PHASES, 0)
+        cls.cpu = dict.fromkeys(PHASES, 0)
+        cls.mark = cls.now()
+        cls.nested = (0, 0)
+
+    @classmethod
+    def add(cls, phase, wall, cpu):
+        """Add some time to a phase."""
+        cls.wall[phase] = cls.wall.get(phase, 0) + wall
+        cls.cpu[phase] = cls.cpu.get(phase, 0) + cpu
+
+    @classmethod
+    def switch(cls, phase):
+        """Close `phase`, which has run since the last switch."""
+        if cls.mark is None:
+            return
+        wall, cpu = cls.now()
+        cls.add(phase,
+                wall - cls.mark[0] - cls.nested[0],
+                cpu - cls.mark[1] - cls.nested[1])
+        cls.mark = (wall, cpu)
+        cls.nested = (0, 0)
+
+    @classmethod
+    @contextmanager
+    def phase(cls, phase):
+        """Time a part of the current phase as `phase`."""
+        start_wall, start_cpu = cls.now()
+        try:
+            yield
+        finally:
+            wall, cpu = cls.now()
+            wall, cpu = wall - start_wall, cpu - start_cpu
+            if cls.mark is not None:
+                cls.add(phase, wall, cpu)
+                cls.nested = (cls.nested[0] + wall, cls.nested[1] + cpu)
+
+    @classmethod
+    def finish_run(cls):
+        """Stop timing the run.
+
+        Returns:
+            dict: ``(wall time, CPU time)`` of each phase.
+
+        """
+        cls.mark = None
+        return dict(
+            (phase, (cls.wall.get(phase, 0), cls.cpu.get(phase, 0)))
+            for phase in PHASES
+        )
+
+    @staticmethod
+    def save(output, use_case_name, measurements, run_phases):
+        """Save the phases of a run next to its measurements.
+
+        Args:
+            output          results file of the measurements.
+            use_case_name   name of the use case.
+            measurements    measurements of the run (several if batched).
+            run_phases      phases returned by `finish_run`.
+        """
+        timestamp = measurements[0].timestamp if measurements else time.time()
+        with open(output + PHASES_SUFFIX, 'a') as phases_file:
+            csv_writer = csv.writer(phases_file)
+            for phase in PHASES:
+                wall, cpu = run_phases[phase]
+                csv_writer.writerow([
+                    timestamp, use_case_name, len(measurements), phase,
+                    "{:.6f}".format(wall), "{:.6f}".format(cpu)
+                ])
+
+
+start_run = PhaseRecorder.start_run
+switch = PhaseRecorder.switch
+phase = PhaseRecorder.phase
+finish_run = PhaseRecorder.finish_run
+save = PhaseRecorder.save
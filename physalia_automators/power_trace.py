@@ -0,0 +1,153 @@
+"""Attribute the energy of a measurement window to parts of it.
+
+Batched use cases run a block of repetitions within a single measurement
+window. Markers printed at the boundaries of each repetition carry the time
+when the boundary was reached, and the power trace of the window is sliced
+per repetition. Markers printed in the device are timestamped with the
+device clock and converted to the host clock with `DeviceClock`, so the
+delay of the output through adb does not shift the slices.
+"""
+
+import time
+import click
+from physalia.models import Measurement
+from physalia_automators import adb
+
+REPETITION_START = "PHYSALIA_REPETITION_START"
+REPETITION_END = "PHYSALIA_REPETITION_END"
+
+
+def slice_energy(power_meter, window_start, energy_consumption, duration,
+                 start, end):
+    """Get the energy consumed between `start` and `end`.
+
+    Uses the samples collected by the power meter when they are available
+    (Monsoon). Otherwise, the energy of the whole window is attributed in
+    proportion to time.
+
+    Args:
+        power_meter         power meter that was stopped after the window.
+        window_start        time when the power meter was started.
+        energy_consumption  energy consumed in the whole window (J).
+        duration            duration of the whole window (s).
+        start               start time of the slice.
+        end                 end time of the slice.
+
+    Returns:
+        float: energy consumption in Joules.
+
+    """
+    reader = getattr(power_meter, 'monsoon_reader', None)
+    data = reader and reader.data
+    if data and data.data_points:
+        first = max(int((start - window_start) * data.hz), 0)
+        last = min(int((end - window_start) * data.hz), len(data.data_points))
+        return sum(data.data_points[first:last])/data.hz/1000
+    if duration <= 0:
+        return 0
+    return energy_consumption * (end - start) / duration
+
+
+class DeviceClock(object):
+    """Convert times of the device clock to the host clock.
+
+    The device clock is the boot time clock, ``SystemClock.elapsedRealtime``,
+    which shell commands read from ``/proc/uptime``. Sync it outside the
+    measured window: it costs an adb round trip.
+    """
+
+    def __init__(self):  # noqa: D107
+        self.offset = None
+
+    def sync(self):
+        """Measure the offset between the device and the host clocks."""
+        host_start = time.time()
+        uptime = float(adb.shell("cat /proc/uptime").split()[0])
+        host_end = time.time()
+        self.offset = (host_start + host_end) / 2 - uptime
+
+    def to_host(self, device_time):
+        """Get the host time of a device time, in seconds."""
+        return device_time + self.offset
+
+
+class BatchedUseCaseMixin(object):
+    """Measure an `AndroidUseCase` in blocks of repetitions.
+
+    Subclasses implement ``run_batch(power_meter, repetitions)``, which
+    measures a block and returns a `Measurement` per successful repetition.
+    A block that raises an error counts as failed, like an empty one.
+    """
+
+    def repetition_measurements(self, power_meter, window_start,
+                                energy_consumption, duration, repetitions):
+        """Build a `Measurement` for each repetition of a window.
+
+        Args:
+            power_meter         power meter that measured the window.
+            window_start        time when the power meter was started.
+            energy_consumption  energy consumed in the whole window (J).
+            duration            duration of the whole window (s).
+            repetitions         list of ``(start, end)`` times.
+        """
+        device_model = adb.get_device_model()
+        return [
+            Measurement(
+                end,
+                self.name,
+                self.app_pkg,
+                self.app_version,
+                device_model,
+                end - start,
+                slice_energy(power_meter, window_start,
+                             energy_consumption, duration, start, end),
+                str(power_meter)
+            )
+            for start, end in repetitions
+        ]
+
+    def profile_batched(self, power_meter, count=30, batch_size=10,
+                        retry_limit=1, save_to_csv=None, verbose=True):
+        """Run a batch of measurements in blocks of `batch_size` repetitions.
+
+        Args:
+            power_meter     Power meter to use in measurements.
+            count           Number of measurements (default=30).
+            batch_size      Repetitions measured in a single window.
+            retry_limit     Number of times to retry a failed block.
+            save_to_csv     File name to store measurements.
+            verbose         Log activity (default=True).
+        Returns: Set of measurements
+
+        """
+        results = []
+        retries = 0
+        while len(results) < count:
+            try:
+                block = self.run_batch(
+                    power_meter, min(batch_size, count - len(results))
+                )
+            except Exception as error:  # pylint: disable=broad-except
+                click.secho("Block of {} has failed: {}".format(
+                    self.name, error), fg='red')
+                block = []
+            if not block:
+                retries += 1
+                if retries > retry_limit:
+                    click.secho(
+                        "Giving up on {}.".format(self.name), fg='red'
+                    )
+                    break
+                click.secho("Retrying...", fg='yellow')
+                continue
+            for measurement in block:
+                if save_to_csv:
+                    measurement.save_to_csv(save_to_csv)
+            results.extend(block)
+        if verbose and results:
+            click.secho("Energy consumption results for {}: "
+                        "{:.3f} Joules (s = {:.3f}).\n"
+                        "It took {:.1f} seconds (s = {:.1f})."
+                        .format(self.app_pkg, *Measurement.describe(results)),
+                        fg='green')
+        return results
@@ -0,0 +1,109 @@
+"""Interaction using Python Ui Automator with batched selector queries.
+
+Same find routines as `python_ui_automator_usecase`, but the selectors of
+each loop are sent in a single JSON-RPC batch request instead of one call
+per selector. Comparing both sets of use cases shows how much of the
+energy goes to protocol chatter.
+"""
+
+from physalia.energy_profiler import AndroidUseCase
+from physalia_automators.utils import minimum_execution_time
+from physalia_automators import time_boundaries
+from physalia_automators.constants import loop_count
+from physalia_automators.python_ui_automator_usecase import (
+    APK, prepare, cleanup
+)
+from physalia_automators.uiautomator_pool import device
+
+# -------------------------------------------------------------------------- #
+
+FIND_BY_ID_SELECTORS = [
+    {"resourceId": "com.tqrg.physalia.testapp:id/button_1"},
+    {"resourceId": "com.tqrg.physalia.testapp:id/button_2"},
+    {"resourceId": "com.tqrg.physalia.testapp:id/button_3"},
+    {"resourceId": "com.tqrg.physalia.testapp:id/text_field"},
+    {"resourceId": "com.tqrg.physalia.testapp:id/fab"},
+    {"resourceId": "com.tqrg.physalia.testapp:id/paint"},
+    {"resourceId": "com.tqrg.physalia.testapp:id/text_area"},
+]
+
+@minimum_execution_time(time_boundaries.FIND_BY_ID)
+def run_find_by_id(_):
+    for _ in range(loop_count.FIND_BY_ID):
+        device.query(FIND_BY_ID_SELECTORS)
+
+find_by_id_use_case = AndroidUseCase(
+    "PythonUiAutomator-batched-find_by_id",
+    APK,
+    "com.tqrg.physalia.testapp",
+    "0.01",
+    run=run_find_by_id,
+    prepare=prepare,
+    cleanup=cleanup
+)
+
+# -------------------------------------------------------------------------- #
+
+FIND_BY_DESCRIPTION_SELECTORS = [
+    {"description": "Button One"},
+    {"description": "Button Two"},
+    {"description": "Button Three"},
+    {"description": "Button Fab"},
+    {"description": "Text Field"},
+    {"description": "Paint"},
+    {"description": "Text Area"},
+]
+
+@minimum_execution_time(time_boundaries.FIND_BY_DESCRIPTION)
+def run_find_by_description(_):
+    for _ in range(loop_count.FIND_BY_DESCRIPTION):
+        device.query(FIND_BY_DESCRIPTION_SELECTORS)
+
+find_by_description_use_case = AndroidUseCase(
+    "PythonUiAutomator-batched-find_by_description",
+    APK,
+    "com.tqrg.physalia.testapp",
+    "0.01",
+    run=run_find_by_description,
+    prepare=prepare,
+    cleanup=cleanup
+)
+
+# -------------------------------------------------------------------------- #
+
+FIND_BY_CONTENT_SELECTORS = [
+    {"text": "Button 1"},
+    {"text": "Button 2"},
+    {"text": "Button 3"},
+]
+
+@minimum_execution_time(time_boundaries.FIND_BY_CONTENT)
+def run_find_by_content(_):
+    for _ in range(loop_count.FIND_BY_CONTENT):
+        device.query(FIND_BY_CONTENT_SELECTORS)
+
+find_by_content_use_case = AndroidUseCase(
+    "PythonUiAutomator-batched-find_by_content",
+    APK,
+    "com.tqrg.physalia.testapp",
+    "0.01",
+    run=run_find_by_content,
+    prepare=prepare,
+    cleanup=cleanup
+)
+
+# -------------------------------------------------------------------------- #
+
+use_cases = {
+    "find_by_id": find_by_id_use_case,
+    "find_by_description": find_by_description_use_case,
+    "find_by_content": find_by_content_use_case,
+    "tap": None,
+    "long_tap": None,
+    "multi_finger_tap": None,
+    "dragndrop": None,
+    "swipe": None,
+    "pinch_and_spread": None,
+    "back_button": None,
+    "input_text": None,
+}
@@ -1,23 +1,28 @@
 """Interaction using Python Ui Automator"""
 
-import uiautomator
 import click
 from physalia.energy_profiler import AndroidUseCase
 from utils import minimum_execution_time
 import time_boundaries
 from constants import loop_count
-
-from uiautomator import device
+from physalia_automators import app_state
+from physalia_automators import phases
+from physalia_automators.uiautomator_pool import device
 
 APK = "./apks/testapp.apk"
 
+def prepare_app(use_case):
+    """Reset the app and start the RPC server before measuring."""
+    app_state.prepare_app(use_case)
+    with phases.phase("warm_up"):
+        device.warm_up()
+
 def prepare(use_case):
-    use_case.install_app()
-    use_case.open_app()
+    prepare_app(use_case)
 
 def cleanup(use_case):
     """Clean environment after running."""
-    use_case.uninstall_app()
+    app_state.release_app(use_case)
 
 
 # -------------------------------------------------------------------------- #
@@ -93,8 +98,7 @@ find_by_content_use_case = AndroidUseCase(
 
 # -------------------------------------------------------------------------- #
 def prepare_tap(use_case):
-    use_case.install_app()
-    use_case.open_app()
+    prepare_app(use_case)
     use_case.elements = [
         device(description="Button One"),
         device(description="Button Two"),
@@ -123,8 +127,7 @@ tap_use_case = AndroidUseCase(
 # -------------------------------------------------------------------------- #
 
 def prepare_long_tap(use_case):
-    use_case.install_app()
-    use_case.open_app()
+    prepare_app(use_case)
     use_case.elements = [
         device(description="Button One"),
         device(description="Button Two"),
@@ -158,8 +161,7 @@ def set_center(button):
 
 
 def prepare_dragndrop(use_case):    
-    use_case.install_app()
-    use_case.open_app()
+    prepare_app(use_case)
     button1 = device(description="Button One")
     button2 = device(description="Button Two")
     button3 = device(description="Button Three")
@@ -204,8 +206,7 @@ dragndrop_use_case = AndroidUseCase(
 # -------------------------------------------------------------------------- #
 
 def prepare_swipe(use_case):
-    use_case.install_app()
-    use_case.open_app()
+    prepare_app(use_case)
     paint = device(description="Paint")
     set_center(paint)
     use_case.x_i, use_case.y_i = (paint.centerX, paint.info['visibleBounds']["top"])
@@ -244,8 +245,7 @@ swipe_use_case = AndroidUseCase(
 # -------------------------------------------------------------------------- #
 
 def prepare_pinch_and_spread(use_case):
-    use_case.install_app()
-    use_case.open_app()
+    prepare_app(use_case)
     use_case.paint = device(description="Paint")
 
     
@@ -300,8 +300,7 @@ back_button_use_case = AndroidUseCase(
 # -------------------------------------------------------------------------- #
 
 def prepare_input_text(use_case):
-    use_case.install_app()
-    use_case.open_app()
+    prepare_app(use_case)
     use_case.text_field = device(resourceId="com.tqrg.physalia.testapp:id/text_field")
 
 @minimum_execution_time(seconds=time_boundaries.INPUT_TEXT)
@@ -0,0 +1,151 @@
+"""Registry of the frameworks under study.
+
+Frameworks are registered as entry points of the
+``physalia_automators.frameworks`` group, naming the module that defines
+their `use_cases`. Modules are only imported when their framework is
+selected: importing them pulls in the client libraries of each framework,
+may connect to the device and builds all of their use cases.
+
+The frameworks of this package are also listed in `BUILTIN_FRAMEWORKS`, so
+that the registry works from a source checkout that was not installed.
+"""
+
+import importlib
+
+ENTRY_POINT_GROUP = "physalia_automators.frameworks"
+
+BUILTIN_FRAMEWORKS = [
+    ("AndroidViewClient", "physalia_automators.android_view_client_use_case"),
+    ("Monkeyrunner", "physalia_automators.monkeyrunner_usecase"),
+    ("Robotium", "physalia_automators.robotium_usecase"),
+    ("Espresso", "physalia_automators.espresso_usecase"),
+    ("UiAutomator", "physalia_automators.ui_automator_usecase"),
+    ("Calabash", "physalia_automators.calabash_usecase"),
+    ("PythonUiAutomator", "physalia_automators.python_ui_automator_usecase"),
+    ("Appium", "physalia_automators.appium_usecase"),
+    ("AndroidViewClient-batched",
+     "physalia_automators.android_view_client_batched_usecase"),
+    ("PythonUiAutomator-batched",
+     "physalia_automators.python_ui_automator_batched_usecase"),
+    ("AndroidViewClient-cached",
+     "physalia_automators.android_view_client_cached_usecase"),
+]
+
+# opt-in variants, run right after the framework they are compared with
+BATCHED_VARIANTS = {
+    "AndroidViewClient-batched": "AndroidViewClient",
+    "PythonUiAutomator-batched": "PythonUiAutomator",
+}
+CACHED_VARIANTS = {
+    "AndroidViewClient-cached": "AndroidViewClient",
+}
+
+INTERACTIONS = [
+    "find_by_id",
+    "find_by_description",
+    "find_by_content",
+    "tap",
+    "long_tap",
+    "multi_finger_tap",
+    "dragndrop",
+    "swipe",
+    "pinch_and_spread",
+    "back_button",
+    "input_text",
+]
+
+
+def iter_entry_points(group):
+    """Get the ``(name, module_name)`` of the entry points of a group."""
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        from pkg_resources import iter_entry_points as pkg_entry_points
+        return [(entry_point.name, entry_point.module_name)
+                for entry_point in pkg_entry_points(group)]
+    found = entry_points()
+    if hasattr(found, 'select'):
+        found = found.select(group=group)
+    else:
+        found = found.get(group, [])
+    return [(entry_point.name, entry_point.value.partition(":")[0])
+            for entry_point in found]
+
+
+class FrameworkRegistry(object):
+    """Frameworks of the current process, in the order they are run."""
+
+    frameworks = None
+
+    @classmethod
+    def discover(cls):
+        """Get the registered frameworks, as an ordered list of pairs."""
+        if cls.frameworks is None:
+            cls.frameworks = list(BUILTIN_FRAMEWORKS)
+            known = set(name for name, _ in cls.frameworks)
+            for name, module_name in iter_entry_points(ENTRY_POINT_GROUP):
+                if name not in known:
+                    cls.frameworks.append((name, module_name))
+                    known.add(name)
+        return cls.frameworks
+
+    @classmethod
+    def names(cls):
+        """Get the names of the frameworks that run by default."""
+        return [name for name, _ in cls.discover()
+                if name not in BATCHED_VARIANTS
+                and name not in CACHED_VARIANTS]
+
+    @classmethod
+    def select(cls, names=None, batched_variants=False,
+               cached_variants=False):
+        """Get the names of the selected frameworks, in the order they run.
+
+        Args:
+            names               frameworks to run (default: all of them).
+            batched_variants    also run the batched variants of the
+                                selected frameworks.
+            cached_variants     also run the variants of the selected
+                                frameworks that reuse view dumps.
+        """
+        variants = {}
+        if batched_variants:
+            variants.update(BATCHED_VARIANTS)
+        if cached_variants:
+            variants.update(CACHED_VARIANTS)
+        selected = []
+        for name in cls.names():
+            if names and name not in names:
+                continue
+            selected.append(name)
+            selected.extend(variant for variant, _ in cls.discover()
+                            if variants.get(variant) == name)
+        return selected
+
+    @classmethod
+    def load(cls, name):
+        """Import the module of a framework."""
+        return importlib.import_module(dict(cls.discover())[name])
+
+    @classmethod
+    def name_of(cls, framework):
+        """Get the name under which a framework module is registered."""
+        for name, module_name in cls.discover():
+            if module_name == framework.__name__:
+                return name
+        return framework.__name__
+
+    @staticmethod
+    def select_use_cases(framework, interactions=None):
+        """Get the use cases of a framework for the given interactions."""
+        return dict(
+            (key, use_case) for key, use_case in framework.use_cases.items()
+            if not interactions or key in interactions
+        )
+
+
+names = FrameworkRegistry.names
+select = FrameworkRegistry.select
+load = FrameworkRegistry.load
+name_of = FrameworkRegistry.name_of
+select_use_cases = FrameworkRegistry.select_use_cases
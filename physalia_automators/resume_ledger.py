@@ -0,0 +1,123 @@
+"""Progress index to resume experiments without rescanning results.
+
+The index is stored next to the results CSV file (``<output>.index``). It
+keeps the number of rows of each use case and the byte offset of the last
+complete row, so that only rows appended since the last sync are parsed.
+"""
+
+import csv
+import json
+import os
+
+COLUMN_USE_CASE = 1
+INDEX_SUFFIX = ".index"
+
+
+class ResumeLedger(object):
+    """Sidecar index with the number of measurements per use case.
+
+    Args:
+        filename        results CSV file.
+
+    Use `ResumeLedger.for_file` to share the same ledger within a process.
+    """
+
+    _ledgers = {}
+
+    def __init__(self, filename):  # noqa: D107
+        self.filename = filename
+        self.index_filename = filename + INDEX_SUFFIX
+        self.offset = 0
+        self.last_row = ""
+        self.counts = {}
+        self._load()
+
+    @classmethod
+    def for_file(cls, filename):
+        """Get the ledger of a results file."""
+        key = os.path.abspath(filename)
+        if key not in cls._ledgers:
+            cls._ledgers[key] = cls(filename)
+        return cls._ledgers[key]
+
+    def _load(self):
+        try:
+            with open(self.index_filename, 'r') as index_file:
+                data = json.load(index_file)
+        except (IOError, OSError, ValueError):
+            return
+        self.offset = data.get('offset', 0)
+        self.last_row = data.get('last_row', "")
+        self.counts = data.get('counts', {})
+
+    def _save(self):
+        temp_filename = self.index_filename + ".tmp"
+        with open(temp_filename, 'w') as index_file:
+            json.dump(
+                {
+                    'offset': self.offset,
+                    'last_row': self.last_row,
+                    'counts': self.counts,
+                },
+                index_file
+            )
+        os.rename(temp_filename, self.index_filename)
+
+    def _reset(self):
+        self.offset = 0
+        self.last_row = ""
+        self.counts = {}
+
+    def _is_consistent(self, csv_file):
+        """Check that the last indexed row is still where we left it."""
+        if not self.offset:
+            return True
+        last_row = self.last_row.encode('utf-8')
+        if len(last_row) > self.offset:
+            return False
+        csv_file.seek(self.offset - len(last_row))
+        return csv_file.read(len(last_row)) == last_row
+
+    def sync(self):
+        """Index the rows appended to the results file since the last sync.
+
+        The index is rebuilt from scratch when the results file was
+        truncated or rewritten.
+        """
+        try:
+            size = os.path.getsize(self.filename)
+        except OSError:
+            if self.offset:
+                self._reset()
+                self._save()
+            return
+        if size == self.offset and self.offset == 0:
+            return
+        with open(self.filename, 'rb') as csv_file:
+            if size < self.offset or not self._is_consistent(csv_file):
+                self._reset()
+            elif size == self.offset:
+                return
+            csv_file.seek(self.offset)
+            for line in csv_file:
+                if not line.endswith(b'\n'):
+                    # row is still being written
+                    break
+                self.offset += len(line)
+                row = line.decode('utf-8')
+                self.last_row = row
+                for fields in csv.reader([row]):
+                    if len(fields) > COLUMN_USE_CASE:
+                        key = fields[COLUMN_USE_CASE]
+                        self.counts[key] = self.counts.get(key, 0) + 1
+        self._save()
+
+    def count(self, key):
+        """Get the number of measurements stored for a use case."""
+        self.sync()
+        return self.counts.get(key, 0)
+
+    def record(self, measurement):
+        """Append a measurement to the results file and index it."""
+        measurement.save_to_csv(self.filename)
+        self.sync()
@@ -1,71 +1,32 @@
 """Interaction using Espresso"""
 
-from physalia.energy_profiler import AndroidUseCase
-from physalia.exceptions import PhysaliaExecutionFailed
+from .instrumentation import InstrumentationUseCase
 from .utils import minimum_execution_time, get_path
 from . import time_boundaries
-import subprocess
+from . import app_state
 import click
 
-class RobotiumUseCase(AndroidUseCase):
+class RobotiumUseCase(InstrumentationUseCase):
     """`AndroidUseCase` to use with `UiAutomator`."""
 
-    # pylint: disable=too-many-arguments
-    # Eight is reasonable in this case.
-
-    def __init__(self, name, app_apk, app_pkg, app_version,
-                 test_class, test_method,
-                 test_apk, test_pkg, minimum_execution_time):  # noqa: D102
-        super(RobotiumUseCase, self).__init__(
-            name, app_apk, app_pkg, app_version,
-        )
-        self.test_class = test_class
-        self.test_method = test_method
-        self.test_pkg = test_pkg
-        self.test_apk = test_apk
-        self.minimum_execution_time = minimum_execution_time
-
-    def install_test(self):
-        click.secho("Installing {}".format(self.test_apk), fg='blue')
-        subprocess.check_output(["adb", "install", self.test_apk])
-
-    def uninstall_test(self):
-        """Uninstall test app of the Android device."""
-        click.secho("Uninstalling {}".format(self.test_pkg), fg='blue')
-        subprocess.check_output(["adb", "uninstall", self.test_pkg])
+    runner = "android.test.InstrumentationTestRunner"
 
     def prepare(self):
         """Prepare environment for running."""
-        self.uninstall_app()
-        self.uninstall_test()
-        self.install_app()
-        self.install_test()
-        # self.open_app()
+        app_state.prepare_app(self, launch=False)
+        app_state.prepare_test_app(self)
         self._prepare()
         click.secho("Starting use case {}.".format(self.name), fg='green')
 
     def cleanup(self):
         """Clean environment after running."""
         self._cleanup()
-        self.uninstall_app()
-        self.uninstall_test()
+        app_state.release_app(self)
     
     def _run(self):
         @minimum_execution_time(seconds=self.minimum_execution_time)
         def launch_instrumentation():
-            output = subprocess.check_output(
-                "adb shell am instrument -w -r -e debug false "
-                "-e class {test_class}#{test_method} {test_pkg}/"
-                "android.test.InstrumentationTestRunner".format(
-                    test_class=self.test_class,
-                    test_method=self.test_method,
-                    test_pkg=self.test_pkg
-                ),
-                shell=True
-            ).decode()
-            print(output)
-            if "INSTRUMENTATION_FAILED" in output:
-                raise PhysaliaExecutionFailed
+            self.run_instrumentation()
         launch_instrumentation()
 
 APK = get_path("../apks/RobotiumTest.apk")
@@ -0,0 +1,69 @@
+"""Note how the runs of the use cases were done.
+
+Some facts about a run do not fit in a measurement but are needed to
+interpret it, e.g. whether Appium gestures were sent as W3C Actions or
+replayed one by one. Use cases note them while they run, and the notes
+are saved next to the results, in ``<output>.notes.csv``, with a row per
+note of each run: timestamp, use case, repetitions, key, value.
+Batched runs save their notes once per block of repetitions.
+"""
+
+import csv
+import time
+from collections import OrderedDict
+
+NOTES_SUFFIX = ".notes.csv"
+
+
+class RunNotes(object):
+    """Notes of the run in progress in the current process."""
+
+    notes = None
+
+    @classmethod
+    def start_run(cls):
+        """Start taking notes for a run."""
+        cls.notes = OrderedDict()
+
+    @classmethod
+    def note(cls, key, value):
+        """Note a fact about the run in progress, if any."""
+        if cls.notes is not None:
+            cls.notes[key] = value
+
+    @classmethod
+    def finish_run(cls):
+        """Stop taking notes.
+
+        Returns:
+            OrderedDict: notes of the run, by key.
+
+        """
+        notes, cls.notes = cls.notes or OrderedDict(), None
+        return notes
+
+    @staticmethod
+    def save(output, use_case_name, measurements, notes):
+        """Save the notes of a run next to its measurements.
+
+        Args:
+            output          results file of the measurements.
+            use_case_name   name of the use case.
+            measurements    measurements of the run (several if batched).
+            notes           notes returned by `finish_run`.
+        """
+        if not notes:
+            return
+        timestamp = measurements[0].timestamp if measurements else time.time()
+        with open(output + NOTES_SUFFIX, 'a') as notes_file:
+            csv_writer = csv.writer(notes_file)
+            for key, value in notes.items():
+                csv_writer.writerow([
+                    timestamp, use_case_name, len(measurements), key, value
+                ])
+
+
+start_run = RunNotes.start_run
+note = RunNotes.note
+finish_run = RunNotes.finish_run
+save = RunNotes.save
@@ -0,0 +1,169 @@
+"""Run an experiment campaign in parallel across several devices.
+
+Each device is wired to its own power meter. Use cases from all framework
+modules are sharded across worker processes, one per device, and each
+worker stores its measurements in its own partition of the output file.
+
+Devices are bound through the ``ANDROID_SERIAL`` environment variable,
+which is honoured by ``adb`` and by the frameworks under study. To try the
+scheduler without hardware, use ``emulated`` as the power meter serial and
+run a `fake_adb_server` with the serials of the fake devices.
+"""
+
+import importlib
+import multiprocessing
+import os
+import re
+import click
+from physalia.power_meters import MonsoonPowerMeter, EmulatedPowerMeter
+from physalia_automators import adb
+
+EMULATED_POWER_METER = "emulated"
+MONSOON_VOLTAGE = 3.8
+
+
+class DeviceBinding(object):
+    """Pair of an adb device and the power meter it is connected to.
+
+    Args:
+        serial              adb serial number of the device.
+        power_meter_serial  serial number of the Monsoon power meter, or
+                            ``emulated`` to use an `EmulatedPowerMeter`.
+    """
+
+    def __init__(self, serial, power_meter_serial):  # noqa: D107
+        self.serial = serial
+        self.power_meter_serial = power_meter_serial
+
+    @classmethod
+    def parse(cls, value):
+        """Create a binding from a ``SERIAL=POWER_METER_SERIAL`` string.
+
+        The power meter must always be given, so that an emulated power
+        meter is never used by accident: ``SERIAL=emulated``.
+        """
+        serial, _, power_meter_serial = value.partition("=")
+        if not serial or not power_meter_serial:
+            raise click.BadParameter(
+                "Expected SERIAL=POWER_METER_SERIAL, got '{}'.".format(value)
+            )
+        if power_meter_serial != EMULATED_POWER_METER \
+                and not power_meter_serial.isdigit():
+            raise click.BadParameter(
+                "Power meter serial must be a number or '{}', got '{}'.".format(
+                    EMULATED_POWER_METER, power_meter_serial)
+            )
+        return cls(serial, power_meter_serial)
+
+    def bind(self):
+        """Make this device the target of every adb call of the process."""
+        os.environ['ANDROID_SERIAL'] = self.serial
+
+    def create_power_meter(self):
+        """Instantiate the power meter of this binding."""
+        if self.power_meter_serial == EMULATED_POWER_METER:
+            return EmulatedPowerMeter()
+        return MonsoonPowerMeter(
+            voltage=MONSOON_VOLTAGE,
+            serial=int(self.power_meter_serial)
+        )
+
+    def partition(self, output):
+        """Get the output file where this device stores its results."""
+        root, ext = os.path.splitext(output)
+        return "{}-{}{}".format(root, re.sub(r'[^\w.-]', '_', self.serial), ext)
+
+    def __str__(self):
+        """Describe the binding."""
+        return "{} ({})".format(self.serial, self.power_meter_serial)
+
+
+def shard(jobs, number_of_shards):
+    """Split jobs in round-robin fashion, preserving their order."""
+    return [jobs[index::number_of_shards] for index in range(number_of_shards)]
+
+
+def group_by_framework(jobs):
+    """Group ``(module_name, use_case_key)`` jobs by framework module."""
+    groups = []
+    for module_name, key in jobs:
+        if groups and groups[-1][0] == module_name:
+            groups[-1][1].append(key)
+        else:
+            groups.append((module_name, [key]))
+    return groups
+
+
+def run_worker(binding, jobs, runner, count, output):
+    """Evaluate a shard of use cases on the device of the given binding."""
+    binding.bind()
+    # workers may be spawned instead of forked from the cli
+    adb.install_physalia_hooks()
+    power_meter = binding.create_power_meter()
+    output = binding.partition(output)
+    for module_name, keys in group_by_framework(jobs):
+        framework = importlib.import_module(module_name)
+        use_cases = dict(
+            (key, use_case) for key, use_case in framework.use_cases.items()
+            if key in keys
+        )
+        runner(framework, use_cases, power_meter, count, output)
+
+
+class CampaignScheduler(object):
+    """Shard a campaign across worker processes, one per device.
+
+    Args:
+        bindings        list of `DeviceBinding`.
+        count           number of measurements per use case.
+        output          results file; each device writes to a partition.
+    """
+
+    def __init__(self, bindings, count, output):  # noqa: D107
+        self.bindings = bindings
+        self.count = count
+        self.output = output
+
+    @staticmethod
+    def collect_jobs(frameworks, interactions=None):
+        """List every defined use case of the given framework modules."""
+        return [
+            (framework.__name__, key)
+            for framework in frameworks
+            for key, use_case in sorted(framework.use_cases.items())
+            if use_case and (not interactions or key in interactions)
+        ]
+
+    def run(self, frameworks, runner, interactions=None):
+        """Run the campaign.
+
+        Args:
+            frameworks      framework modules with a `use_cases` dict.
+            runner          function that evaluates the use cases of a
+                            framework: ``runner(framework, use_cases,
+                            power_meter, count, output)``.
+            interactions    interactions to run (default: all of them).
+        """
+        shards = shard(self.collect_jobs(frameworks, interactions),
+                       len(self.bindings))
+        workers = []
+        for binding, jobs in zip(self.bindings, shards):
+            click.secho(
+                "Scheduling {} use cases on {}.".format(len(jobs), binding),
+                fg='blue'
+            )
+            worker = multiprocessing.Process(
+                target=run_worker,
+                args=(binding, jobs, runner, self.count, self.output),
+                name="physalia-{}".format(binding.serial)
+            )
+            worker.start()
+            workers.append((binding, worker))
+        failed = []
+        for binding, worker in workers:
+            worker.join()
+            if worker.exitcode != 0:
+                failed.append(binding)
+        for binding in failed:
+            click.secho("Worker for {} has failed.".format(binding), fg='red')
+        return not failed
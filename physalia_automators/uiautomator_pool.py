@@ -0,0 +1,237 @@
+"""Lazy `uiautomator` device with keep-alive JSON-RPC connections.
+
+Importing `uiautomator` talks to adb, and its device starts the RPC server
+in the device on first use. `device` defers both until it is first used,
+and `LazyDevice.warm_up` starts the server ahead of the measurements.
+
+By default, every JSON-RPC call opens a new HTTP connection to the port
+forwarded to the RPC server. Calls made through `device` reuse a
+persistent connection per server instead. `LazyDevice.query` also sends
+several selector queries as a single JSON-RPC batch request.
+"""
+
+import itertools
+import json
+import os
+import select
+import socket
+
+try:
+    import httplib
+    from urlparse import urlparse
+except ImportError:
+    import http.client as httplib
+    from urllib.parse import urlparse
+
+
+class RPCConnection(httplib.HTTPConnection):
+    """HTTP connection that sends small requests without delay."""
+
+    def connect(self):
+        """Open the socket with Nagle's algorithm disabled."""
+        httplib.HTTPConnection.connect(self)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+class RequestNotSent(socket.error):
+    """The request failed before it was sent, so it is safe to send again."""
+
+
+def is_dropped(connection):
+    """Check whether the server has closed an idle connection."""
+    if connection.sock is None:
+        return False
+    readable, _, _ = select.select([connection.sock], [], [], 0)
+    # an idle connection is only readable when the server has closed it
+    return bool(readable)
+
+
+class RPCConnectionPool(object):
+    """Persistent HTTP connections of the process, keyed by host and port."""
+
+    connections = {}
+
+    @classmethod
+    def get(cls, host, port, timeout):
+        """Get the connection to a server, opening it if needed."""
+        connection = cls.connections.get((host, port))
+        if connection is not None and is_dropped(connection):
+            cls.discard(host, port)
+            connection = None
+        if connection is None:
+            connection = RPCConnection(host, port, timeout=timeout)
+            cls.connections[(host, port)] = connection
+        connection.timeout = timeout
+        return connection
+
+    @classmethod
+    def discard(cls, host, port):
+        """Close and forget the connection to a server."""
+        connection = cls.connections.pop((host, port), None)
+        if connection is not None:
+            connection.close()
+
+    @classmethod
+    def close_all(cls):
+        """Close every connection of the pool."""
+        for host, port in list(cls.connections):
+            cls.discard(host, port)
+
+
+class KeepAliveJsonRPCMethod(object):
+    """Drop-in replacement of `uiautomator.JsonRPCMethod`.
+
+    Requests go through `RPCConnectionPool`, which replaces connections
+    that the server closed while they were idle. A request that fails
+    before it was sent is sent once more on a new connection. Once sent,
+    it is never sent again: the server may have run it already.
+    """
+
+    ids = itertools.count()
+
+    def __init__(self, url, method, timeout=30):  # noqa: D107
+        self.url, self.method, self.timeout = url, method, timeout
+        parsed_url = urlparse(url)
+        self.host = parsed_url.hostname
+        self.port = parsed_url.port
+        self.path = parsed_url.path or "/"
+
+    def __call__(self, *args, **kwargs):
+        """Call the method in the RPC server."""
+        from uiautomator import JsonRPCError
+        if args and kwargs:
+            raise SyntaxError("Could not accept both *args and **kwargs "
+                              "as JSONRPC parameters.")
+        data = {"jsonrpc": "2.0", "method": self.method,
+                "id": next(self.ids)}
+        if args:
+            data["params"] = args
+        elif kwargs:
+            data["params"] = kwargs
+        body = json.dumps(data).encode("utf-8")
+        try:
+            response = self.post(body)
+        except RequestNotSent:
+            response = self.post(body)
+        result = json.loads(response.decode("utf-8"))
+        if result.get("error"):
+            raise JsonRPCError(
+                result["error"]["code"],
+                "%s: %s" % (result["error"]["data"]["exceptionTypeName"],
+                            result["error"]["message"])
+            )
+        return result["result"]
+
+    def post(self, body):
+        """Send a request through the pooled connection and read the reply."""
+        connection = RPCConnectionPool.get(self.host, self.port, self.timeout)
+        try:
+            connection.request("POST", self.path, body,
+                               {"Content-Type": "application/json"})
+        except (socket.error, httplib.HTTPException) as error:
+            RPCConnectionPool.discard(self.host, self.port)
+            raise RequestNotSent(str(error))
+        try:
+            return connection.getresponse().read()
+        except (socket.error, httplib.HTTPException):
+            RPCConnectionPool.discard(self.host, self.port)
+            raise
+
+    @classmethod
+    def batch(cls, url, calls, timeout=30):
+        """Send several calls in a single JSON-RPC batch request.
+
+        Args:
+            url         url of the RPC server.
+            calls       list of ``(method, params)`` tuples.
+            timeout     timeout of the request in seconds.
+
+        Returns:
+            list: result of each call, in order, or None for the calls
+            that failed.
+
+        """
+        if not calls:
+            return []
+        post = cls(url, None, timeout).post
+        requests = []
+        for method, params in calls:
+            requests.append({"jsonrpc": "2.0", "method": method,
+                             "params": params, "id": next(cls.ids)})
+        body = json.dumps(requests).encode("utf-8")
+        try:
+            response = post(body)
+        except RequestNotSent:
+            response = post(body)
+        results = dict(
+            (result.get("id"), result)
+            for result in json.loads(response.decode("utf-8"))
+        )
+        return [
+            results.get(request["id"], {}).get("result")
+            for request in requests
+        ]
+
+
+class LazyDevice(object):
+    """`uiautomator.Device` that is only created when it is first used."""
+
+    def __init__(self, serial=None):  # noqa: D107
+        self.serial = serial
+        self._device = None
+
+    def connect(self):
+        """Create the device, bound to ``ANDROID_SERIAL`` by default."""
+        if self._device is None:
+            import uiautomator
+            uiautomator.JsonRPCMethod = KeepAliveJsonRPCMethod
+            self._device = uiautomator.Device(
+                serial=self.serial or os.environ.get('ANDROID_SERIAL')
+            )
+        return self._device
+
+    def warm_up(self):
+        """Start the RPC server in the device unless it answers already.
+
+        Call it when preparing a run, so that the first call of the
+        measured window does not start the server.
+        """
+        server = self.connect().server
+        if not server.alive:
+            server.start(timeout=30)
+
+    def query(self, selectors, method="exist"):
+        """Query several UI objects with a single JSON-RPC batch request.
+
+        Args:
+            selectors   list of dicts with the keyword arguments of a
+                        selector, e.g. ``{"description": "Paint"}``.
+            method      RPC method to call for each selector: ``exist``
+                        or ``objInfo`` (which includes the bounds).
+
+        Returns:
+            list: result of each query, or None if it failed.
+
+        """
+        from uiautomator import Selector
+        server = self.connect().server
+        calls = [(method, [Selector(**selector)]) for selector in selectors]
+        try:
+            return KeepAliveJsonRPCMethod.batch(server.rpc_uri, calls)
+        except (socket.error, httplib.HTTPException):
+            # same recovery as uiautomator: restart the RPC server
+            server.stop()
+            server.start(timeout=30)
+            return KeepAliveJsonRPCMethod.batch(server.rpc_uri, calls)
+
+    def __call__(self, **kwargs):
+        """Select UI objects, as in `uiautomator.Device`."""
+        return self.connect()(**kwargs)
+
+    def __getattr__(self, name):
+        """Delegate to the `uiautomator.Device`."""
+        return getattr(self.connect(), name)
+
+
+device = LazyDevice()
+close_all = RPCConnectionPool.close_all
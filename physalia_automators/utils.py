@@ -3,7 +3,9 @@
 from functools import partial
 import time
 import os
+import socket
 import click
+from physalia_automators import phases
 
 def minimum_execution_time(seconds, warning=True):
     def ret_fun(fun):
@@ -12,7 +14,8 @@ def minimum_execution_time(seconds, warning=True):
             finish = start + seconds
             return_value = fun(*args, **kwargs)
             if time.time() < finish:
-                time.sleep(finish-time.time())
+                with phases.phase("padding"):
+                    time.sleep(max(0, finish-time.time()))
             else:
                 if warning and seconds != -1:
                     click.secho(
@@ -29,4 +32,13 @@ def get_path(relative_path):
     """Get path relative to the source file."""
     return os.path.abspath(
         os.path.join(os.path.dirname(__file__), relative_path)
-    )
\ No newline at end of file
+    )
+
+def get_free_port():
+    """Get a TCP port that is free in the local host."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+    finally:
+        sock.close()
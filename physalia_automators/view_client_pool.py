@@ -0,0 +1,150 @@
+"""Share `AndroidViewClient` connections across use cases.
+
+Connecting to the device and starting the view server takes seconds. The
+pool keeps one connection per device serial for the whole process and
+hands it out to every AndroidViewClient use case, reconnecting only when
+the connection no longer answers.
+
+Each connection also keeps the last dump of the window hierarchy, which
+use cases may reuse while the focused window of the device stays the same.
+The fingerprint includes the activity record, so relaunching the app after
+a reset also counts as a change. It does not see changes in the content of
+the window, and taking it costs a ``dumpsys window`` in the device, so
+reusing dumps is opt-in: a forced dump skips the fingerprint.
+"""
+
+import os
+import socket
+import click
+from retrying import retry
+from com.dtmilano.android.viewclient import ViewClient
+from physalia_automators.view_index import ViewIndex
+from physalia_automators import dump_backend
+
+ANY_DEVICE = ".*"
+FINGERPRINT_COMMAND = "dumpsys window | grep -E 'mCurrentFocus|mFocusedApp'"
+DUMP_ATTEMPTS = 6
+
+
+class ViewClientConnection(object):
+    """Live connection to a device through `AndroidViewClient`.
+
+    Attributes:
+        device          `AdbClient` connected to the device.
+        serialno        serial number of the connected device.
+        view_client     `ViewClient` bound to the device.
+        fingerprint     focused window when the last dump was taken, or
+                        None if there is no valid dump.
+        index           `ViewIndex` of the last dump.
+    """
+
+    def __init__(self, device, serialno, view_client):  # noqa: D107
+        self.device = device
+        self.serialno = serialno
+        self.view_client = view_client
+        self.fingerprint = None
+        self.index = ViewIndex()
+
+    def window_fingerprint(self):
+        """Identify the window and activity that currently have focus."""
+        return self.device.shell(FINGERPRINT_COMMAND).strip()
+
+    def dump(self, force=False):
+        """Dump the window hierarchy unless the last dump is still valid.
+
+        Args:
+            force   dump even if the focused window did not change.
+
+        Returns:
+            bool: whether a new dump was taken.
+
+        """
+        fingerprint = None
+        if not force:
+            fingerprint = self.window_fingerprint()
+            if fingerprint and fingerprint == self.fingerprint:
+                return False
+        self.fingerprint = None
+        self._dump()
+        self.index = ViewIndex(self.view_client.views)
+        self.fingerprint = fingerprint
+        return True
+
+    @retry(retry_on_exception=lambda error: isinstance(error, RuntimeError),
+           wait_exponential_multiplier=100, wait_exponential_max=2000,
+           wait_jitter_max=100, stop_max_attempt_number=DUMP_ATTEMPTS)
+    def _dump(self):
+        self.view_client.dump(window='-1')
+
+    def is_alive(self):
+        """Check whether the device still answers through the connection."""
+        try:
+            return self.device.shell("echo alive").strip() == "alive"
+        except (RuntimeError, socket.error):
+            return False
+
+    def close(self):
+        """Close the connection, ignoring whether it was already broken."""
+        try:
+            self.device.close()
+        except (RuntimeError, socket.error):
+            pass
+
+
+class ViewClientPool(object):
+    """Connections of the current process, keyed by device serial."""
+
+    connections = {}
+
+    @classmethod
+    def get(cls, serialno=None, force=False):
+        """Get a live connection to a device.
+
+        Args:
+            serialno    serial of the device (default: ``ANDROID_SERIAL``,
+                        or any connected device if it is not set).
+            force       drop the pooled connection and connect again.
+        """
+        if serialno is None:
+            serialno = os.environ.get('ANDROID_SERIAL', ANY_DEVICE)
+        connection = cls.connections.get(serialno)
+        if connection is not None and (force or not connection.is_alive()):
+            if not force:
+                click.secho("Lost connection to {}. Reconnecting...".format(
+                    connection.serialno), fg='yellow')
+            cls.discard(serialno)
+            connection = None
+        if connection is None:
+            connection = cls.connect(serialno)
+            cls.connections[serialno] = connection
+        return connection
+
+    @staticmethod
+    def connect(serialno):
+        """Connect to the device with the dump backend selected for it."""
+        device, serialno = ViewClient.connectToDeviceOrExit(
+            ignoreversioncheck=False,
+            verbose=False,
+            ignoresecuredevice=False,
+            serialno=serialno
+        )
+        backend = dump_backend.select_backend(device, serialno)
+        view_client = backend.create_view_client(device, serialno)
+        return ViewClientConnection(device, serialno, view_client)
+
+    @classmethod
+    def discard(cls, serialno):
+        """Close and forget the connection to a device."""
+        connection = cls.connections.pop(serialno, None)
+        if connection is not None:
+            connection.close()
+
+    @classmethod
+    def close_all(cls):
+        """Close every connection of the pool."""
+        for serialno in list(cls.connections):
+            cls.discard(serialno)
+
+
+get = ViewClientPool.get
+close_all = ViewClientPool.close_all
@@ -0,0 +1,37 @@
+"""Hash indexes over the views of an `AndroidViewClient` dump.
+
+`ViewClient` finds views by walking the whole tree on every lookup. The
+index is built in a single pass after each dump and answers lookups by
+resource id, content description and text in constant time. As in the
+tree walk, the first view in document order wins.
+"""
+
+
+class ViewIndex(object):
+    """Views of a dump indexed by id, content description and text."""
+
+    def __init__(self, views=()):  # noqa: D107
+        self.by_id = {}
+        self.by_description = {}
+        self.by_text = {}
+        for view in views:
+            self._add(self.by_id, view.getId(), view)
+            self._add(self.by_description, view.getContentDescription(), view)
+            self._add(self.by_text, view.getText(), view)
+
+    @staticmethod
+    def _add(index, key, view):
+        if key and key not in index:
+            index[key] = view
+
+    def find_by_id(self, view_id):
+        """Get the view with the given resource id, or None."""
+        return self.by_id.get(view_id)
+
+    def find_by_description(self, content_description):
+        """Get the view with the given content description, or None."""
+        return self.by_description.get(content_description)
+
+    def find_by_text(self, text):
+        """Get the view with the given text, or None."""
+        return self.by_text.get(text)
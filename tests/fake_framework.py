@@ -0,0 +1,9 @@
+"""Framework module with placeholder use cases, to test the scheduler."""
+
+use_cases = {
+    'tap': "tap",
+    'long_tap': "long_tap",
+    'swipe': "swipe",
+    'drag_and_drop': "drag_and_drop",
+    'back_button': None,
+}
@@ -0,0 +1,115 @@
+"""Tests for the adb client, against a fake adb server."""
+
+import os
+import shutil
+import stat
+import subprocess
+import tempfile
+import unittest
+import physalia.utils.android as android_utils
+from physalia_automators import adb
+from physalia_automators.fake_adb_server import FakeAdbServer
+
+
+class TestAdbClient(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.bin_dir = os.path.join(self.directory, "bin")
+        os.mkdir(self.bin_dir)
+        self.server = FakeAdbServer(serials=["dev1"], bin_dir=self.bin_dir,
+                                    root=self.directory)
+        self.server.start()
+        self.client = adb.AdbClient("dev1", port=self.server.port)
+        self.device_models = dict(adb.AdbClient.device_models)
+        adb.AdbClient.device_models.clear()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        adb.AdbClient.device_models.clear()
+        adb.AdbClient.device_models.update(self.device_models)
+        shutil.rmtree(self.directory)
+
+    def add_command(self, name, script):
+        """Add a fake device command."""
+        path = os.path.join(self.bin_dir, name)
+        with open(path, 'w') as command_file:
+            command_file.write("#!/bin/sh\n" + script)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+        return path
+
+    def test_shell_output(self):
+        self.assertEqual(self.client.shell("echo hello"), "hello\n")
+
+    def test_shell_exit_status(self):
+        with self.assertRaises(subprocess.CalledProcessError) as context:
+            self.client.shell("echo failed; exit 3")
+        self.assertEqual(context.exception.returncode, 3)
+        self.assertEqual(context.exception.output, "failed\n")
+
+    def test_shell_unchecked_exit_status(self):
+        self.assertEqual(
+            self.client.shell("echo failed; exit 3", check=False),
+            "failed\n"
+        )
+
+    def test_bad_serial(self):
+        client = adb.AdbClient("unknown", port=self.server.port)
+        with self.assertRaises(adb.AdbError):
+            client.shell("echo hello")
+        with self.assertRaises(adb.AdbError):
+            client.shell("echo hello", check=False)
+
+    def test_concurrent_channels(self):
+        fifo = os.path.join(self.directory, "fifo")
+        os.mkfifo(fifo)
+        with self.client.open_shell("cat {}".format(fifo)) as reader:
+            # cat waits for the second channel to open the fifo
+            with self.client.open_shell(
+                    "{{ echo first; echo second; }} > {}".format(fifo)):
+                self.assertEqual(list(reader), ["first\n", "second\n"])
+
+    def test_push(self):
+        local = os.path.join(self.directory, "local.apk")
+        with open(local, 'wb') as local_file:
+            local_file.write(os.urandom(3 * adb.SYNC_DATA_MAX + 1))
+        self.client.push(local, "/data/local/tmp/remote.apk")
+        with open(local, 'rb') as local_file:
+            with open(os.path.join(self.directory,
+                                   "data/local/tmp/remote.apk"),
+                      'rb') as remote_file:
+                self.assertEqual(remote_file.read(), local_file.read())
+
+    def test_device_model_is_cached(self):
+        calls = os.path.join(self.directory, "calls")
+        self.add_command("getprop",
+                         "echo $@ >> {}\necho Nexus 5X\n".format(calls))
+        self.assertEqual(self.client.get_device_model(), "Nexus 5X")
+        self.assertEqual(self.client.get_device_model(), "Nexus 5X")
+        with open(calls) as calls_file:
+            self.assertEqual(calls_file.read(), "ro.product.model\n")
+
+    def test_import_has_no_side_effects(self):
+        self.assertIsNot(android_utils.get_device_model,
+                         adb.get_device_model)
+        self.assertIsNot(android_utils.set_charging_enabled,
+                         adb.set_charging_enabled)
+
+    def test_physalia_hooks(self):
+        self.add_command("getprop", "echo Nexus 5X\n")
+        port = os.environ.get('ANDROID_ADB_SERVER_PORT')
+        os.environ['ANDROID_ADB_SERVER_PORT'] = str(self.server.port)
+        helpers = (android_utils.get_device_model,
+                   android_utils.set_charging_enabled)
+        try:
+            adb.install_physalia_hooks()
+            self.assertEqual(android_utils.get_device_model("dev1"),
+                             "Nexus 5X")
+        finally:
+            (android_utils.get_device_model,
+             android_utils.set_charging_enabled) = helpers
+            if port is None:
+                os.environ.pop('ANDROID_ADB_SERVER_PORT', None)
+            else:
+                os.environ['ANDROID_ADB_SERVER_PORT'] = port
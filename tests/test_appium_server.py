@@ -0,0 +1,137 @@
+"""Tests for the Appium server lifecycle, against a stub server."""
+
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+import unittest
+from physalia.exceptions import PhysaliaExecutionFailed
+from physalia_automators.appium_server import AppiumServer
+
+# stub of `appium`: answers /wd/hub/status with the given status once the
+# given delay is over; with "ignore-term" it does not exit on SIGTERM
+STUB_SERVER = """
+import json
+import signal
+import sys
+import time
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+delay, status, mode = float(sys.argv[1]), int(sys.argv[2]), sys.argv[3]
+port = int(sys.argv[sys.argv.index('--port') + 1])
+ready_at = time.time() + delay
+if mode == "ignore-term":
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path != "/wd/hub/status" or time.time() < ready_at:
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = json.dumps({"status": status, "value": {}}).encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+HTTPServer(('127.0.0.1', port), StatusHandler).serve_forever()
+"""
+
+
+class TestAppiumServer(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.stub = os.path.join(self.directory, "appium_stub.py")
+        with open(self.stub, 'w') as stub_file:
+            stub_file.write(STUB_SERVER)
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            if server.is_alive():
+                server.process.kill()
+                server.process.wait()
+        shutil.rmtree(self.directory)
+
+    def server(self, delay=0, status=0, mode="normal"):
+        """Get a server that runs the stub."""
+        server = AppiumServer(
+            [sys.executable, self.stub, str(delay), str(status), mode]
+        )
+        self.servers.append(server)
+        return server
+
+    def test_ready(self):
+        server = self.server()
+        server.start(timeout=10)
+        self.assertTrue(server.is_alive())
+        self.assertTrue(server.is_ready())
+        self.assertNotEqual(server.port, server.bootstrap_port)
+        self.assertEqual(server.url,
+                         "http://127.0.0.1:{}/wd/hub".format(server.port))
+
+    def test_slow_then_ready(self):
+        server = self.server(delay=1.5)
+        start = time.time()
+        server.start(timeout=10)
+        self.assertGreaterEqual(time.time() - start, 1.5)
+        self.assertTrue(server.is_ready())
+
+    def test_never_ready(self):
+        # answers, but with an error status
+        server = self.server(status=13)
+        start = time.time()
+        with self.assertRaises(PhysaliaExecutionFailed):
+            server.start(timeout=2)
+        self.assertLess(time.time() - start, 10)
+        self.assertFalse(server.is_alive())
+        self.assertIsNone(server.process)
+
+    def test_exits_while_starting(self):
+        server = AppiumServer([sys.executable, "-c", "pass"])
+        self.servers.append(server)
+        with self.assertRaises(PhysaliaExecutionFailed):
+            server.start(timeout=10)
+
+    def test_ensure_running(self):
+        server = self.server()
+        server.ensure_running()
+        self.assertIsNone(server.process)
+        server.start(timeout=10)
+        port = server.port
+        server.process.kill()
+        server.process.wait()
+        server.ensure_running()
+        self.assertTrue(server.is_ready())
+        self.assertEqual(server.port, port)
+
+    def test_stop(self):
+        server = self.server()
+        server.start(timeout=10)
+        process = server.process
+        server.stop()
+        self.assertEqual(process.poll(), -signal.SIGTERM)
+        self.assertIsNone(server.process)
+        self.assertFalse(server.is_ready())
+
+    def test_stop_kills_stuck_server(self):
+        server = self.server(mode="ignore-term")
+        server.start(timeout=10)
+        process = server.process
+        server.stop(timeout=0.5)
+        self.assertEqual(process.poll(), -signal.SIGKILL)
+        self.assertIsNone(server.process)
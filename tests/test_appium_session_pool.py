@@ -0,0 +1,80 @@
+"""Tests for the pool of Appium sessions."""
+
+import socket
+import unittest
+from appium import webdriver
+from selenium.common.exceptions import WebDriverException
+from physalia.exceptions import PhysaliaExecutionFailed
+from physalia_automators.appium_session_pool import AppiumSessionPool
+
+
+class FakeDriver(object):
+    """Driver with the interface of Appium-Python-Client 0.24."""
+
+    error = None
+
+    def __init__(self, server_url, desired_capabilities):
+        self.desired_capabilities = desired_capabilities
+        self.quits = 0
+        self.settings = None
+
+    @property
+    def current_activity(self):
+        if self.error is not None:
+            raise self.error
+        return ".MainActivity"
+
+    def update_settings(self, settings):
+        if "unsupported" in settings:
+            raise WebDriverException("unsupported setting")
+        self.settings = settings
+
+    def quit(self):
+        self.quits += 1
+
+
+class TestAppiumSessionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.remote = webdriver.Remote
+        webdriver.Remote = FakeDriver
+        AppiumSessionPool.sessions = {}
+        self.caps = {"platformName": "Android", "deviceName": "dev1"}
+
+    def tearDown(self):
+        webdriver.Remote = self.remote
+        AppiumSessionPool.sessions = {}
+
+    def test_session_is_reused(self):
+        driver = AppiumSessionPool.get(self.caps)
+        self.assertIs(AppiumSessionPool.get(self.caps), driver)
+        self.assertEqual(driver.quits, 0)
+
+    def test_dead_session_is_replaced(self):
+        for error in (WebDriverException("session is gone"),
+                      socket.error("connection refused")):
+            driver = AppiumSessionPool.get(self.caps)
+            driver.error = error
+            new_driver = AppiumSessionPool.get(self.caps)
+            self.assertIsNot(new_driver, driver)
+            self.assertEqual(driver.quits, 1)
+
+    def test_liveness_check_exists_in_client(self):
+        self.assertTrue(hasattr(self.remote, 'current_activity'))
+
+    def test_settings(self):
+        driver = AppiumSessionPool.get(self.caps, settings={"fast": True})
+        self.assertEqual(driver.settings, {"fast": True})
+        # sessions with other settings are kept apart
+        self.assertIsNot(AppiumSessionPool.get(self.caps), driver)
+
+    def test_rejected_settings(self):
+        with self.assertRaises(PhysaliaExecutionFailed):
+            AppiumSessionPool.get(self.caps, settings={"unsupported": True})
+        self.assertEqual(AppiumSessionPool.sessions, {})
+
+    def test_close_all(self):
+        driver = AppiumSessionPool.get(self.caps)
+        AppiumSessionPool.close_all()
+        self.assertEqual(driver.quits, 1)
+        self.assertEqual(AppiumSessionPool.sessions, {})
@@ -0,0 +1,102 @@
+"""Tests for batched Calabash use cases."""
+
+import os
+import unittest
+from physalia_automators import calabash_usecase
+from physalia_automators.calabash_usecase import CalabashUseCase, read_marker
+from physalia_automators.fake_adb_server import FakeAdbServer
+from physalia_automators.power_trace import REPETITION_START, REPETITION_END
+from tests.test_instrumentation import RecordingPowerMeter
+
+
+class ScriptedUseCase(CalabashUseCase):
+    """Use case whose cucumber prints the given output."""
+
+    def __init__(self, output):
+        super(ScriptedUseCase, self).__init__(
+            "Scripted", "app.apk", "com.app", "1.0",
+            "physalia_test_app.feature", "Find\\ By\\ Id", 0
+        )
+        self.output = output
+        self.cleanups = 0
+
+    def prepare(self):
+        pass
+
+    def cleanup(self):
+        self.cleanups += 1
+
+    def cucumber_command(self, feature, options=""):
+        if self.output is None:
+            raise OSError("cucumber not found")
+        return "printf '{}'".format(self.output)
+
+
+class TestReadMarker(unittest.TestCase):
+
+    def test_markers(self):
+        boundaries = {}
+        self.assertTrue(read_marker(
+            "{} 0 1.5\n".format(REPETITION_START), boundaries))
+        self.assertTrue(read_marker(
+            "{} 0 2.5 passed\n".format(REPETITION_END), boundaries))
+        self.assertFalse(read_marker("1 scenario (1 passed)\n", boundaries))
+        self.assertEqual(boundaries, {"0": [1.5, 2.5]})
+
+    def test_failed_repetition(self):
+        boundaries = {}
+        read_marker("{} 0 1.5\n".format(REPETITION_START), boundaries)
+        read_marker("{} 0 2.5 failed\n".format(REPETITION_END), boundaries)
+        self.assertEqual(boundaries, {"0": [1.5, None]})
+
+    def test_malformed_markers(self):
+        boundaries = {}
+        read_marker("{} 0 1.5\n".format(REPETITION_START), boundaries)
+        for line in ("{} 0\n".format(REPETITION_END),
+                     "{} 0 2.5\n".format(REPETITION_END),
+                     "{} 0 2.x passed\n".format(REPETITION_END),
+                     "{} 1\n".format(REPETITION_START),
+                     "{} 1 x\n".format(REPETITION_START)):
+            self.assertTrue(read_marker(line, boundaries))
+        self.assertEqual(boundaries, {"0": [1.5, None]})
+
+
+class TestRunBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeAdbServer()
+        self.server.start()
+        self.environ = dict(os.environ)
+        os.environ.pop('ANDROID_SERIAL', None)
+        os.environ['ANDROID_ADB_SERVER_PORT'] = str(self.server.port)
+        self.feature = calabash_usecase.feature_path(
+            calabash_usecase.BATCH_FEATURE.format(pid=os.getpid())
+        )
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        os.environ.clear()
+        os.environ.update(self.environ)
+
+    def test_truncated_marker(self):
+        use_case = ScriptedUseCase(
+            "{start} 0 1.0\\n{end} 0\\n"
+            "{start} 1 2.0\\n{end} 1 3.0 passed\\n".format(
+                start=REPETITION_START, end=REPETITION_END)
+        )
+        power_meter = RecordingPowerMeter()
+        measurements = use_case.run_batch(power_meter, 2)
+        self.assertEqual([measurement.duration
+                          for measurement in measurements], [1.0])
+        self.assertFalse(power_meter.measuring)
+        self.assertFalse(os.path.exists(self.feature))
+
+    def test_failed_cucumber_stops_the_power_meter(self):
+        use_case = ScriptedUseCase(None)
+        power_meter = RecordingPowerMeter()
+        with self.assertRaises(OSError):
+            use_case.run_batch(power_meter, 2)
+        self.assertFalse(power_meter.measuring)
+        self.assertEqual(use_case.cleanups, 1)
+        self.assertFalse(os.path.exists(self.feature))
@@ -0,0 +1,43 @@
+"""Tests for the command line interface."""
+
+import os
+import subprocess
+import sys
+import unittest
+import warnings
+from physalia_automators.cli import STARTUP_BUDGET
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TIME_IMPORT = (
+    "import sys, time\n"
+    "start = time.time()\n"
+    "import physalia_automators.cli\n"
+    "from physalia_automators import registry\n"
+    "print(time.time() - start)\n"
+    "print(sorted(module for _, module in registry.BUILTIN_FRAMEWORKS\n"
+    "             if module in sys.modules))\n"
+)
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_import_loads_no_framework(self):
+        # frameworks are loaded lazily, so importing the cli must not
+        # import them, nor need the Android SDK
+        env = dict(os.environ)
+        env.pop('ANDROID_HOME', None)
+        output = subprocess.check_output(
+            [sys.executable, "-c", TIME_IMPORT], cwd=ROOT, env=env,
+            universal_newlines=True
+        )
+        import_time, frameworks = output.strip().splitlines()[-2:]
+        self.assertEqual(frameworks, "[]")
+        # wall time depends on the load of the machine: only report it
+        if float(import_time) > STARTUP_BUDGET:
+            warnings.warn("Importing the cli took {:.2f}s, over the budget "
+                          "of {:.2f}s.".format(float(import_time),
+                                               STARTUP_BUDGET))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""Tests for the install cache, against a fake adb server."""
+
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+from physalia.exceptions import PhysaliaExecutionFailed
+from physalia_automators import install_cache
+from physalia_automators.fake_adb_server import FakeAdbServer
+
+# fake pm: nothing is installed, and `pm install` fails unless it prints
+# Success: $PM_INSTALL_OUTPUT, or $PM_RETRY_OUTPUT once uninstalled
+FAKE_PM = """#!/bin/sh
+echo "$@" >> {directory}/pm.log
+case "$1" in
+    path) exit 1 ;;
+    uninstall) touch {directory}/uninstalled; echo Success ;;
+    install)
+        if [ -f {directory}/uninstalled ]; then
+            output="$PM_RETRY_OUTPUT"
+        else
+            output="$PM_INSTALL_OUTPUT"
+        fi
+        echo "$output"
+        [ "$output" = Success ]
+        ;;
+esac
+"""
+
+
+class TestInstallApk(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        bin_dir = os.path.join(self.directory, "bin")
+        os.mkdir(bin_dir)
+        pm_path = os.path.join(bin_dir, "pm")
+        with open(pm_path, 'w') as pm_file:
+            pm_file.write(FAKE_PM.format(directory=self.directory))
+        os.chmod(pm_path, os.stat(pm_path).st_mode | stat.S_IEXEC)
+        self.apk = os.path.join(self.directory, "app.apk")
+        with open(self.apk, 'wb') as apk_file:
+            apk_file.write(b"apk")
+        self.server = FakeAdbServer(bin_dir=bin_dir, root=self.directory)
+        self.server.start()
+        self.environ = dict(os.environ)
+        os.environ.pop('ANDROID_SERIAL', None)
+        os.environ['ANDROID_ADB_SERVER_PORT'] = str(self.server.port)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        os.environ.clear()
+        os.environ.update(self.environ)
+        shutil.rmtree(self.directory)
+
+    def pm_calls(self):
+        with open(os.path.join(self.directory, "pm.log")) as log_file:
+            return [line.split()[0] for line in log_file]
+
+    def test_install(self):
+        os.environ['PM_INSTALL_OUTPUT'] = "Success"
+        self.assertTrue(install_cache.install_apk(self.apk, "com.app"))
+        self.assertEqual(self.pm_calls(), ["path", "install"])
+
+    def test_incompatible_install_is_retried(self):
+        os.environ['PM_INSTALL_OUTPUT'] = \
+            "Failure [INSTALL_FAILED_UPDATE_INCOMPATIBLE]"
+        os.environ['PM_RETRY_OUTPUT'] = "Success"
+        self.assertTrue(install_cache.install_apk(self.apk, "com.app"))
+        self.assertEqual(self.pm_calls(),
+                         ["path", "install", "uninstall", "install"])
+
+    def test_failed_retry(self):
+        os.environ['PM_INSTALL_OUTPUT'] = \
+            "Failure [INSTALL_FAILED_VERSION_DOWNGRADE]"
+        os.environ['PM_RETRY_OUTPUT'] = "Failure [INSTALL_FAILED_INVALID_APK]"
+        with self.assertRaises(PhysaliaExecutionFailed):
+            install_cache.install_apk(self.apk, "com.app")
+        self.assertEqual(self.pm_calls(),
+                         ["path", "install", "uninstall", "install"])
+
+    def test_failed_install(self):
+        os.environ['PM_INSTALL_OUTPUT'] = "Failure [INSTALL_FAILED_INVALID_APK]"
+        with self.assertRaises(PhysaliaExecutionFailed):
+            install_cache.install_apk(self.apk, "com.app")
+        self.assertEqual(self.pm_calls(), ["path", "install"])
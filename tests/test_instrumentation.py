@@ -0,0 +1,80 @@
+"""Tests for batched instrumentation use cases."""
+
+import os
+import socket
+import unittest
+from physalia_automators.fake_adb_server import FakeAdbServer
+from physalia_automators.instrumentation import InstrumentationUseCase
+
+
+class RecordingPowerMeter(object):
+    """Power meter that records whether it is measuring."""
+
+    def __init__(self):
+        self.measuring = False
+        self.starts = 0
+
+    def start(self):
+        self.measuring = True
+        self.starts += 1
+
+    def stop(self):
+        self.measuring = False
+        return 1.0, 1.0, False
+
+    def __str__(self):
+        return "Recording"
+
+
+class DroppedStreamUseCase(InstrumentationUseCase):
+    """Use case whose instrumentation output is lost."""
+
+    def __init__(self):
+        super(DroppedStreamUseCase, self).__init__(
+            "Dropped", "app.apk", "com.app", "1.0", "com.app.Test", "test",
+            "test.apk", "com.app.test", 0
+        )
+        self.cleanups = 0
+
+    def prepare(self):
+        pass
+
+    def cleanup(self):
+        self.cleanups += 1
+
+    def stream_repetition_loop(self, repetitions):
+        raise socket.error("connection reset")
+
+
+class TestRunBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeAdbServer()
+        self.server.start()
+        self.environ = dict(os.environ)
+        os.environ.pop('ANDROID_SERIAL', None)
+        os.environ['ANDROID_ADB_SERVER_PORT'] = str(self.server.port)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        os.environ.clear()
+        os.environ.update(self.environ)
+
+    def test_failed_stream_stops_the_power_meter(self):
+        use_case = DroppedStreamUseCase()
+        power_meter = RecordingPowerMeter()
+        with self.assertRaises(socket.error):
+            use_case.run_batch(power_meter, 5)
+        self.assertFalse(power_meter.measuring)
+        self.assertEqual(use_case.cleanups, 1)
+
+    def test_failed_blocks_are_retried(self):
+        use_case = DroppedStreamUseCase()
+        power_meter = RecordingPowerMeter()
+        results = use_case.profile_batched(power_meter, count=5,
+                                           batch_size=5, retry_limit=2,
+                                           verbose=False)
+        self.assertEqual(results, [])
+        self.assertEqual(power_meter.starts, 3)
+        self.assertEqual(use_case.cleanups, 3)
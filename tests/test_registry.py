@@ -0,0 +1,36 @@
+"""Tests for the registry of frameworks."""
+
+import unittest
+from physalia_automators import registry
+
+
+class TestFrameworkRegistry(unittest.TestCase):
+
+    def test_variants_are_opt_in(self):
+        names = registry.names()
+        self.assertIn("AndroidViewClient", names)
+        self.assertNotIn("AndroidViewClient-batched", names)
+        self.assertNotIn("AndroidViewClient-cached", names)
+
+    def test_select_batched_variants(self):
+        self.assertEqual(
+            registry.select(["AndroidViewClient"], batched_variants=True),
+            ["AndroidViewClient", "AndroidViewClient-batched"]
+        )
+
+    def test_select_cached_variants(self):
+        self.assertEqual(
+            registry.select(["AndroidViewClient", "PythonUiAutomator"],
+                            cached_variants=True),
+            ["AndroidViewClient", "AndroidViewClient-cached",
+             "PythonUiAutomator"]
+        )
+
+    def test_select_all_variants(self):
+        self.assertEqual(
+            registry.select(["AndroidViewClient", "PythonUiAutomator"],
+                            batched_variants=True, cached_variants=True),
+            ["AndroidViewClient", "AndroidViewClient-batched",
+             "AndroidViewClient-cached", "PythonUiAutomator",
+             "PythonUiAutomator-batched"]
+        )
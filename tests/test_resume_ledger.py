@@ -0,0 +1,86 @@
+"""Tests for the resume ledger."""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from physalia_automators.resume_ledger import ResumeLedger, INDEX_SUFFIX
+
+
+class TestResumeLedger(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "results.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_rows(self, use_cases, mode='a'):
+        """Write a row per use case, like `Measurement.save_to_csv`."""
+        with open(self.filename, mode) as csv_file:
+            for use_case in use_cases:
+                csv_file.write("1500000000.0,{},com.app,1.0,Nexus,"
+                               "1.0,2.0,Monsoon\n".format(use_case))
+
+    def read_index(self):
+        with open(self.filename + INDEX_SUFFIX) as index_file:
+            return json.load(index_file)
+
+    def test_missing_results(self):
+        self.assertEqual(ResumeLedger(self.filename).count("a"), 0)
+
+    def test_missing_index(self):
+        self.write_rows(["a", "a", "b"])
+        self.assertEqual(ResumeLedger(self.filename).count("a"), 2)
+        self.assertEqual(self.read_index()['counts'], {"a": 2, "b": 1})
+        self.assertEqual(self.read_index()['offset'],
+                         os.path.getsize(self.filename))
+
+    def test_incremental_sync(self):
+        self.write_rows(["a", "b"])
+        ResumeLedger(self.filename).sync()
+        # only rows after the offset are parsed: tamper with the counts
+        # of the indexed rows to tell them apart
+        index = self.read_index()
+        index['counts'] = {"a": 10}
+        with open(self.filename + INDEX_SUFFIX, 'w') as index_file:
+            json.dump(index, index_file)
+        self.write_rows(["a", "c"])
+        ledger = ResumeLedger(self.filename)
+        self.assertEqual(ledger.count("a"), 11)
+        self.assertEqual(ledger.count("c"), 1)
+        self.assertEqual(ledger.offset, os.path.getsize(self.filename))
+
+    def test_truncated_results(self):
+        self.write_rows(["a", "a", "a"])
+        ResumeLedger(self.filename).sync()
+        self.write_rows(["a"], mode='w')
+        self.assertEqual(ResumeLedger(self.filename).count("a"), 1)
+
+    def test_replaced_results(self):
+        self.write_rows(["a", "a"])
+        ResumeLedger(self.filename).sync()
+        # same size, different rows
+        self.write_rows(["b", "c"], mode='w')
+        ledger = ResumeLedger(self.filename)
+        self.assertEqual(ledger.count("a"), 0)
+        self.assertEqual(ledger.count("b"), 1)
+
+    def test_removed_results(self):
+        self.write_rows(["a"])
+        ResumeLedger(self.filename).sync()
+        os.remove(self.filename)
+        self.assertEqual(ResumeLedger(self.filename).count("a"), 0)
+        self.assertEqual(self.read_index()['offset'], 0)
+
+    def test_partial_row(self):
+        self.write_rows(["a"])
+        with open(self.filename, 'a') as csv_file:
+            csv_file.write("1500000000.0,a,com.app")
+        ledger = ResumeLedger(self.filename)
+        self.assertEqual(ledger.count("a"), 1)
+        with open(self.filename, 'a') as csv_file:
+            csv_file.write(",1.0,Nexus,1.0,2.0,Monsoon\n")
+        self.assertEqual(ledger.count("a"), 2)
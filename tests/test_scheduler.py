@@ -0,0 +1,123 @@
+"""Tests for the campaign scheduler."""
+
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+import click
+from physalia.power_meters import EmulatedPowerMeter
+from physalia_automators import adb
+from physalia_automators.fake_adb_server import FakeAdbServer
+from physalia_automators.scheduler import CampaignScheduler, DeviceBinding
+from tests import fake_framework
+
+
+def record_use_cases(framework, use_cases, power_meter, count, output):
+    """Runner that saves the use cases it is given, and the device."""
+    assert isinstance(power_meter, EmulatedPowerMeter)
+    serial = adb.shell("echo {}".format(adb.client.serial)).strip()
+    with open(output, 'a') as output_file:
+        csv_writer = csv.writer(output_file)
+        for key in sorted(use_cases):
+            csv_writer.writerow([framework.__name__, key, serial, count])
+
+
+def fail(framework, use_cases, power_meter, count, output):
+    """Runner that always fails."""
+    raise RuntimeError("use case failed")
+
+
+class TestDeviceBinding(unittest.TestCase):
+
+    def test_parse(self):
+        binding = DeviceBinding.parse("emulator-5554=12345")
+        self.assertEqual(binding.serial, "emulator-5554")
+        self.assertEqual(binding.power_meter_serial, "12345")
+
+    def test_parse_emulated(self):
+        binding = DeviceBinding.parse("emulator-5554=emulated")
+        self.assertIsInstance(binding.create_power_meter(),
+                              EmulatedPowerMeter)
+
+    def test_parse_requires_power_meter(self):
+        for value in ("emulator-5554", "emulator-5554=", "=12345",
+                      "emulator-5554=monsoon"):
+            with self.assertRaises(click.BadParameter):
+                DeviceBinding.parse(value)
+
+    def test_partition(self):
+        binding = DeviceBinding("192.168.1.2:5555", "emulated")
+        self.assertEqual(binding.partition("out/results.csv"),
+                         "out/results-192.168.1.2_5555.csv")
+
+
+class TestCampaignScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.server = FakeAdbServer(serials=["dev1", "dev2"],
+                                    root=self.directory)
+        self.server.start()
+        self.port = os.environ.get('ANDROID_ADB_SERVER_PORT')
+        self.serial = os.environ.get('ANDROID_SERIAL')
+        os.environ['ANDROID_ADB_SERVER_PORT'] = str(self.server.port)
+        self.output = os.path.join(self.directory, "results.csv")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        for name, value in (('ANDROID_ADB_SERVER_PORT', self.port),
+                            ('ANDROID_SERIAL', self.serial)):
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        shutil.rmtree(self.directory)
+
+    def read_partition(self, serial):
+        root, ext = os.path.splitext(self.output)
+        with open("{}-{}{}".format(root, serial, ext)) as partition:
+            return list(csv.reader(partition))
+
+    def test_collect_jobs(self):
+        jobs = CampaignScheduler.collect_jobs([fake_framework],
+                                              ["tap", "swipe", "back_button"])
+        self.assertEqual(jobs, [("tests.fake_framework", "swipe"),
+                                ("tests.fake_framework", "tap")])
+
+    def test_shards_across_devices(self):
+        scheduler = CampaignScheduler(
+            [DeviceBinding("dev1", "emulated"),
+             DeviceBinding("dev2", "emulated")],
+            3, self.output
+        )
+        self.assertTrue(scheduler.run([fake_framework], record_use_cases))
+        self.assertFalse(os.path.exists(self.output))
+        name = fake_framework.__name__
+        self.assertEqual(self.read_partition("dev1"), [
+            [name, "drag_and_drop", "dev1", "3"],
+            [name, "swipe", "dev1", "3"],
+        ])
+        self.assertEqual(self.read_partition("dev2"), [
+            [name, "long_tap", "dev2", "3"],
+            [name, "tap", "dev2", "3"],
+        ])
+
+    def test_unknown_device_fails(self):
+        scheduler = CampaignScheduler(
+            [DeviceBinding("dev1", "emulated"),
+             DeviceBinding("dev3", "emulated")],
+            1, self.output
+        )
+        self.assertFalse(scheduler.run([fake_framework], record_use_cases))
+
+    def test_failed_worker(self):
+        scheduler = CampaignScheduler(
+            [DeviceBinding("dev1", "emulated")], 1, self.output
+        )
+        self.assertFalse(scheduler.run([fake_framework], fail))
+
+
+if __name__ == '__main__':
+    unittest.main()